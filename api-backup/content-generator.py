@@ -12,36 +12,53 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from rss_manager import RSSManager
+from article_extractor import ArticleExtractor
+from seen_index import SeenIndex
 from scoring_ai import ScoringAI
 from quality_filter import QualityFilter
 from content_ai import ContentAI
 from sheets_manager import GoogleSheetsManager
+from config import Config
 from models import ContentItem, ContentStatus
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Kept across invocations of a warm instance so only a cold start reads the sheet
+_seen_index = None
+
+def _get_seen_index(sheets_manager) -> SeenIndex:
+    """This pipeline's seen index, bootstrapped from Google Sheets on a cold start"""
+    global _seen_index
+    if _seen_index is None:
+        _seen_index = SeenIndex(pipeline='content-generator')
+        _seen_index.bootstrap_from_sheets(sheets_manager)
+    return _seen_index
+
 def handler(request):
     """Main handler for manual content generation"""
     try:
         logger.info("Starting manual content generation")
         
         # Initialize components
-        rss_manager = RSSManager()
         scoring_ai = ScoringAI()
         quality_filter = QualityFilter()
         content_ai = ContentAI()
         sheets_manager = GoogleSheetsManager()
         
         # Load previously seen URLs
-        seen_urls = sheets_manager.get_seen_urls()
-        rss_manager.load_seen_urls(set(seen_urls))
+        seen_index = _get_seen_index(sheets_manager)
+        rss_manager = RSSManager(seen_index=seen_index)
         
         # Fetch RSS feeds
         rss_items = rss_manager.fetch_rss_feeds()
         logger.info(f"Fetched {len(rss_items)} RSS items")
         
+        # Replace feed snippets with the extracted article text (cached on disk across runs)
+        if Config.ARTICLE_EXTRACTION:
+            ArticleExtractor(session=rss_manager.session).enrich(rss_items[:3])
+        
         if not rss_items:
             return {
                 'statusCode': 200,
@@ -53,6 +70,7 @@ def handler(request):
         
         # Process first few items for demo
         processed_items = []
+        seen_items = []
         for rss_item in rss_items[:3]:  # Limit to 3 items for manual trigger
             try:
                 # Score the content
@@ -99,6 +117,7 @@ def handler(request):
                 
                 # Log to sheets
                 sheets_manager.log_content_item(content_item)
+                seen_items.append(rss_item)
                 processed_items.append({
                     'title': rss_item.title,
                     'status': content_item.status.value,
@@ -111,6 +130,11 @@ def handler(request):
                 logger.error(f"Error processing item '{rss_item.title}': {e}")
                 continue
         
+        # Items past the first three, or that failed, stay unseen; their feeds' validators
+        # aren't saved, so the next run downloads those feeds in full and offers them again
+        rss_manager.mark_seen(seen_items)
+        seen_index.sync_to_sheets(sheets_manager)
+        
         return {
             'statusCode': 200,
             'body': json.dumps({
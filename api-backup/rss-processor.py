@@ -12,36 +12,53 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from rss_manager import RSSManager
+from article_extractor import ArticleExtractor
+from seen_index import SeenIndex
 from scoring_ai import ScoringAI
 from quality_filter import QualityFilter
 from content_ai import ContentAI
 from sheets_manager import GoogleSheetsManager
+from config import Config
 from models import ContentItem, ContentStatus
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Kept across invocations of a warm instance so only a cold start reads the sheet
+_seen_index = None
+
+def _get_seen_index(sheets_manager) -> SeenIndex:
+    """This pipeline's seen index, bootstrapped from Google Sheets on a cold start"""
+    global _seen_index
+    if _seen_index is None:
+        _seen_index = SeenIndex(pipeline='rss-processor')
+        _seen_index.bootstrap_from_sheets(sheets_manager)
+    return _seen_index
+
 def handler(request):
     """Main handler for RSS processing"""
     try:
         logger.info("Starting RSS processing cycle")
         
         # Initialize components
-        rss_manager = RSSManager()
         scoring_ai = ScoringAI()
         quality_filter = QualityFilter()
         content_ai = ContentAI()
         sheets_manager = GoogleSheetsManager()
         
         # Load previously seen URLs
-        seen_urls = sheets_manager.get_seen_urls()
-        rss_manager.load_seen_urls(set(seen_urls))
+        seen_index = _get_seen_index(sheets_manager)
+        rss_manager = RSSManager(seen_index=seen_index)
         
         # Fetch RSS feeds
         rss_items = rss_manager.fetch_rss_feeds()
         logger.info(f"Fetched {len(rss_items)} new RSS items")
         
+        # Replace feed snippets with the extracted article text (cached on disk across runs)
+        if Config.ARTICLE_EXTRACTION:
+            ArticleExtractor(session=rss_manager.session).enrich(rss_items)
+        
         if not rss_items:
             return {
                 'statusCode': 200,
@@ -52,6 +69,7 @@ def handler(request):
             }
         
         processed_count = 0
+        processed_items = []
         approved_count = 0
         held_count = 0
         
@@ -106,13 +124,16 @@ def handler(request):
                 # Log to sheets
                 sheets_manager.log_content_item(content_item)
                 processed_count += 1
+                processed_items.append(rss_item)
                 
             except Exception as e:
                 logger.error(f"Error processing item '{rss_item.title}': {e}")
                 continue
         
-        # Update seen URLs
-        new_seen_urls = rss_manager.get_seen_urls()
+        # Items that failed to score or errored stay unseen, and their feeds' validators aren't
+        # saved, so the next run downloads those feeds in full and picks them up again
+        rss_manager.mark_seen(processed_items)
+        seen_index.sync_to_sheets(sheets_manager)
         
         return {
             'statusCode': 200,
@@ -0,0 +1,324 @@
+"""
+Full-text article extraction for Brightface Content Engine
+"""
+import os
+import re
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from html.parser import HTMLParser
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import requests
+from requests.compat import chardet
+
+from models import RSSItem
+from config import Config
+from url_canonicalizer import hash_url
+
+logger = logging.getLogger(__name__)
+
+# Elements whose text is never article content
+SKIP_TAGS = {
+    'script', 'style', 'noscript', 'template', 'svg', 'iframe', 'form', 'button',
+    'nav', 'header', 'footer', 'aside', 'figure', 'select'
+}
+BLOCK_TAGS = {
+    'p', 'div', 'section', 'article', 'main', 'li', 'ul', 'ol', 'blockquote', 'pre',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'tr', 'table', 'br', 'dd', 'dt'
+}
+CONTENT_TAGS = {'article', 'main'}
+
+# Blocks shorter than this are usually bylines, share buttons or link lists
+MIN_BLOCK_WORDS = 6
+# Below this much text inside <article>/<main>, fall back to the whole page
+MIN_CONTENT_CHARS = 300
+
+_WHITESPACE_RE = re.compile(r'\s+')
+# <meta charset="..."> or <meta http-equiv="Content-Type" content="text/html; charset=...">
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.IGNORECASE)
+
+class _ArticleTextParser(HTMLParser):
+    """Collects text blocks, separating those inside <article>/<main> from the rest"""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks: List[str] = []
+        self.content_blocks: List[str] = []
+        self._skip_depth = 0
+        self._content_depth = 0
+        self._current: List[str] = []
+    
+    def _flush(self):
+        text = _WHITESPACE_RE.sub(' ', ''.join(self._current)).strip()
+        self._current = []
+        if len(text.split()) < MIN_BLOCK_WORDS:
+            return
+        self.blocks.append(text)
+        if self._content_depth:
+            self.content_blocks.append(text)
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self._flush()
+        if tag in CONTENT_TAGS:
+            self._content_depth += 1
+    
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self._flush()
+        if tag in CONTENT_TAGS:
+            self._flush()
+            self._content_depth = max(0, self._content_depth - 1)
+    
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._current.append(data)
+    
+    def close(self):
+        super().close()
+        self._flush()
+
+def html_to_text(html: str) -> str:
+    """Strip markup and boilerplate, returning paragraphs of plain text"""
+    if not html:
+        return ''
+    
+    parser = _ArticleTextParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception as e:
+        logger.warning(f"Error parsing article HTML: {e}")
+    
+    content = '\n\n'.join(parser.content_blocks)
+    if len(content) >= MIN_CONTENT_CHARS:
+        return content
+    
+    text = '\n\n'.join(parser.blocks)
+    if text:
+        return text
+    
+    # Short fragments (e.g. a one-line feed summary) have no block that clears the word floor
+    return _WHITESPACE_RE.sub(' ', re.sub(r'<[^>]+>', ' ', html)).strip()
+
+class ArticleExtractor:
+    """Fetches linked articles and caches their extracted text on disk, keyed by canonical URL"""
+    
+    def __init__(self, cache_dir: Optional[str] = None, session: Optional[requests.Session] = None):
+        self.cache_dir = cache_dir or Config.ARTICLE_CACHE_DIR
+        self.max_bytes = Config.ARTICLE_CACHE_MAX_MB * 1024 * 1024
+        self.max_entries = Config.ARTICLE_CACHE_MAX_ENTRIES
+        
+        if session is None:
+            session = requests.Session()
+            session.headers.update({
+                'User-Agent': 'Brightface Content Engine 1.0'
+            })
+        self.session = session
+        
+        self.failure_ttl = Config.ARTICLE_FAILURE_TTL_HOURS * 3600
+        
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'fetch_errors': 0, 'failures_cached': 0, 'evicted': 0}
+    
+    def _cache_path(self, url: str) -> str:
+        digest = hash_url(url)
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.json")
+    
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+    
+    def _read_entry(self, url: str) -> Optional[Dict[str, Any]]:
+        path = self._cache_path(url)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Error reading article cache {path}: {e}")
+            return None
+        
+        return entry
+    
+    def get_cached(self, url: str) -> Optional[str]:
+        """Return cached article text for a URL, refreshing its LRU position"""
+        entry = self._read_entry(url)
+        return entry.get('text') if entry else None
+    
+    def _store(self, url: str, text: Optional[str], error: Optional[str] = None):
+        path = self._cache_path(url)
+        entry = {'url': url, 'text': text, 'fetched_at': time.time()}
+        if error is not None:
+            entry['error'] = error
+        
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Error writing article cache {path}: {e}")
+    
+    @staticmethod
+    def _decode(body: bytes, response: requests.Response) -> str:
+        """Decode a page using its declared charset, then <meta charset>, then detection"""
+        # requests assumes ISO-8859-1 for text/html without a charset, which garbles UTF-8 pages
+        if 'charset=' in response.headers.get('Content-Type', '').lower() and response.encoding:
+            encoding = response.encoding
+        else:
+            match = _META_CHARSET_RE.search(body[:4096])
+            encoding = match.group(1).decode('ascii') if match else None
+        
+        if encoding is None:
+            try:
+                return body.decode('utf-8')
+            except UnicodeDecodeError:
+                encoding = chardet.detect(body[:65536]).get('encoding')
+        
+        try:
+            return body.decode(encoding or 'utf-8', errors='replace')
+        except LookupError:
+            return body.decode('utf-8', errors='replace')
+    
+    def _download(self, url: str) -> str:
+        """Fetch a page body, capped at ARTICLE_MAX_BYTES"""
+        with self.session.get(url, timeout=Config.ARTICLE_FETCH_TIMEOUT, stream=True) as response:
+            response.raise_for_status()
+            
+            content_type = response.headers.get('Content-Type', '')
+            if content_type and 'html' not in content_type:
+                raise ValueError(f"Not an HTML page: {content_type}")
+            
+            chunks, size = [], 0
+            for chunk in response.iter_content(chunk_size=65536):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= Config.ARTICLE_MAX_BYTES:
+                    break
+            
+            return self._decode(b''.join(chunks), response)
+    
+    def extract(self, rss_item: RSSItem) -> str:
+        """Return the best plain text for an item: cached, freshly extracted, or the cleaned feed HTML"""
+        feed_text = html_to_text(rss_item.full_text or rss_item.summary)
+        
+        entry = self._read_entry(rss_item.url)
+        if entry is not None and entry.get('text') is not None:
+            self._count('hits')
+            cached = entry['text']
+            return cached if len(cached) >= len(feed_text) else feed_text
+        
+        # A page that just failed is not downloaded again every cycle
+        if entry is not None and time.time() - entry.get('fetched_at', 0) < self.failure_ttl:
+            self._count('failures_cached')
+            return feed_text
+        
+        self._count('misses')
+        try:
+            page_text = html_to_text(self._download(rss_item.url))
+        except Exception as e:
+            self._count('fetch_errors')
+            logger.warning(f"Error extracting article {rss_item.url}: {e}")
+            self._store(rss_item.url, None, str(e))
+            return feed_text
+        
+        self._store(rss_item.url, page_text)
+        return page_text if len(page_text) >= len(feed_text) else feed_text
+    
+    def enrich(self, rss_items: List[RSSItem]) -> List[RSSItem]:
+        """Replace each item's full_text with extracted article text"""
+        if not rss_items:
+            return rss_items
+        
+        workers = max(1, min(Config.ARTICLE_EXTRACT_WORKERS, len(rss_items)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            texts = list(executor.map(self.extract, rss_items))
+        
+        for rss_item, text in zip(rss_items, texts):
+            rss_item.full_text = text
+        
+        self.evict()
+        return rss_items
+    
+    def enrich_stream(self, rss_items: Iterable[RSSItem]) -> Iterator[RSSItem]:
+        """Yield items with extracted article text as their pages complete, ARTICLE_EXTRACT_WORKERS at a time"""
+        workers = max(1, Config.ARTICLE_EXTRACT_WORKERS)
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='article-extract')
+        queued = iter(rss_items)
+        in_flight = {}
+        
+        try:
+            # Only as many items are taken from the stream as there are workers to extract them
+            for rss_item in islice(queued, workers):
+                in_flight[executor.submit(self.extract, rss_item)] = rss_item
+            
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    rss_item = in_flight.pop(future)
+                    
+                    next_item = next(queued, None)
+                    if next_item is not None:
+                        in_flight[executor.submit(self.extract, next_item)] = next_item
+                    
+                    rss_item.full_text = future.result()
+                    yield rss_item
+        finally:
+            # A consumer that stops early doesn't wait for pages still downloading
+            executor.shutdown(wait=False, cancel_futures=True)
+            if hasattr(queued, 'close'):
+                queued.close()
+    
+    def evict(self) -> int:
+        """Delete least recently used entries until the cache fits its size and count limits"""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        
+        if total <= self.max_bytes and len(entries) <= self.max_entries:
+            return 0
+        
+        entries.sort()
+        remaining = len(entries)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes and remaining <= self.max_entries:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            remaining -= 1
+            evicted += 1
+        
+        self._count('evicted', evicted)
+        logger.info(f"Evicted {evicted} cached articles")
+        return evicted
+    
+    def stats(self) -> Dict[str, Any]:
+        """Cache hit/miss counters for this process"""
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,140 @@
+"""
+Concurrent rate-limited scoring for Brightface Content Engine
+"""
+import json
+import random
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+from openai import AsyncOpenAI, RateLimitError
+from openai.types.chat import ChatCompletion
+
+from models import RSSItem, ContentScore
+from config import Config
+from scoring_ai import ScoringAI
+from rate_limiter import RateLimiter
+from llm_client import get_coalescer, get_hedged_caller, llm_deadline
+
+logger = logging.getLogger(__name__)
+
+class AsyncScoringEngine:
+    """Scores items through AsyncOpenAI with bounded concurrency, shared rate limits and 429 retries"""
+    
+    def __init__(self, scoring_ai: Optional[ScoringAI] = None, rate_limiter: Optional[RateLimiter] = None):
+        # Prompts, batching and response parsing are shared with the synchronous scorer
+        self.scoring_ai = scoring_ai or ScoringAI()
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.coalescer = get_coalescer() if Config.LLM_COALESCE else None
+        self.caller = get_hedged_caller()
+    
+    def score_items(self, rss_items: List[RSSItem], model: Optional[str] = None) -> List[Tuple[RSSItem, Optional[ContentScore]]]:
+        """Score items concurrently; results come back in input order. `model` bypasses the cascade"""
+        if self.scoring_ai.cascade and not model:
+            return self.scoring_ai.cascade.score(rss_items, self._score_with_model)
+        return self._score_with_model(rss_items, model or Config.OPENAI_MODEL)
+    
+    def _score_with_model(self, rss_items: List[RSSItem], model: str) -> List[Tuple[RSSItem, Optional[ContentScore]]]:
+        scores: Dict[str, Optional[ContentScore]] = dict(self.scoring_ai.cached_scores(rss_items, model))
+        pending = [rss_item for rss_item in rss_items if rss_item.url_hash not in scores]
+        
+        if pending:
+            for rss_item, content_score in asyncio.run(self._score_all(pending, model)):
+                scores[rss_item.url_hash] = content_score
+        
+        return [(rss_item, scores.get(rss_item.url_hash)) for rss_item in rss_items]
+    
+    async def _score_all(self, rss_items: List[RSSItem], model: str) -> List[Tuple[RSSItem, Optional[ContentScore]]]:
+        semaphore = asyncio.Semaphore(Config.SCORING_CONCURRENCY)
+        
+        # Retries are handled here so they go through the rate limiter
+        async with AsyncOpenAI(api_key=Config.OPENAI_API_KEY, max_retries=0) as client:
+            batches = self.scoring_ai.pack_batches(rss_items)
+            batch_results = await asyncio.gather(
+                *(self._score_batch(client, semaphore, batch, model) for batch in batches)
+            )
+        
+        return [result for batch_result in batch_results for result in batch_result]
+    
+    async def _score_batch(self, client: AsyncOpenAI, semaphore: asyncio.Semaphore,
+                           batch: List[RSSItem], model: str) -> List[Tuple[RSSItem, Optional[ContentScore]]]:
+        try:
+            scores = await self._request_scores(client, semaphore, batch, model)
+        except ValueError as e:
+            if len(batch) == 1:
+                logger.error(f"Error scoring content '{batch[0].title}': {e}")
+                return [(batch[0], None)]
+            # Same policy as ScoringAI: only an unreadable answer is retried item by item
+            logger.warning(f"Unreadable batch score response for {len(batch)} items, scoring individually: {e}")
+            scores = {}
+        except Exception as e:
+            logger.error(f"Error scoring {len(batch)} items: {e}")
+            return [(rss_item, None) for rss_item in batch]
+        
+        missing = [rss_item for rss_item in batch if rss_item.url_hash not in scores]
+        if len(batch) > 1 and missing:
+            fallbacks = await asyncio.gather(*(self._score_batch(client, semaphore, [rss_item], model) for rss_item in missing))
+            scores.update((rss_item.url_hash, content_score) for [(rss_item, content_score)] in fallbacks)
+        
+        return [(rss_item, scores.get(rss_item.url_hash)) for rss_item in batch]
+    
+    async def _request_scores(self, client: AsyncOpenAI, semaphore: asyncio.Semaphore,
+                              batch: List[RSSItem], model: str) -> Dict[str, ContentScore]:
+        """Send one scoring request within the cycle deadline, sharing it with identical requests already in flight"""
+        request = self.scoring_ai.scoring_request(batch, model)
+        estimated_tokens = self.scoring_ai.request_tokens(request, len(batch))
+        
+        prompt_type = 'score_batch' if len(batch) > 1 else 'score'
+        send = lambda: self._send(client, semaphore, request, estimated_tokens, prompt_type)
+        if self.coalescer:
+            response = await self.coalescer.run_async(request, send)
+        else:
+            response = await send()
+        
+        result = json.loads(response.choices[0].message.content or '')
+        return self.scoring_ai.read_scores(batch, result, model)
+    
+    @asynccontextmanager
+    async def _slot(self, semaphore: asyncio.Semaphore, estimated_tokens: int):
+        """Rate-limit reservation plus a concurrency slot, taken by every request including hedges"""
+        await self.rate_limiter.acquire(estimated_tokens)
+        async with semaphore:
+            yield
+    
+    async def _send(self, client: AsyncOpenAI, semaphore: asyncio.Semaphore,
+                    request: dict, estimated_tokens: int, prompt_type: str) -> ChatCompletion:
+        """Wait on the rate limiter and retry 429s with jittered backoff"""
+        deadline = llm_deadline.get()
+        admit = lambda: self._slot(semaphore, estimated_tokens)
+        for attempt in range(Config.SCORING_MAX_RETRIES + 1):
+            try:
+                async with admit():
+                    # Timed and hedged from here, so waiting for a slot never counts as a slow call
+                    raw = await self.caller.call_async(
+                        request, prompt_type, deadline,
+                        send=lambda: client.chat.completions.with_raw_response.create(**request),
+                        admit=admit
+                    )
+            except RateLimitError as e:
+                if attempt == Config.SCORING_MAX_RETRIES:
+                    raise
+                
+                self.rate_limiter.update_from_headers(e.response.headers)
+                # Full jitter, but never sooner than the server asks
+                delay = random.uniform(0, min(60, 2 ** attempt))
+                try:
+                    delay = max(delay, float(e.response.headers.get('retry-after', 0)))
+                except ValueError:
+                    pass
+                
+                logger.warning(f"Rate limited, retrying in {delay:.1f}s (attempt {attempt + 1}/{Config.SCORING_MAX_RETRIES})")
+                self.rate_limiter.pause(delay)
+                continue
+            
+            self.rate_limiter.update_from_headers(raw.headers)
+            response = raw.parse()
+            if response.usage:
+                self.rate_limiter.reconcile(estimated_tokens, response.usage.total_tokens)
+            
+            return response
@@ -11,18 +11,23 @@ import requests
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
 import feedparser
-from openai import OpenAI
 from notion_client import Client
 
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from config import Config
+from cost_estimator import CycleBudget, estimate_request
+from llm_client import create_openai_client, get_hedged_caller, llm_deadline
+
+# Expected completion sizes of the two requests, for budget estimates
+SCORE_OUTPUT_TOKENS = 120
+BLOG_POST_OUTPUT_TOKENS = 1500
 
 class AutomatedContentGenerator:
     def __init__(self):
         self.config = Config()
-        self.openai_client = OpenAI(api_key=self.config.OPENAI_API_KEY)
+        self.openai_client = create_openai_client()
         self.notion_client = Client(auth=self.config.NOTION_API_KEY)
         
         # Google Sheets is optional
@@ -55,11 +60,9 @@ class AutomatedContentGenerator:
         print(f"📝 Total articles fetched: {len(articles)}")
         return articles
     
-    def score_content(self, article: Dict[str, Any]) -> Dict[str, Any]:
-        """Score content for relevance and virality"""
-        print(f"🎯 Scoring: {article['title'][:50]}...")
-        
-        prompt = f"""
+    def _build_scoring_prompt(self, article: Dict[str, Any]) -> str:
+        """Build the scoring prompt for an article"""
+        return f"""
         Score this article for relevance to AI headshots and personal branding:
         
         Title: {article['title']}
@@ -73,10 +76,17 @@ class AutomatedContentGenerator:
         
         Respond with JSON: {{"relevance": X, "virality": Y, "quality": Z, "reasoning": "explanation"}}
         """
+    
+    def score_content(self, article: Dict[str, Any], model: str = "gpt-4") -> Dict[str, Any]:
+        """Score content for relevance and virality"""
+        print(f"🎯 Scoring: {article['title'][:50]}...")
+        
+        prompt = self._build_scoring_prompt(article)
         
         try:
             response = self.openai_client.chat.completions.create(
-                model="gpt-4",
+                prompt_type='score',
+                model=model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.3
             )
@@ -98,11 +108,9 @@ class AutomatedContentGenerator:
             print(f"❌ Error scoring content: {e}")
             return {'relevance': 0, 'virality': 0, 'quality': 0, 'overall': 0, 'reasoning': 'Error'}
     
-    def generate_blog_post(self, article: Dict[str, Any], scores: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate a blog post from the article"""
-        print(f"✍️ Generating blog post: {article['title'][:50]}...")
-        
-        prompt = f"""
+    def _build_blog_prompt(self, article: Dict[str, Any], scores: Dict[str, Any]) -> str:
+        """Build the blog post prompt for an article"""
+        return f"""
         Create a blog post for Brightface.ai (AI headshot service) based on this article:
         
         Original Article:
@@ -133,10 +141,17 @@ class AutomatedContentGenerator:
             "seo_description": "SEO meta description"
         }}
         """
+    
+    def generate_blog_post(self, article: Dict[str, Any], scores: Dict[str, Any], model: str = "gpt-4") -> Dict[str, Any]:
+        """Generate a blog post from the article"""
+        print(f"✍️ Generating blog post: {article['title'][:50]}...")
+        
+        prompt = self._build_blog_prompt(article, scores)
         
         try:
             response = self.openai_client.chat.completions.create(
-                model="gpt-4",
+                prompt_type='blog_post',
+                model=model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.7
             )
@@ -205,17 +220,30 @@ class AutomatedContentGenerator:
             print("❌ No articles found")
             return
         
+        budget = CycleBudget()
+        llm_deadline.set(budget.deadline())
+        
         # Process articles
         for article in articles[:3]:  # Limit to 3 articles per run
             # Score content
-            scores = self.score_content(article)
+            prompt = self._build_scoring_prompt(article)
+            decision, model = budget.plan(lambda model: estimate_request('', prompt, SCORE_OUTPUT_TOKENS, model or "gpt-4"))
+            if decision in (CycleBudget.DEFER, CycleBudget.STOP):
+                print("⏸️ Budget exhausted, leaving remaining articles for the next run")
+                break
+            scores = self.score_content(article, model or "gpt-4")
             
             # Only proceed if scores are good enough
             if scores['overall'] >= 7.0:
                 print(f"✅ High-scoring content found: {scores['overall']}/10")
                 
                 # Generate blog post
-                blog_post = self.generate_blog_post(article, scores)
+                prompt = self._build_blog_prompt(article, scores)
+                decision, model = budget.plan(lambda model: estimate_request('', prompt, BLOG_POST_OUTPUT_TOKENS, model or "gpt-4"))
+                if decision in (CycleBudget.DEFER, CycleBudget.STOP):
+                    print("⏸️ Budget exhausted, leaving remaining articles for the next run")
+                    break
+                blog_post = self.generate_blog_post(article, scores, model or "gpt-4")
                 
                 if blog_post:
                     # Publish to Notion
@@ -228,6 +256,8 @@ class AutomatedContentGenerator:
             else:
                 print(f"⏭️ Skipping low-scoring content: {scores['overall']}/10")
         
+        print(f"💰 Estimated spend: {budget.stats()}")
+        get_hedged_caller().latency.save()
         print("✅ Automation complete!")
 
 def main():
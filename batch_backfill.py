@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Batch API backfill for Brightface Content Engine
+
+Score and generate content for archived items at batch pricing:
+    python batch_backfill.py items.json --output results.jsonl
+or run the same flow offline with the file-based stand-in, which answers with deterministic stubs
+unless BATCH_LOCAL_ENDPOINT names an OpenAI-compatible server to send the requests to:
+    BATCH_LOCAL=true python batch_backfill.py items.json
+"""
+import os
+import json
+import time
+import uuid
+import hashlib
+import shutil
+import logging
+import argparse
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import openai
+
+from models import RSSItem, ContentScore, ContentItem, ContentStatus
+from config import Config
+from scoring_ai import ScoringAI
+from content_ai import ContentAI
+from quality_filter import QualityFilter
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT = '/v1/chat/completions'
+TERMINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+class OpenAIBatchBackend:
+    """Runs request files as OpenAI Batch API jobs"""
+    
+    def __init__(self, client: Optional[openai.OpenAI] = None):
+        self.client = client or openai.OpenAI(api_key=Config.OPENAI_API_KEY)
+    
+    def submit(self, path: str, description: str) -> str:
+        """Upload a request file and start a batch job; returns the batch id"""
+        with open(path, 'rb') as f:
+            input_file = self.client.files.create(file=f, purpose='batch')
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=ENDPOINT,
+            completion_window=Config.BATCH_COMPLETION_WINDOW,
+            metadata={'description': description}
+        )
+        return batch.id
+    
+    def status(self, batch_id: str) -> Tuple[str, Dict[str, int]]:
+        """Job status and request counts"""
+        batch = self.client.batches.retrieve(batch_id)
+        counts = batch.request_counts.model_dump() if batch.request_counts else {}
+        return batch.status, counts
+    
+    def results(self, batch_id: str) -> Iterator[Dict[str, Any]]:
+        """Output and error lines of a finished job (expired jobs keep the requests that completed)"""
+        batch = self.client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    yield json.loads(line)
+
+def stub_completion(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Deterministic offline chat completion for a request body, readable by every backfill step"""
+    prompt = body['messages'][-1]['content']
+    seed = int(hashlib.sha256(prompt.encode()).hexdigest()[:8], 16)
+    
+    # One answer carries the scoring fields and the generated content, so it serves every prompt
+    result = {
+        'relevance_score': 4 + seed % 7,
+        'virality_score': 3 + (seed >> 4) % 8,
+        'freshness_days': seed % 15,
+        'angles': ['first impressions'],
+        'risk_flags': ['none'],
+        'one_line_take': 'Offline stub answer used to exercise the batch backfill flow',
+        'keywords': ['ai headshots', 'personal branding'],
+        'linkedin': {'text': 'Offline stub LinkedIn post.', 'hashtags': ['#AIHeadshots', '#PersonalBranding']},
+        'x': {'text': 'Offline stub X post.', 'hashtags': ['#AIHeadshots']},
+        'blog': {
+            'title': 'Offline stub blog draft',
+            'slug': f"offline-stub-{seed:08x}",
+            'meta_description': 'Offline stub blog draft produced without calling a model.',
+            'outline': ['H2 Stub'],
+            'body_md': '## Stub\n\nOffline stub blog draft.'
+        }
+    }
+    return {
+        'id': f"chatcmpl-stub-{seed:08x}",
+        'object': 'chat.completion',
+        'created': 0,
+        'model': body.get('model'),
+        'choices': [{
+            'index': 0,
+            'finish_reason': 'stop',
+            'message': {'role': 'assistant', 'content': json.dumps(result)}
+        }]
+    }
+
+class LocalBatchBackend:
+    """File-based stand-in for the Batch API: a job's JSONL is processed request by request when it is polled"""
+    
+    def __init__(self, directory: Optional[str] = None, respond: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        self.directory = directory or os.path.join(Config.BATCH_DIR, 'local')
+        # Maps a request body to a chat completion dict: offline stubs unless BATCH_LOCAL_ENDPOINT is set,
+        # so a local run never sends requests live at full price by accident
+        self.offline = respond is None and not Config.BATCH_LOCAL_ENDPOINT
+        self.respond = respond or (self._chat_completion if Config.BATCH_LOCAL_ENDPOINT else stub_completion)
+        self._client = None
+    
+    def _chat_completion(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        if self._client is None:
+            self._client = openai.OpenAI(api_key=Config.OPENAI_API_KEY or 'local', base_url=Config.BATCH_LOCAL_ENDPOINT)
+        return self._client.chat.completions.create(**body).model_dump()
+    
+    def _job_dir(self, batch_id: str) -> str:
+        return os.path.join(self.directory, batch_id)
+    
+    def _read_state(self, batch_id: str) -> Dict[str, Any]:
+        with open(os.path.join(self._job_dir(batch_id), 'state.json'), 'r') as f:
+            return json.load(f)
+    
+    def _write_state(self, batch_id: str, state: Dict[str, Any]):
+        path = os.path.join(self._job_dir(batch_id), 'state.json')
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+    
+    def submit(self, path: str, description: str) -> str:
+        """Copy a request file into a new job directory; returns the batch id"""
+        batch_id = f"batch_local_{uuid.uuid4().hex[:16]}"
+        os.makedirs(self._job_dir(batch_id), exist_ok=True)
+        shutil.copyfile(path, os.path.join(self._job_dir(batch_id), 'input.jsonl'))
+        self._write_state(batch_id, {
+            'status': 'validating',
+            'description': description,
+            'created_at': time.time(),
+            'request_counts': {'total': 0, 'completed': 0, 'failed': 0}
+        })
+        return batch_id
+    
+    def status(self, batch_id: str) -> Tuple[str, Dict[str, int]]:
+        """Job status and request counts; the first poll of a new job runs it to completion"""
+        state = self._read_state(batch_id)
+        if state['status'] in ('validating', 'in_progress'):
+            state['status'] = 'in_progress'
+            self._write_state(batch_id, state)
+            state = self._process(batch_id, state)
+        return state['status'], state['request_counts']
+    
+    def _process(self, batch_id: str, state: Dict[str, Any]) -> Dict[str, Any]:
+        job_dir = self._job_dir(batch_id)
+        counts = {'total': 0, 'completed': 0, 'failed': 0}
+        
+        with open(os.path.join(job_dir, 'input.jsonl'), 'r') as requests_file, \
+                open(os.path.join(job_dir, 'output.jsonl'), 'w') as output_file, \
+                open(os.path.join(job_dir, 'errors.jsonl'), 'w') as error_file:
+            for line_number, line in enumerate(requests_file, 1):
+                if not line.strip():
+                    continue
+                counts['total'] += 1
+                
+                # Output lines mirror the Batch API's, so results are read back the same way for both backends
+                custom_id = None
+                try:
+                    request = json.loads(line)
+                    custom_id = request['custom_id']
+                    if request.get('method') != 'POST' or request.get('url') != ENDPOINT:
+                        raise ValueError(f"Unsupported request {request.get('method')} {request.get('url')}")
+                    body = self.respond(request['body'])
+                except Exception as e:
+                    counts['failed'] += 1
+                    error_file.write(json.dumps({
+                        'id': f"batch_req_{line_number}",
+                        'custom_id': custom_id,
+                        'response': None,
+                        'error': {'code': type(e).__name__, 'message': str(e)}
+                    }) + '\n')
+                    continue
+                
+                counts['completed'] += 1
+                output_file.write(json.dumps({
+                    'id': f"batch_req_{line_number}",
+                    'custom_id': custom_id,
+                    'response': {'status_code': 200, 'request_id': f"local_{line_number}", 'body': body},
+                    'error': None
+                }) + '\n')
+        
+        state.update(status='completed', completed_at=time.time(), request_counts=counts)
+        self._write_state(batch_id, state)
+        return state
+    
+    def results(self, batch_id: str) -> Iterator[Dict[str, Any]]:
+        """Output and error lines of a finished job"""
+        for name in ('output.jsonl', 'errors.jsonl'):
+            path = os.path.join(self._job_dir(batch_id), name)
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+class BatchBackfill:
+    """Scores and generates content for many items with one batch job per step instead of live requests"""
+    
+    def __init__(self, scoring_ai: Optional[ScoringAI] = None, content_ai: Optional[ContentAI] = None, backend=None):
+        self.scoring_ai = scoring_ai or ScoringAI()
+        self.content_ai = content_ai or ContentAI()
+        self.quality_filter = QualityFilter()
+        self.backend = backend or (LocalBatchBackend() if Config.BATCH_LOCAL else OpenAIBatchBackend())
+        self.directory = Config.BATCH_DIR
+        
+        if getattr(self.backend, 'offline', False):
+            # Stub scores exercise the flow; they must not be cached as real ones
+            logger.info("Local batch jobs are answered with offline stubs (set BATCH_LOCAL_ENDPOINT for real answers)")
+            self.scoring_ai.score_cache = None
+    
+    def score(self, rss_items: List[RSSItem], model: Optional[str] = None) -> List[Tuple[RSSItem, Optional[ContentScore]]]:
+        """Score items in a batch job, skipping ones already in the score cache; results come back in input order"""
+        # One model only: a cascade would need a second job for the escalated items
+        model = model or Config.OPENAI_MODEL
+        scores: Dict[str, Optional[ContentScore]] = dict(self.scoring_ai.cached_scores(rss_items, model))
+        pending = list({rss_item.url_hash: rss_item for rss_item in rss_items if rss_item.url_hash not in scores}.values())
+        
+        results = self._run('score', {
+            rss_item.url_hash: self.scoring_ai.scoring_request([rss_item], model) for rss_item in pending
+        })
+        for rss_item in pending:
+            result = results.get(rss_item.url_hash)
+            scores[rss_item.url_hash] = self.scoring_ai.read_scores([rss_item], result, model).get(rss_item.url_hash)
+        
+        return [(rss_item, scores.get(rss_item.url_hash)) for rss_item in rss_items]
+    
+    def generate(self, content_items: List[ContentItem], blog_only: Optional[bool] = None,
+                 model: Optional[str] = None) -> List[ContentItem]:
+        """Generate content for scored items in a batch job; returns the items that got content"""
+        blog_only = Config.BLOG_ONLY_MODE if blog_only is None else blog_only
+        build_request = self.content_ai._blog_request if blog_only else self.content_ai._content_request
+        
+        results = self._run('blog' if blog_only else 'content', {
+            content_item.rss_item.url_hash: build_request(content_item.rss_item, content_item.score, model)
+            for content_item in content_items if content_item.score
+        })
+        
+        generated_items = []
+        for content_item in content_items:
+            result = results.get(content_item.rss_item.url_hash)
+            if result is None:
+                logger.warning(f"No generated content for '{content_item.rss_item.title}'")
+                continue
+            
+            if blog_only:
+                content_item.generated_content = self.content_ai._parse_blog_response(result, content_item.rss_item, content_item.score)
+            else:
+                content_item.generated_content = self.content_ai.add_utm_parameters(
+                    self.content_ai._parse_content_response(result),
+                    "both"
+                )
+            content_item.status = ContentStatus.APPROVED
+            content_item.processed_at = datetime.now()
+            generated_items.append(content_item)
+        
+        return generated_items
+    
+    def run(self, rss_items: List[RSSItem], score_only: bool = False, model: Optional[str] = None) -> List[ContentItem]:
+        """Score every item, then generate content for the ones that pass the quality filter"""
+        content_items = []
+        for rss_item, score in self.score(rss_items, model):
+            if score is None:
+                continue
+            
+            passed, reason = self.quality_filter.filter_by_score(rss_item, score)
+            if not passed:
+                logger.info(f"Item rejected: {reason}")
+            status = ContentStatus.APPROVED if passed else ContentStatus.REJECTED
+            content_items.append(ContentItem(rss_item=rss_item, score=score, status=status))
+        
+        approved = [content_item for content_item in content_items if content_item.status == ContentStatus.APPROVED]
+        logger.info(f"Scored {len(content_items)} of {len(rss_items)} items, {len(approved)} passed the quality filter")
+        if approved and not score_only:
+            self.generate(approved, model=model)
+        return content_items
+    
+    def _run(self, kind: str, requests: Dict[str, Dict[str, Any]]) -> Dict[str, dict]:
+        """Run requests keyed by url_hash as batch jobs; returns each response's JSON content by url_hash"""
+        if not requests:
+            return {}
+        
+        url_hashes = list(requests)
+        batch_ids = []
+        for start in range(0, len(url_hashes), Config.BATCH_MAX_REQUESTS):
+            chunk = {url_hash: requests[url_hash] for url_hash in url_hashes[start:start + Config.BATCH_MAX_REQUESTS]}
+            path = self._write_requests(kind, chunk)
+            batch_id = self.backend.submit(path, f"brightface {kind} backfill ({len(chunk)} items)")
+            logger.info(f"Submitted {kind} batch {batch_id} with {len(chunk)} requests from {path}")
+            batch_ids.append(batch_id)
+        
+        results = {}
+        for batch_id in batch_ids:
+            status = self._wait(batch_id)
+            if status not in TERMINAL_STATUSES:
+                logger.error(f"Gave up waiting for batch {batch_id} ({status}); its results can be collected later")
+                continue
+            if status != 'completed':
+                logger.warning(f"Batch {batch_id} ended {status}; keeping the requests that completed")
+            results.update(self._collect(batch_id))
+        
+        logger.info(f"{kind} batch results: {len(results)} of {len(requests)} requests succeeded")
+        return results
+    
+    def _write_requests(self, kind: str, requests: Dict[str, Dict[str, Any]]) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{kind}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.jsonl")
+        with open(path, 'w') as f:
+            for url_hash, body in requests.items():
+                f.write(json.dumps({'custom_id': f"{kind}:{url_hash}", 'method': 'POST', 'url': ENDPOINT, 'body': body}) + '\n')
+        return path
+    
+    def _wait(self, batch_id: str) -> str:
+        """Poll until the job finishes or BATCH_MAX_WAIT_HOURS pass; returns the last status seen"""
+        give_up = time.monotonic() + Config.BATCH_MAX_WAIT_HOURS * 3600
+        while True:
+            status, counts = self.backend.status(batch_id)
+            if status in TERMINAL_STATUSES or time.monotonic() >= give_up:
+                logger.info(f"Batch {batch_id} {status}: {counts}")
+                return status
+            
+            logger.info(f"Batch {batch_id} {status}: {counts}; checking again in {Config.BATCH_POLL_SECONDS}s")
+            time.sleep(Config.BATCH_POLL_SECONDS)
+    
+    def _collect(self, batch_id: str) -> Dict[str, dict]:
+        """Parsed message content of each successful request in a finished job, keyed by url_hash"""
+        results = {}
+        for line in self.backend.results(batch_id):
+            _, _, url_hash = (line.get('custom_id') or '').partition(':')
+            response = line.get('response') or {}
+            if line.get('error') or response.get('status_code') != 200:
+                logger.warning(f"Batch request {line.get('custom_id')} failed: {line.get('error') or response.get('status_code')}")
+                continue
+            
+            try:
+                results[url_hash] = json.loads(response['body']['choices'][0]['message']['content'])
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                logger.warning(f"Unreadable batch response for {line.get('custom_id')}: {e}")
+        return results
+
+def load_items(path: str) -> List[RSSItem]:
+    """RSS items from a JSON list (the deferred items file format) or JSON lines"""
+    with open(path, 'r') as f:
+        text = f.read()
+    
+    if text.lstrip().startswith('['):
+        records = json.loads(text)
+    else:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [RSSItem.model_validate(record) for record in records]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score and generate content for archived items with the Batch API")
+    parser.add_argument('items', help="JSON list or JSON lines of RSS items")
+    parser.add_argument('--output', help="JSON lines file for the resulting content items")
+    parser.add_argument('--model', help=f"Model for every request (default {Config.OPENAI_MODEL})")
+    parser.add_argument('--score-only', action='store_true', help="Score without generating content")
+    parser.add_argument('--local', action='store_true', help="Use the local file-based stand-in (same as BATCH_LOCAL=true)")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    
+    if args.local:
+        Config.BATCH_LOCAL = True
+    
+    rss_items = load_items(args.items)
+    content_items = BatchBackfill().run(rss_items, score_only=args.score_only, model=args.model)
+    
+    output = args.output or os.path.join(Config.BATCH_DIR, f"results-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl")
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output, 'w') as f:
+        for content_item in content_items:
+            f.write(content_item.model_dump_json() + '\n')
+    
+    generated = sum(1 for content_item in content_items if content_item.generated_content)
+    print(f"Backfilled {len(rss_items)} items: {len(content_items)} scored, {generated} with content -> {output}")
@@ -15,6 +15,17 @@ class Config:
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     OPENAI_MODEL = 'gpt-4'  # Using gpt-4 instead of gpt-5 as specified
     
+    # Batched scoring (articles packed into one request)
+    SCORING_BATCH_SIZE = int(os.getenv('SCORING_BATCH_SIZE', '10'))  # 1 disables batching
+    SCORING_BATCH_TOKEN_BUDGET = int(os.getenv('SCORING_BATCH_TOKEN_BUDGET', '6000'))  # prompt + expected output tokens
+    
+    # Concurrent scoring with AsyncOpenAI, kept under the org's rate limits
+    ASYNC_SCORING = os.getenv('ASYNC_SCORING', 'false').lower() == 'true'
+    SCORING_CONCURRENCY = int(os.getenv('SCORING_CONCURRENCY', '8'))  # requests in flight
+    SCORING_MAX_RETRIES = int(os.getenv('SCORING_MAX_RETRIES', '5'))  # retries after a 429
+    OPENAI_RPM_LIMIT = int(os.getenv('OPENAI_RPM_LIMIT', '500'))  # requests/min until headers report the real limit
+    OPENAI_TPM_LIMIT = int(os.getenv('OPENAI_TPM_LIMIT', '10000'))  # tokens/min until headers report the real limit
+    
     # LinkedIn Configuration
     LINKEDIN_CLIENT_ID = os.getenv('LINKEDIN_CLIENT_ID')
     LINKEDIN_CLIENT_SECRET = os.getenv('LINKEDIN_CLIENT_SECRET')
@@ -54,11 +65,146 @@ class Config:
         'https://engineering.linkedin.com/blog.rss'
     ]
     
+    # RSS Fetching
+    RSS_CONCURRENT_FETCH = os.getenv('RSS_CONCURRENT_FETCH', 'true').lower() == 'true'
+    RSS_FETCH_WORKERS = int(os.getenv('RSS_FETCH_WORKERS', '16'))
+    RSS_FEED_TIMEOUT = int(os.getenv('RSS_FEED_TIMEOUT', '30'))  # seconds per feed
+    RSS_CYCLE_TIMEOUT = int(os.getenv('RSS_CYCLE_TIMEOUT', '90'))  # seconds per fetch cycle
+    STREAMING_PIPELINE = os.getenv('STREAMING_PIPELINE', 'false').lower() == 'true'  # score items as feeds complete
+    RSS_PARSE_PROCESSES = int(os.getenv('RSS_PARSE_PROCESSES', '0'))  # 0 parses in the fetching thread
+    RSS_FETCH_BUDGET = int(os.getenv('RSS_FETCH_BUDGET', '200'))  # max feeds per cycle from the feed registry
+    RSS_FETCH_RESERVED_SHARE = float(os.getenv('RSS_FETCH_RESERVED_SHARE', '0.2'))  # of the budget, for the stalest feeds of any priority
+    
+    # Feed health circuit breaker
+    FEED_HEALTH_ENABLED = os.getenv('FEED_HEALTH_ENABLED', 'true').lower() == 'true'
+    FEED_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('FEED_CIRCUIT_FAILURE_THRESHOLD', '3'))
+    FEED_CIRCUIT_BASE_BACKOFF_MINUTES = int(os.getenv('FEED_CIRCUIT_BASE_BACKOFF_MINUTES', '30'))
+    FEED_CIRCUIT_MAX_BACKOFF_MINUTES = int(os.getenv('FEED_CIRCUIT_MAX_BACKOFF_MINUTES', '1440'))
+    FEED_PROBE_TIMEOUT = int(os.getenv('FEED_PROBE_TIMEOUT', '10'))  # seconds for half-open probes
+    
+    # Local state (caches and indexes persisted between runs)
+    DATA_DIR = os.getenv('DATA_DIR', 'data')
+    FEED_CACHE_ENABLED = os.getenv('FEED_CACHE_ENABLED', 'true').lower() == 'true'
+    FEED_CACHE_FILE = os.getenv('FEED_CACHE_FILE', os.path.join(DATA_DIR, 'feed_cache.json'))
+    SEEN_INDEX_FILE = os.getenv('SEEN_INDEX_FILE', os.path.join(DATA_DIR, 'seen_index.sqlite3'))
+    URL_RESOLVER_CACHE_FILE = os.getenv('URL_RESOLVER_CACHE_FILE', os.path.join(DATA_DIR, 'url_resolver.json'))
+    FEED_SCHEDULE_FILE = os.getenv('FEED_SCHEDULE_FILE', os.path.join(DATA_DIR, 'feed_schedule.json'))
+    FEED_HEALTH_FILE = os.getenv('FEED_HEALTH_FILE', os.path.join(DATA_DIR, 'feed_health.json'))
+    # Keys bound per IN (...) lookup in the SQLite stores; SQLite allows 999 bound
+    # parameters per statement before 3.32 and 32766 since, so this fits either
+    SQLITE_BATCH_SIZE = 500
+    
+    # Feed registry (replaces RSS_SOURCES for large source lists; seeded from it when empty)
+    FEED_REGISTRY_ENABLED = os.getenv('FEED_REGISTRY_ENABLED', 'false').lower() == 'true'
+    FEED_REGISTRY_FILE = os.getenv('FEED_REGISTRY_FILE', os.path.join(DATA_DIR, 'feed_registry.sqlite3'))
+    FEED_REGISTRY_OPML = os.getenv('FEED_REGISTRY_OPML')  # optional OPML file imported at startup
+    
+    # Score cache (skips re-scoring an article under the same prompts and model)
+    SCORE_CACHE_ENABLED = os.getenv('SCORE_CACHE_ENABLED', 'true').lower() == 'true'
+    SCORE_CACHE_FILE = os.getenv('SCORE_CACHE_FILE', os.path.join(DATA_DIR, 'score_cache.sqlite3'))
+    SCORE_CACHE_TTL_HOURS = int(os.getenv('SCORE_CACHE_TTL_HOURS', '168'))
+    
+    # Local pre-scorer (skips the LLM for items it is confident are irrelevant)
+    PRE_SCORER_ENABLED = os.getenv('PRE_SCORER_ENABLED', 'false').lower() == 'true'
+    PRE_SCORER_FILE = os.getenv('PRE_SCORER_FILE', os.path.join(DATA_DIR, 'pre_scorer.json'))
+    PRE_SCORER_MIN_EXAMPLES = int(os.getenv('PRE_SCORER_MIN_EXAMPLES', '200'))  # inactive until trained on this many scores
+    PRE_SCORER_DROP_PROBABILITY = float(os.getenv('PRE_SCORER_DROP_PROBABILITY', '0.05'))  # drop below this P(relevant)
+    PRE_SCORER_EXPLORE_RATE = float(os.getenv('PRE_SCORER_EXPLORE_RATE', '0.05'))  # share of drops still scored, for evaluation
+    
+    # Embedding prefilter (orders and prunes items by their nearest previously scored neighbours; needs numpy)
+    EMBEDDING_PREFILTER = os.getenv('EMBEDDING_PREFILTER', 'false').lower() == 'true'
+    EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small')
+    EMBEDDING_INDEX_DIR = os.getenv('EMBEDDING_INDEX_DIR', os.path.join(DATA_DIR, 'embeddings'))
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '100'))  # inputs per embeddings request
+    EMBEDDING_NEIGHBORS = int(os.getenv('EMBEDDING_NEIGHBORS', '10'))
+    EMBEDDING_MIN_INDEX_ITEMS = int(os.getenv('EMBEDDING_MIN_INDEX_ITEMS', '200'))  # priors are ignored until the index is this large
+    EMBEDDING_MIN_PRIOR = float(os.getenv('EMBEDDING_MIN_PRIOR', '3'))  # skip items whose neighbours averaged below this relevance
+    EMBEDDING_INDEX_MAX_ITEMS = int(os.getenv('EMBEDDING_INDEX_MAX_ITEMS', '50000'))
+    
+    # Scoring cascade (cheap model first, OPENAI_MODEL only for borderline or risk-flagged items)
+    SCORING_CASCADE = os.getenv('SCORING_CASCADE', 'false').lower() == 'true'
+    SCORING_CASCADE_MODEL = os.getenv('SCORING_CASCADE_MODEL', 'gpt-4o-mini')
+    SCORING_CASCADE_BAND = int(os.getenv('SCORING_CASCADE_BAND', '1'))  # escalate scores within this distance of MIN_*_SCORE
+    SCORING_CASCADE_AUDIT_RATE = float(os.getenv('SCORING_CASCADE_AUDIT_RATE', '0.05'))  # share of confident scores re-checked
+    SCORING_CASCADE_STATS_FILE = os.getenv('SCORING_CASCADE_STATS_FILE', os.path.join(DATA_DIR, 'scoring_cascade.json'))
+    
+    # Per-cycle budget (0 = unlimited); work beyond it is downgraded or deferred to the next cycle
+    CYCLE_TOKEN_BUDGET = int(os.getenv('CYCLE_TOKEN_BUDGET', '0'))
+    CYCLE_COST_BUDGET = float(os.getenv('CYCLE_COST_BUDGET', '0'))  # USD, from local token estimates
+    CYCLE_TIME_BUDGET_SECONDS = int(os.getenv('CYCLE_TIME_BUDGET_SECONDS', '0'))
+    BUDGET_DOWNGRADE_MODEL = os.getenv('BUDGET_DOWNGRADE_MODEL', 'gpt-4o-mini')  # empty disables downgrading
+    DEFERRED_ITEMS_FILE = os.getenv('DEFERRED_ITEMS_FILE', os.path.join(DATA_DIR, 'deferred_items.json'))
+    DEFERRED_ITEMS_MAX = int(os.getenv('DEFERRED_ITEMS_MAX', '500'))
+    
+    # LLM request coalescing (identical concurrent chat completions share one request)
+    LLM_COALESCE = os.getenv('LLM_COALESCE', 'true').lower() == 'true'
+    LLM_RESPONSE_CACHE = os.getenv('LLM_RESPONSE_CACHE', 'false').lower() == 'true'  # temperature 0 calls, shared across processes
+    LLM_RESPONSE_CACHE_FILE = os.getenv('LLM_RESPONSE_CACHE_FILE', os.path.join(DATA_DIR, 'llm_responses.sqlite3'))
+    LLM_RESPONSE_CACHE_TTL_HOURS = int(os.getenv('LLM_RESPONSE_CACHE_TTL_HOURS', '24'))
+    LLM_INFLIGHT_TIMEOUT = int(os.getenv('LLM_INFLIGHT_TIMEOUT', '180'))  # seconds before another process's claim is ignored
+    
+    # LLM call deadlines and hedging (a duplicate request is sent once a call runs past its usual latency)
+    LLM_REQUEST_TIMEOUT = int(os.getenv('LLM_REQUEST_TIMEOUT', '120'))  # seconds per call, capped by what is left of the cycle
+    LLM_HEDGING = os.getenv('LLM_HEDGING', 'false').lower() == 'true'
+    LLM_HEDGE_QUANTILE = float(os.getenv('LLM_HEDGE_QUANTILE', '0.95'))
+    LLM_HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '20'))
+    LLM_HEDGE_DEFAULT_DELAY = float(os.getenv('LLM_HEDGE_DEFAULT_DELAY', '30'))  # seconds, until enough latencies are known
+    LLM_LATENCY_WINDOW = int(os.getenv('LLM_LATENCY_WINDOW', '1000'))  # samples per histogram before older ones decay
+    LLM_LATENCY_FILE = os.getenv('LLM_LATENCY_FILE', os.path.join(DATA_DIR, 'llm_latency.json'))
+    
+    # Batch API backfill (bulk scoring and generation without interactive latency)
+    BATCH_DIR = os.getenv('BATCH_DIR', os.path.join(DATA_DIR, 'batches'))  # request/result JSONL files
+    BATCH_LOCAL = os.getenv('BATCH_LOCAL', 'false').lower() == 'true'  # run jobs with the local file-based stand-in
+    BATCH_LOCAL_ENDPOINT = os.getenv('BATCH_LOCAL_ENDPOINT')  # OpenAI-compatible server for local jobs; unset answers with offline stubs
+    BATCH_COMPLETION_WINDOW = os.getenv('BATCH_COMPLETION_WINDOW', '24h')
+    BATCH_POLL_SECONDS = int(os.getenv('BATCH_POLL_SECONDS', '60'))
+    BATCH_MAX_WAIT_HOURS = float(os.getenv('BATCH_MAX_WAIT_HOURS', '25'))
+    BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', '50000'))  # per job (the Batch API limit)
+    
+    # HTTP fixtures for offline benchmarking: '' (live) | record | replay
+    HTTP_FIXTURE_MODE = os.getenv('HTTP_FIXTURE_MODE', '').lower()
+    HTTP_FIXTURE_FILE = os.getenv('HTTP_FIXTURE_FILE', os.path.join(DATA_DIR, 'fixtures', 'http_fixtures.json.gz'))
+    HTTP_FIXTURE_REPLAY_LATENCY = os.getenv('HTTP_FIXTURE_REPLAY_LATENCY', 'false').lower() == 'true'
+    
+    # Article extraction (full text of the linked page)
+    ARTICLE_EXTRACTION = os.getenv('ARTICLE_EXTRACTION', 'false').lower() == 'true'
+    ARTICLE_EXTRACT_WORKERS = int(os.getenv('ARTICLE_EXTRACT_WORKERS', '4'))
+    ARTICLE_FETCH_TIMEOUT = int(os.getenv('ARTICLE_FETCH_TIMEOUT', '15'))  # seconds per page
+    ARTICLE_MAX_BYTES = int(os.getenv('ARTICLE_MAX_BYTES', '2000000'))  # larger pages are truncated
+    ARTICLE_CACHE_DIR = os.getenv('ARTICLE_CACHE_DIR', os.path.join(DATA_DIR, 'articles'))
+    ARTICLE_CACHE_MAX_MB = int(os.getenv('ARTICLE_CACHE_MAX_MB', '200'))
+    ARTICLE_CACHE_MAX_ENTRIES = int(os.getenv('ARTICLE_CACHE_MAX_ENTRIES', '5000'))
+    ARTICLE_FAILURE_TTL_HOURS = float(os.getenv('ARTICLE_FAILURE_TTL_HOURS', '6'))  # before a failed page is tried again
+    
+    # Prompt input compaction (feed HTML is stripped and cut at sentence boundaries)
+    PROMPT_SUMMARY_TOKENS = int(os.getenv('PROMPT_SUMMARY_TOKENS', '150'))
+    PROMPT_EXCERPT_TOKENS = int(os.getenv('PROMPT_EXCERPT_TOKENS', '350'))  # article text beyond the summary
+    
+    # Adaptive per-feed polling (replaces the fixed 2-hour cycle when enabled)
+    ADAPTIVE_POLLING = os.getenv('ADAPTIVE_POLLING', 'false').lower() == 'true'
+    ADAPTIVE_POLL_TICK_MINUTES = int(os.getenv('ADAPTIVE_POLL_TICK_MINUTES', '15'))
+    ADAPTIVE_POLL_MIN_MINUTES = int(os.getenv('ADAPTIVE_POLL_MIN_MINUTES', '15'))
+    ADAPTIVE_POLL_MAX_MINUTES = int(os.getenv('ADAPTIVE_POLL_MAX_MINUTES', '1440'))
+    ADAPTIVE_POLL_JITTER = float(os.getenv('ADAPTIVE_POLL_JITTER', '0.1'))
+    
     # Content Quality Thresholds
     MIN_RELEVANCE_SCORE = 7
     MIN_VIRALITY_SCORE = 6
     MAX_FRESHNESS_DAYS = 21
     
+    # Seen-set backend: 'set' (exact, unbounded) or 'bloom' (rotating Bloom filter, bounded memory)
+    SEEN_SET_BACKEND = os.getenv('SEEN_SET_BACKEND', 'set')
+    SEEN_SET_FALSE_POSITIVE_RATE = float(os.getenv('SEEN_SET_FALSE_POSITIVE_RATE', '0.001'))
+    SEEN_SET_BUCKETS = int(os.getenv('SEEN_SET_BUCKETS', '4'))
+    SEEN_SET_INITIAL_CAPACITY = int(os.getenv('SEEN_SET_INITIAL_CAPACITY', '10000'))
+    
+    # Near-duplicate story detection (MinHash/LSH over title+summary)
+    NEAR_DUPLICATE_DETECTION = os.getenv('NEAR_DUPLICATE_DETECTION', 'true').lower() == 'true'
+    NEAR_DUPLICATE_THRESHOLD = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', '0.5'))
+    NEAR_DUPLICATE_BANDS = 16
+    NEAR_DUPLICATE_ROWS = 4
+    NEAR_DUPLICATE_WINDOW_HOURS = int(os.getenv('NEAR_DUPLICATE_WINDOW_HOURS', '72'))
+    
     # Posting Schedule (UK time)
     POSTING_TIMES = ['08:30', '10:00', '15:30', '17:00']
     
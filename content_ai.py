@@ -3,36 +3,40 @@ Content AI System for Brightface Content Engine
 """
 import json
 import logging
-from typing import Optional
-from openai import OpenAI
+from typing import Optional, Tuple, List
 from datetime import datetime
 
 from models import RSSItem, ContentScore, GeneratedContent, SocialPost, BlogDraft
 from config import Config
+from prompt_compactor import compact_item
+from cost_estimator import CostEstimate, estimate_request
+from llm_client import create_openai_client
 
 logger = logging.getLogger(__name__)
 
+# Expected completion sizes: social posts plus a 600–900 word blog, or the blog alone
+CONTENT_OUTPUT_TOKENS = 1800
+BLOG_OUTPUT_TOKENS = 1400
+
 class ContentAI:
     """AI system for generating social posts and blog content"""
     
     def __init__(self):
-        self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
+        self.client = create_openai_client()
         self.system_prompt = """You are the voice of brightface.ai. Tone: confident, modern, helpful, lightly playful. Avoid hype. Connect ideas to personal branding and first impressions. Never fabricate facts; cite only what's provided."""
     
-    def generate_content(self, rss_item: RSSItem, score: ContentScore) -> Optional[GeneratedContent]:
+    def estimate_content_cost(self, rss_item: RSSItem, score: ContentScore, model: Optional[str] = None) -> CostEstimate:
+        """Pre-flight estimate for generate_content"""
+        return estimate_request(self.system_prompt, self._build_content_prompt(rss_item, score), CONTENT_OUTPUT_TOKENS, model)
+    
+    def estimate_blog_cost(self, rss_item: RSSItem, score: ContentScore, model: Optional[str] = None) -> CostEstimate:
+        """Pre-flight estimate for generate_blog_content"""
+        return estimate_request(self.system_prompt, self._build_blog_prompt(rss_item, score), BLOG_OUTPUT_TOKENS, model)
+    
+    def generate_content(self, rss_item: RSSItem, score: ContentScore, model: Optional[str] = None) -> Optional[GeneratedContent]:
         """Generate social posts and blog content from scored RSS item"""
         try:
-            user_prompt = self._build_content_prompt(rss_item, score)
-            
-            response = self.client.chat.completions.create(
-                model=Config.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.7
-            )
+            response = self.client.chat.completions.create(prompt_type='content', **self._content_request(rss_item, score, model))
             
             result = json.loads(response.choices[0].message.content)
             
@@ -46,18 +50,39 @@ class ContentAI:
             logger.error(f"Error generating content for '{rss_item.title}': {e}")
             return None
     
+    def _request(self, user_prompt: str, model: Optional[str] = None) -> dict:
+        """Chat completion arguments for a generation prompt (shared by live and batch generation)"""
+        return dict(
+            model=model or Config.OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.7
+        )
+    
+    def _content_request(self, rss_item: RSSItem, score: ContentScore, model: Optional[str] = None) -> dict:
+        return self._request(self._build_content_prompt(rss_item, score), model)
+    
+    def _blog_request(self, rss_item: RSSItem, score: ContentScore, model: Optional[str] = None) -> dict:
+        return self._request(self._build_blog_prompt(rss_item, score), model)
+    
     def _build_content_prompt(self, rss_item: RSSItem, score: ContentScore) -> str:
         """Build the content generation prompt"""
         # Build hashtags string
         hashtags_str = ", ".join(score.keywords[:4])  # Limit to 4 keywords
+        summary, excerpt = compact_item(rss_item)
+        excerpt_line = f"\nExcerpt: {excerpt}" if excerpt else ""
+        also_line = f"\nAlso reported at: {', '.join(rss_item.duplicate_urls)}" if rss_item.duplicate_urls else ""
         
         return f"""Context:
 Title: {rss_item.title}
 Source: {rss_item.source}
-Summary: {rss_item.summary}
+Summary: {summary}{excerpt_line}
 Angle(s): {', '.join(score.angles)}
 Hook: {score.one_line_take}
-URL: {rss_item.url}
+URL: {rss_item.url}{also_line}
 
 Brand rules:
 - Mention how great first impressions + profile photos drive outcomes.
@@ -161,20 +186,10 @@ Produce JSON exactly:
             )
         )
     
-    def generate_blog_content(self, rss_item: RSSItem, score: ContentScore) -> Optional[GeneratedContent]:
+    def generate_blog_content(self, rss_item: RSSItem, score: ContentScore, model: Optional[str] = None) -> Optional[GeneratedContent]:
         """Generate blog content only (for blog-focused mode)"""
         try:
-            user_prompt = self._build_blog_prompt(rss_item, score)
-            
-            response = self.client.chat.completions.create(
-                model=Config.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.7
-            )
+            response = self.client.chat.completions.create(prompt_type='blog', **self._blog_request(rss_item, score, model))
             
             result = json.loads(response.choices[0].message.content)
             
@@ -192,14 +207,17 @@ Produce JSON exactly:
         """Build the blog-focused content generation prompt"""
         # Build hashtags string
         hashtags_str = ", ".join(score.keywords[:4])  # Limit to 4 keywords
+        summary, excerpt = compact_item(rss_item)
+        excerpt_line = f"\nExcerpt: {excerpt}" if excerpt else ""
+        also_line = f"\nAlso reported at: {', '.join(rss_item.duplicate_urls)}" if rss_item.duplicate_urls else ""
         
         return f"""Context:
 Title: {rss_item.title}
 Source: {rss_item.source}
-Summary: {rss_item.summary}
+Summary: {summary}{excerpt_line}
 Angle(s): {', '.join(score.angles)}
 Hook: {score.one_line_take}
-URL: {rss_item.url}
+URL: {rss_item.url}{also_line}
 
 Brand rules:
 - Focus on AI headshots, personal branding, and professional photography
@@ -0,0 +1,183 @@
+"""
+Token and cost estimation for Brightface Content Engine
+"""
+import time
+import logging
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+from config import Config
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# USD per 1M tokens (prompt, completion); unknown models are priced like gpt-4 so estimates err high
+MODEL_PRICES = {
+    'gpt-4': (30.00, 60.00),
+    'gpt-4-turbo': (10.00, 30.00),
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-3.5-turbo': (0.50, 1.50),
+    'text-embedding-3-small': (0.02, 0.0),
+    'text-embedding-3-large': (0.13, 0.0),
+}
+
+# Chat format adds a few tokens per message on top of the content
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+class CostEstimate(BaseModel):
+    """Pre-flight size and price of one or more requests"""
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+    
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+    
+    def __add__(self, other: 'CostEstimate') -> 'CostEstimate':
+        return CostEstimate(
+            model=self.model if self.model == other.model else 'mixed',
+            prompt_tokens=self.prompt_tokens + other.prompt_tokens,
+            completion_tokens=self.completion_tokens + other.completion_tokens,
+            cost=self.cost + other.cost
+        )
+    
+    def scaled(self, factor: float) -> 'CostEstimate':
+        """The same estimate for `factor` times as many requests"""
+        return CostEstimate(
+            model=self.model,
+            prompt_tokens=int(self.prompt_tokens * factor),
+            completion_tokens=int(self.completion_tokens * factor),
+            cost=self.cost * factor
+        )
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('cl100k_base')
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Tokens in `text` for `model`, using tiktoken when installed (about 4 characters per token otherwise)"""
+    encoding = _encoding(model or Config.OPENAI_MODEL)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+def price(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """USD cost of a request"""
+    # Dated snapshots (gpt-4o-mini-2024-07-18) share their family's price; longest prefix wins
+    family = max((name for name in MODEL_PRICES if model.startswith(name)), key=len, default='gpt-4')
+    prompt_price, completion_price = MODEL_PRICES[family]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+def estimate_request(system_prompt: str, user_prompt: str, completion_tokens: int,
+                     model: Optional[str] = None) -> CostEstimate:
+    """Estimate one chat completion from its prompts and expected completion size"""
+    model = model or Config.OPENAI_MODEL
+    prompt_tokens = sum(
+        count_tokens(text, model) + _MESSAGE_OVERHEAD_TOKENS
+        for text in (system_prompt, user_prompt) if text
+    )
+    return CostEstimate(
+        model=model,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        cost=price(model, prompt_tokens, completion_tokens)
+    )
+
+class CycleBudget:
+    """Token, dollar and wall-clock allowance for one content cycle (0 means unlimited)"""
+    
+    PROCEED = 'proceed'
+    DOWNGRADE = 'downgrade'
+    DEFER = 'defer'
+    STOP = 'stop'
+    
+    def __init__(self, max_tokens: Optional[int] = None, max_cost: Optional[float] = None,
+                 max_seconds: Optional[float] = None):
+        self.max_tokens = Config.CYCLE_TOKEN_BUDGET if max_tokens is None else max_tokens
+        self.max_cost = Config.CYCLE_COST_BUDGET if max_cost is None else max_cost
+        self.max_seconds = Config.CYCLE_TIME_BUDGET_SECONDS if max_seconds is None else max_seconds
+        self.downgrade_model = Config.BUDGET_DOWNGRADE_MODEL
+        
+        self.started = time.monotonic()
+        self.tokens = 0
+        self.cost = 0.0
+        self.decisions = {self.PROCEED: 0, self.DOWNGRADE: 0, self.DEFER: 0, self.STOP: 0}
+    
+    def out_of_time(self) -> bool:
+        return bool(self.max_seconds) and time.monotonic() - self.started >= self.max_seconds
+    
+    def deadline(self) -> Optional[float]:
+        """time.monotonic() value at which the time budget runs out (None if unlimited)"""
+        return self.started + self.max_seconds if self.max_seconds else None
+    
+    def fits(self, estimate: CostEstimate) -> bool:
+        """Whether the estimated work fits in what is left of the token and dollar budgets"""
+        if self.max_tokens and self.tokens + estimate.total_tokens > self.max_tokens:
+            return False
+        if self.max_cost and self.cost + estimate.cost > self.max_cost:
+            return False
+        return True
+    
+    def decide(self, estimate: CostEstimate, downgraded: Optional[CostEstimate] = None) -> str:
+        """Proceed, downgrade to the cheaper estimate, defer to a later cycle, or stop when time is up"""
+        if self.out_of_time():
+            decision = self.STOP
+        elif self.fits(estimate):
+            decision = self.PROCEED
+        elif downgraded is not None and self.fits(downgraded):
+            decision = self.DOWNGRADE
+        else:
+            decision = self.DEFER
+        
+        self.decisions[decision] += 1
+        if decision != self.PROCEED:
+            logger.info(f"Budget {decision}: estimated {estimate.total_tokens} tokens / ${estimate.cost:.4f}, "
+                        f"spent {self.tokens} tokens / ${self.cost:.4f}")
+        return decision
+    
+    def plan(self, estimate_cost: Callable[[Optional[str]], CostEstimate]) -> Tuple[str, Optional[str]]:
+        """Decide on work priced by `estimate_cost(model)` and charge it; returns the decision and a model override"""
+        estimate = estimate_cost(None)
+        downgraded = None
+        if not self.fits(estimate) and self.downgrade_model and self.downgrade_model != estimate.model:
+            downgraded = estimate_cost(self.downgrade_model)
+        
+        decision = self.decide(estimate, downgraded)
+        if decision == self.PROCEED:
+            self.charge(estimate)
+            return decision, None
+        if decision == self.DOWNGRADE:
+            self.charge(downgraded)
+            return decision, self.downgrade_model
+        return decision, None
+    
+    def charge(self, estimate: CostEstimate):
+        """Count work that was sent"""
+        self.tokens += estimate.total_tokens
+        self.cost += estimate.cost
+    
+    def stats(self) -> Dict[str, Any]:
+        """Spend against each budget and how often work was downgraded or deferred"""
+        return {
+            'estimated_tokens': self.tokens,
+            'estimated_cost': round(self.cost, 4),
+            'elapsed_seconds': round(time.monotonic() - self.started, 1),
+            'token_budget': self.max_tokens or None,
+            'cost_budget': self.max_cost or None,
+            'time_budget': self.max_seconds or None,
+            **self.decisions
+        }
@@ -0,0 +1,267 @@
+"""
+Embedding relevance prefilter for Brightface Content Engine
+"""
+import os
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import openai
+
+from models import RSSItem, ContentScore
+from config import Config
+
+try:
+    import numpy as np
+    EMBEDDINGS_AVAILABLE = True
+except ImportError:
+    np = None
+    EMBEDDINGS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingIndex:
+    """Memory-mapped matrix of past item embeddings labelled with their LLM relevance scores"""
+    
+    def __init__(self, directory: Optional[str] = None, client: Optional[openai.OpenAI] = None):
+        if not EMBEDDINGS_AVAILABLE:
+            raise RuntimeError("numpy is required for the embedding prefilter (pip install numpy)")
+        
+        self.directory = directory or Config.EMBEDDING_INDEX_DIR
+        self.client = client or openai.OpenAI(api_key=Config.OPENAI_API_KEY)
+        self.model = Config.EMBEDDING_MODEL
+        self.threshold = Config.MIN_RELEVANCE_SCORE
+        
+        self._vectors_path = os.path.join(self.directory, 'vectors.npy')
+        self._labels_path = os.path.join(self.directory, 'labels.npy')
+        self._meta_path = os.path.join(self.directory, 'meta.json')
+        
+        self._lock = threading.Lock()
+        # Rows on disk (read-only memmap) plus rows labelled since the last save
+        self._vectors = None
+        self._labels = None
+        self._url_hashes: List[str] = []
+        self._new_vectors: List[Any] = []
+        self._new_labels: List[float] = []
+        self._row_of: Dict[str, int] = {}
+        # Embeddings of items not yet labelled, so scoring them does not re-embed
+        self._pending: Dict[str, Any] = {}
+        self._api_calls = 0
+        self._load()
+    
+    def _load(self):
+        """Map the saved matrix into memory; rows are paged in on first use"""
+        if not os.path.exists(self._meta_path):
+            return
+        
+        try:
+            with open(self._meta_path, 'r') as f:
+                meta = json.load(f)
+            if meta.get('model') != self.model:
+                logger.info(f"Embedding index was built with {meta.get('model')}, starting a new one for {self.model}")
+                return
+            
+            self._vectors = np.load(self._vectors_path, mmap_mode='r')
+            self._labels = np.load(self._labels_path, mmap_mode='r')
+            self._url_hashes = meta.get('url_hashes', [])
+            self._row_of = {url_hash: row for row, url_hash in enumerate(self._url_hashes)}
+        except Exception as e:
+            logger.error(f"Error loading embedding index {self.directory}: {e}")
+            self._vectors, self._labels, self._url_hashes, self._row_of = None, None, [], {}
+    
+    def save(self):
+        """Write the index, keeping the most recent EMBEDDING_INDEX_MAX_ITEMS rows"""
+        with self._lock:
+            # Unlabelled embeddings belong to items this cycle chose not to score
+            self._pending.clear()
+            if not self._new_vectors:
+                return
+            
+            vectors, labels = self._matrix()
+            url_hashes = list(self._url_hashes)
+            if len(url_hashes) > Config.EMBEDDING_INDEX_MAX_ITEMS:
+                start = len(url_hashes) - Config.EMBEDDING_INDEX_MAX_ITEMS
+                vectors, labels, url_hashes = vectors[start:], labels[start:], url_hashes[start:]
+            
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                # The old files stay mapped until replaced, so write copies first
+                for path, array in ((self._vectors_path, vectors), (self._labels_path, labels)):
+                    with open(f"{path}.tmp", 'wb') as f:
+                        np.save(f, np.ascontiguousarray(array))
+                with open(f"{self._meta_path}.tmp", 'w') as f:
+                    json.dump({'model': self.model, 'url_hashes': url_hashes}, f)
+                
+                os.replace(f"{self._vectors_path}.tmp", self._vectors_path)
+                os.replace(f"{self._labels_path}.tmp", self._labels_path)
+                os.replace(f"{self._meta_path}.tmp", self._meta_path)
+            except Exception as e:
+                logger.error(f"Error saving embedding index {self.directory}: {e}")
+                return
+            
+            self._vectors = np.load(self._vectors_path, mmap_mode='r')
+            self._labels = np.load(self._labels_path, mmap_mode='r')
+            self._url_hashes = url_hashes
+            self._row_of = {url_hash: row for row, url_hash in enumerate(url_hashes)}
+            self._new_vectors, self._new_labels = [], []
+    
+    def _matrix(self) -> Tuple[Any, Any]:
+        """All labelled rows as (vectors, labels); callers hold the lock"""
+        vectors = [self._vectors] if self._vectors is not None else []
+        labels = [self._labels] if self._labels is not None else []
+        if self._new_vectors:
+            vectors.append(np.vstack(self._new_vectors))
+            labels.append(np.asarray(self._new_labels, dtype=np.float32))
+        
+        if not vectors:
+            return None, None
+        if len(vectors) == 1:
+            return vectors[0], labels[0]
+        return np.concatenate(vectors), np.concatenate(labels)
+    
+    def _blocks(self) -> List[Tuple[Any, Any, int]]:
+        """Labelled rows as (vectors, labels, first row) blocks: the saved memmap, then unsaved rows; callers hold the lock"""
+        blocks = []
+        stored = len(self._labels) if self._labels is not None else 0
+        if stored:
+            blocks.append((self._vectors, self._labels, 0))
+        if self._new_vectors:
+            blocks.append((np.vstack(self._new_vectors), np.asarray(self._new_labels, dtype=np.float32), stored))
+        return blocks
+    
+    @staticmethod
+    def _text(rss_item: RSSItem) -> str:
+        return f"{rss_item.title}\n{rss_item.summary}"[:2000]
+    
+    def embed(self, rss_items: List[RSSItem]) -> Dict[str, Any]:
+        """Unit-length embeddings for items, calling the API only for ones not seen before"""
+        vectors = {}
+        missing = []
+        with self._lock:
+            for rss_item in rss_items:
+                if rss_item.url_hash in self._pending:
+                    vectors[rss_item.url_hash] = self._pending[rss_item.url_hash]
+                elif rss_item.url_hash in self._row_of:
+                    vectors[rss_item.url_hash] = self._row(self._row_of[rss_item.url_hash])
+                elif rss_item.url_hash not in vectors:
+                    missing.append(rss_item)
+        
+        missing = list({rss_item.url_hash: rss_item for rss_item in missing}.values())
+        for start in range(0, len(missing), Config.EMBEDDING_BATCH_SIZE):
+            batch = missing[start:start + Config.EMBEDDING_BATCH_SIZE]
+            response = self.client.embeddings.create(model=self.model, input=[self._text(rss_item) for rss_item in batch])
+            self._api_calls += 1
+            
+            matrix = np.asarray([data.embedding for data in sorted(response.data, key=lambda data: data.index)], dtype=np.float32)
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            
+            with self._lock:
+                for rss_item, vector in zip(batch, matrix):
+                    self._pending[rss_item.url_hash] = vector
+                    vectors[rss_item.url_hash] = vector
+        
+        return vectors
+    
+    def _row(self, row: int):
+        stored = len(self._labels) if self._labels is not None else 0
+        return self._vectors[row] if row < stored else self._new_vectors[row - stored]
+    
+    def priors(self, rss_items: List[RSSItem]) -> Dict[str, Optional[float]]:
+        """Similarity-weighted mean relevance of each item's nearest labelled neighbours (None if unknown)"""
+        if not rss_items:
+            return {}
+        
+        # Embed even while the index is small: the vectors are kept for labelling after scoring
+        vectors = self.embed(rss_items)
+        with self._lock:
+            labelled = len(self._url_hashes)
+        if labelled < Config.EMBEDDING_MIN_INDEX_ITEMS:
+            return {rss_item.url_hash: None for rss_item in rss_items}
+        
+        url_hashes = [rss_item.url_hash for rss_item in rss_items]
+        queries = np.vstack([vectors[url_hash] for url_hash in url_hashes])
+        
+        with self._lock:
+            # The saved rows are scored straight from the memmap and the unsaved ones separately,
+            # so the matrix on disk is never copied to append a few new rows
+            blocks = self._blocks()
+            own_rows = [self._row_of.get(url_hash) for url_hash in url_hashes]
+        if not blocks:
+            return {url_hash: None for url_hash in url_hashes}
+        
+        k = Config.EMBEDDING_NEIGHBORS
+        candidate_similarities, candidate_labels = [], []
+        for block_vectors, block_labels, offset in blocks:
+            similarities = queries @ block_vectors.T
+            
+            # An item already in the index must not count as its own neighbour
+            for i, row in enumerate(own_rows):
+                if row is not None and offset <= row < offset + len(block_labels):
+                    similarities[i, row - offset] = -np.inf
+            
+            block_k = min(k, len(block_labels))
+            top = np.argpartition(-similarities, block_k - 1, axis=1)[:, :block_k]
+            candidate_similarities.append(np.take_along_axis(similarities, top, axis=1))
+            candidate_labels.append(np.asarray(block_labels)[top])
+        
+        # Merge each block's nearest neighbours into the overall top k
+        similarities = np.concatenate(candidate_similarities, axis=1)
+        labels = np.concatenate(candidate_labels, axis=1)
+        k = min(k, similarities.shape[1])
+        neighbours = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        weights = np.clip(np.take_along_axis(similarities, neighbours, axis=1), 0, None)
+        totals = weights.sum(axis=1)
+        means = (weights * np.take_along_axis(labels, neighbours, axis=1)).sum(axis=1) / np.maximum(totals, 1e-12)
+        
+        return {
+            url_hash: float(mean) if total > 0 else None
+            for url_hash, mean, total in zip(url_hashes, means, totals)
+        }
+    
+    def rank(self, rss_items: List[RSSItem]) -> Tuple[List[RSSItem], List[RSSItem]]:
+        """Order items by relevance prior (best first) and drop those below EMBEDDING_MIN_PRIOR"""
+        priors = self.priors(rss_items)
+        
+        kept, dropped = [], []
+        for rss_item in rss_items:
+            prior = priors[rss_item.url_hash]
+            if prior is not None and prior < Config.EMBEDDING_MIN_PRIOR:
+                dropped.append(rss_item)
+                logger.info(f"Embedding prefilter dropped '{rss_item.title}' (prior={prior:.1f})")
+            else:
+                kept.append(rss_item)
+        
+        # Items with no usable neighbours rank as if right at the relevance threshold
+        kept.sort(key=lambda rss_item: -(priors[rss_item.url_hash] if priors[rss_item.url_hash] is not None else self.threshold))
+        return kept, dropped
+    
+    def add(self, rss_item: RSSItem, score: ContentScore):
+        """Label an item's embedding with its LLM relevance score"""
+        with self._lock:
+            if rss_item.url_hash in self._row_of:
+                return
+            vector = self._pending.pop(rss_item.url_hash, None)
+        
+        if vector is None:
+            vector = self.embed([rss_item])[rss_item.url_hash]
+            with self._lock:
+                self._pending.pop(rss_item.url_hash, None)
+        
+        with self._lock:
+            if rss_item.url_hash in self._row_of:
+                return
+            self._row_of[rss_item.url_hash] = len(self._url_hashes)
+            self._url_hashes.append(rss_item.url_hash)
+            self._new_vectors.append(vector)
+            self._new_labels.append(float(score.relevance_score))
+    
+    def stats(self) -> Dict[str, Any]:
+        """Index size and embedding API usage for this process"""
+        with self._lock:
+            return {
+                'entries': len(self._url_hashes),
+                'unsaved': len(self._new_vectors),
+                'api_calls': self._api_calls,
+                'active': len(self._url_hashes) >= Config.EMBEDDING_MIN_INDEX_ITEMS
+            }
@@ -0,0 +1,95 @@
+"""
+Conditional-GET validator cache for RSS feeds
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from config import Config
+from seen_index import DEFAULT_PIPELINE
+
+logger = logging.getLogger(__name__)
+
+def content_digest(content: bytes) -> str:
+    """Digest of a feed body, used to spot unchanged feeds that ignore conditional GET"""
+    return hashlib.sha256(content).hexdigest()
+
+class FeedCache:
+    """Persists ETag, Last-Modified and body digest per feed URL for one pipeline"""
+    
+    def __init__(self, path: Optional[str] = None, pipeline: str = DEFAULT_PIPELINE):
+        # Validators follow the seen index: a 304 for one pipeline says nothing about what another has seen
+        if path is None:
+            root, ext = os.path.splitext(Config.FEED_CACHE_FILE)
+            path = Config.FEED_CACHE_FILE if pipeline == DEFAULT_PIPELINE else f"{root}-{pipeline}{ext}"
+        self.path = path
+        self._entries: Dict[str, Dict[str, Optional[str]]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+    
+    def _load(self):
+        """Load cached validators from disk"""
+        if not os.path.exists(self.path):
+            return
+        
+        try:
+            with open(self.path, 'r') as f:
+                self._entries = json.load(f)
+            logger.info(f"Loaded validators for {len(self._entries)} feeds from {self.path}")
+        except Exception as e:
+            logger.error(f"Error loading feed cache {self.path}: {e}")
+            self._entries = {}
+    
+    def conditional_headers(self, feed_url: str) -> Dict[str, str]:
+        """Build If-None-Match / If-Modified-Since headers for a feed"""
+        with self._lock:
+            entry = self._entries.get(feed_url, {})
+        
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        
+        return headers
+    
+    def is_unchanged(self, feed_url: str, digest: str) -> bool:
+        """Check whether a body digest matches the one stored for a feed"""
+        with self._lock:
+            return self._entries.get(feed_url, {}).get('digest') == digest
+    
+    def update(self, feed_url: str, etag: Optional[str], last_modified: Optional[str], digest: str):
+        """Store new validators for a feed"""
+        with self._lock:
+            self._entries[feed_url] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'digest': digest,
+                'fetched_at': datetime.now().isoformat()
+            }
+            self._dirty = True
+    
+    def save(self):
+        """Write the cache to disk if anything changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = dict(self._entries)
+            self._dirty = False
+        
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving feed cache {self.path}: {e}")
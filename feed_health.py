@@ -0,0 +1,168 @@
+"""
+Feed health tracking and circuit breaking for Brightface Content Engine
+"""
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class FeedHealthRegistry:
+    """Records per-feed latency and failures, and opens a circuit on repeated errors"""
+    
+    # Weight of the newest sample in the latency moving average
+    SMOOTHING = 0.3
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or Config.FEED_HEALTH_FILE
+        self.failure_threshold = Config.FEED_CIRCUIT_FAILURE_THRESHOLD
+        self.base_backoff = Config.FEED_CIRCUIT_BASE_BACKOFF_MINUTES * 60
+        self.max_backoff = Config.FEED_CIRCUIT_MAX_BACKOFF_MINUTES * 60
+        
+        self._feeds: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+    
+    def _load(self):
+        """Load feed health from disk"""
+        if not os.path.exists(self.path):
+            return
+        
+        try:
+            with open(self.path, 'r') as f:
+                self._feeds = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading feed health {self.path}: {e}")
+            self._feeds = {}
+    
+    def save(self):
+        """Write feed health to disk"""
+        with self._lock:
+            feeds = {feed_url: dict(state) for feed_url, state in self._feeds.items()}
+        
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(feeds, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving feed health {self.path}: {e}")
+    
+    def _state(self, feed_url: str) -> Dict[str, Any]:
+        state = self._feeds.get(feed_url)
+        if state is None:
+            state = self._feeds[feed_url] = {
+                'circuit': CLOSED,
+                'requests': 0,
+                'successes': 0,
+                'failures': 0,
+                'parse_failures': 0,
+                'consecutive_failures': 0,
+                'last_status': None,
+                'last_error': None,
+                'last_latency_ms': None,
+                'avg_latency_ms': None,
+                'backoff_seconds': 0,
+                'retry_at': None,
+                'last_success_at': None
+            }
+        return state
+    
+    def allow_request(self, feed_url: str) -> bool:
+        """Check whether a feed may be fetched; lets one probe through once the backoff has elapsed"""
+        with self._lock:
+            state = self._state(feed_url)
+            
+            if state['circuit'] == CLOSED:
+                return True
+            
+            # A probe that never reported back (e.g. cut off by the cycle deadline) may be retried too
+            if time.time() >= state['retry_at']:
+                state['circuit'] = HALF_OPEN
+                state['retry_at'] = time.time() + 2 * Config.RSS_FEED_TIMEOUT
+                logger.info(f"Probing feed after {state['backoff_seconds']}s backoff: {feed_url}")
+                return True
+            
+            return False
+    
+    def is_probing(self, feed_url: str) -> bool:
+        """Check whether the next fetch of a feed is a half-open probe"""
+        with self._lock:
+            return self._feeds.get(feed_url, {}).get('circuit') == HALF_OPEN
+    
+    def _record_latency(self, state: Dict[str, Any], latency: float):
+        latency_ms = round(latency * 1000, 1)
+        state['last_latency_ms'] = latency_ms
+        avg = state['avg_latency_ms']
+        state['avg_latency_ms'] = latency_ms if avg is None else round((1 - self.SMOOTHING) * avg + self.SMOOTHING * latency_ms, 1)
+    
+    def record_success(self, feed_url: str, latency: float, status_code: Optional[int] = None):
+        """Record a successful fetch and close the feed's circuit"""
+        with self._lock:
+            state = self._state(feed_url)
+            state['requests'] += 1
+            state['successes'] += 1
+            state['consecutive_failures'] = 0
+            state['last_status'] = status_code
+            state['last_success_at'] = datetime.now().isoformat()
+            self._record_latency(state, latency)
+            
+            if state['circuit'] != CLOSED:
+                logger.info(f"Feed recovered, closing circuit: {feed_url}")
+            state['circuit'] = CLOSED
+            state['backoff_seconds'] = 0
+            state['retry_at'] = None
+    
+    def record_failure(self, feed_url: str, latency: float, error: str,
+                       status_code: Optional[int] = None, parse_error: bool = False):
+        """Record a failed fetch, opening or re-opening the circuit as needed"""
+        with self._lock:
+            state = self._state(feed_url)
+            state['requests'] += 1
+            state['failures'] += 1
+            state['consecutive_failures'] += 1
+            state['last_status'] = status_code
+            state['last_error'] = error[:500]
+            if parse_error:
+                state['parse_failures'] += 1
+            self._record_latency(state, latency)
+            
+            if state['circuit'] == HALF_OPEN:
+                # Failed probe: back off exponentially
+                state['backoff_seconds'] = min(self.max_backoff, max(self.base_backoff, state['backoff_seconds'] * 2))
+            elif state['circuit'] == CLOSED and state['consecutive_failures'] >= self.failure_threshold:
+                state['backoff_seconds'] = self.base_backoff
+            else:
+                return
+            
+            state['circuit'] = OPEN
+            state['retry_at'] = time.time() + state['backoff_seconds']
+            logger.warning(
+                f"Circuit open for {state['backoff_seconds']}s after "
+                f"{state['consecutive_failures']} consecutive failures: {feed_url}"
+            )
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per-feed health statistics"""
+        with self._lock:
+            snapshot = {}
+            for feed_url, state in self._feeds.items():
+                entry = dict(state)
+                entry['retry_at'] = datetime.fromtimestamp(state['retry_at']).isoformat() if state['retry_at'] else None
+                entry['success_rate'] = round(state['successes'] / state['requests'], 3) if state['requests'] else None
+                snapshot[feed_url] = entry
+            return snapshot
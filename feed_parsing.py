@@ -0,0 +1,73 @@
+"""
+Feed body parsing for Brightface Content Engine
+"""
+import re
+import logging
+from datetime import datetime
+from typing import AbstractSet, List, Optional, Tuple
+
+import feedparser
+
+logger = logging.getLogger(__name__)
+
+# (title, summary, url, published time tuple, full text html)
+FeedEntry = Tuple[str, str, str, Optional[Tuple[int, ...]], Optional[str]]
+
+# Keywords that keep older content eligible past MAX_FRESHNESS_DAYS
+EVERGREEN_KEYWORDS = ['guide', 'how to', 'checklist', 'tutorial', 'tips']
+EVERGREEN_PATTERN = re.compile('|'.join(re.escape(keyword) for keyword in EVERGREEN_KEYWORDS), re.IGNORECASE)
+
+def is_evergreen(title: str, summary: str) -> bool:
+    """Check title and summary for evergreen keywords"""
+    return bool(EVERGREEN_PATTERN.search(title) or EVERGREEN_PATTERN.search(summary))
+
+def parse_feed_entries(content: bytes, cutoff_date: Optional[datetime] = None,
+                       seen_links: AbstractSet[str] = frozenset()) -> Tuple[Optional[str], List[FeedEntry]]:
+    """
+    Parse a feed body into compact entry tuples
+    Runs in worker processes, so it returns plain tuples instead of RSSItem models.
+    Entries published before cutoff_date are dropped unless evergreen.
+    Entries whose link is in seen_links are kept without their full text.
+    Returns: (parse error or None, entries)
+    """
+    cutoff = cutoff_date.timetuple()[:6] if cutoff_date else None
+    
+    feed = feedparser.parse(content)
+    
+    if feed.bozo and not feed.entries:
+        return f"Parse error: {feed.get('bozo_exception')}", []
+    
+    entries = []
+    for entry in feed.entries:
+        try:
+            title = entry.get('title', '').strip()
+            # FeedBurner exposes the original article link alongside its redirector
+            url = (entry.get('feedburner_origlink') or entry.get('link', '')).strip()
+            
+            if not title or not url:
+                continue
+            
+            summary = entry.get('summary', '').strip()
+            
+            published = None
+            if entry.get('published_parsed'):
+                published = tuple(entry.published_parsed[:6])
+            
+            # Reject stale archive entries before touching their content
+            if cutoff and published and published < cutoff and not is_evergreen(title, summary):
+                continue
+            
+            # Already-seen entries still report their date (adaptive polling) but skip the content
+            full_text = None
+            for item_content in () if url in seen_links else entry.get('content', []):
+                if item_content.get('type') == 'text/html':
+                    full_text = item_content.get('value', '')
+                    break
+            
+            entries.append((title, summary, url, published, full_text))
+        
+        except Exception as e:
+            logger.warning(f"Error processing feed entry: {e}")
+            continue
+    
+    return None, entries
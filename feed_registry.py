@@ -0,0 +1,316 @@
+"""
+OPML-backed feed registry for Brightface Content Engine
+"""
+import os
+import sys
+import json
+import logging
+import sqlite3
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import Config
+from seen_index import DEFAULT_PIPELINE
+
+logger = logging.getLogger(__name__)
+
+class FeedRegistry:
+    """SQLite store of feed sources with tags, priority, fetch history and per-pipeline conditional-GET validators"""
+    
+    def __init__(self, path: Optional[str] = None, pipeline: str = DEFAULT_PIPELINE):
+        self.path = path or Config.FEED_REGISTRY_FILE
+        self.pipeline = pipeline
+        
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS feeds ('
+            'url TEXT PRIMARY KEY, title TEXT, site_url TEXT, tags TEXT NOT NULL DEFAULT \'\', '
+            'priority INTEGER NOT NULL DEFAULT 0, enabled INTEGER NOT NULL DEFAULT 1, '
+            'last_fetched TEXT, last_status INTEGER, added_at TEXT, '
+            'next_due REAL, schedule TEXT'
+            ') WITHOUT ROWID'
+        )
+        # Registries created before adaptive polling moved into the table
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(feeds)')}
+        for column, kind in (('next_due', 'REAL'), ('schedule', 'TEXT')):
+            if column not in columns:
+                self._conn.execute(f'ALTER TABLE feeds ADD COLUMN {column} {kind}')
+        
+        # Validators are kept per pipeline, like the seen index they stand in front of
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS validators ('
+            'pipeline TEXT NOT NULL, url TEXT NOT NULL, etag TEXT, last_modified TEXT, digest TEXT, '
+            'PRIMARY KEY (pipeline, url)'
+            ') WITHOUT ROWID'
+        )
+        if 'digest' in columns:
+            # Older registries kept one set of validators on the feed row; they belonged to the main engine
+            self._conn.execute(
+                'INSERT OR IGNORE INTO validators (pipeline, url, etag, last_modified, digest) '
+                'SELECT ?, url, etag, last_modified, digest FROM feeds WHERE digest IS NOT NULL', (DEFAULT_PIPELINE,)
+            )
+            self._conn.execute('UPDATE feeds SET etag = NULL, last_modified = NULL, digest = NULL WHERE digest IS NOT NULL')
+        # Batches are ranked by priority then staleness, and topped up by staleness alone; the
+        # expressions match the ORDER BY clauses so neither query sorts the whole table
+        self._conn.execute('DROP INDEX IF EXISTS feeds_cycle_order')
+        self._conn.execute('DROP INDEX IF EXISTS feeds_due_order')
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS feeds_fetch_rank ON feeds (enabled, priority DESC, COALESCE(last_fetched, \'\'))'
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS feeds_fetch_age ON feeds (enabled, COALESCE(last_fetched, \'\'))'
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS feeds_due_rank ON feeds (enabled, priority DESC, COALESCE(next_due, 0))'
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS feeds_due_age ON feeds (enabled, COALESCE(next_due, 0))'
+        )
+        self._conn.commit()
+    
+    def count(self) -> int:
+        """Number of enabled feeds"""
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM feeds WHERE enabled = 1').fetchone()[0]
+    
+    def add_feed(self, url: str, title: Optional[str] = None, site_url: Optional[str] = None,
+                 tags: Iterable[str] = (), priority: int = 0) -> bool:
+        """Register a feed; returns False if it was already registered"""
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute(
+                'INSERT OR IGNORE INTO feeds (url, title, site_url, tags, priority, added_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (url.strip(), title, site_url, ','.join(sorted(set(tags))), priority, datetime.now().isoformat())
+            )
+            self._conn.commit()
+            return self._conn.total_changes > before
+    
+    def set_enabled(self, url: str, enabled: bool):
+        """Enable or disable a feed without losing its history"""
+        with self._lock:
+            self._conn.execute('UPDATE feeds SET enabled = ? WHERE url = ?', (int(enabled), url))
+            self._conn.commit()
+    
+    def bootstrap(self) -> int:
+        """Seed an empty registry from Config.RSS_SOURCES and import FEED_REGISTRY_OPML if set"""
+        added = 0
+        if Config.FEED_REGISTRY_OPML and os.path.exists(Config.FEED_REGISTRY_OPML):
+            added += self.import_opml(Config.FEED_REGISTRY_OPML)
+        
+        if not self.count():
+            added += sum(self.add_feed(url) for url in Config.RSS_SOURCES if url.strip())
+        
+        return added
+    
+    def import_opml(self, path: str) -> int:
+        """Import feeds from an OPML file; nested outline titles and category become tags"""
+        try:
+            root = ET.parse(path).getroot()
+        except Exception as e:
+            logger.error(f"Error reading OPML {path}: {e}")
+            return 0
+        
+        body = root.find('body')
+        if body is None:
+            return 0
+        
+        added = 0
+        stack = [(outline, []) for outline in body.findall('outline')]
+        while stack:
+            outline, parent_tags = stack.pop()
+            xml_url = outline.get('xmlUrl')
+            
+            if not xml_url:
+                # Folder outline: its title tags every feed inside it
+                folder = outline.get('title') or outline.get('text')
+                tags = parent_tags + [folder] if folder else parent_tags
+                stack.extend((child, tags) for child in outline.findall('outline'))
+                continue
+            
+            tags = list(parent_tags)
+            tags.extend(tag.strip().strip('/') for tag in (outline.get('category') or '').split(',') if tag.strip())
+            
+            try:
+                priority = int(outline.get('priority', 0))
+            except ValueError:
+                priority = 0
+            
+            added += self.add_feed(
+                xml_url,
+                title=outline.get('title') or outline.get('text'),
+                site_url=outline.get('htmlUrl'),
+                tags=tags,
+                priority=priority
+            )
+            
+            # export_opml writes disabled feeds as comments; a round trip keeps them switched off
+            if outline.get('isComment', '').lower() == 'true':
+                self.set_enabled(xml_url.strip(), False)
+        
+        logger.info(f"Imported {added} new feeds from {path}")
+        return added
+    
+    def export_opml(self, path: Optional[str] = None) -> str:
+        """Export all registered feeds as OPML, returning the document"""
+        root = ET.Element('opml', version='2.0')
+        head = ET.SubElement(root, 'head')
+        ET.SubElement(head, 'title').text = 'Brightface Content Engine feeds'
+        ET.SubElement(head, 'dateCreated').text = datetime.now().isoformat()
+        body = ET.SubElement(root, 'body')
+        
+        with self._lock:
+            cursor = self._conn.execute(
+                'SELECT url, title, site_url, tags, priority, enabled FROM feeds ORDER BY priority DESC, url'
+            )
+            while True:
+                rows = cursor.fetchmany(Config.SQLITE_BATCH_SIZE)
+                if not rows:
+                    break
+                for url, title, site_url, tags, priority, enabled in rows:
+                    attributes = {'type': 'rss', 'text': title or url, 'xmlUrl': url}
+                    if title:
+                        attributes['title'] = title
+                    if site_url:
+                        attributes['htmlUrl'] = site_url
+                    if tags:
+                        attributes['category'] = tags
+                    if priority:
+                        attributes['priority'] = str(priority)
+                    if not enabled:
+                        attributes['isComment'] = 'true'
+                    ET.SubElement(body, 'outline', attributes)
+        
+        document = ET.tostring(root, encoding='unicode')
+        if path:
+            with open(path, 'w') as f:
+                f.write(document)
+        return document
+    
+    def _select_batch(self, where: str, params: tuple, age: str, budget: int) -> List[str]:
+        """Up to `budget` feeds by priority then `age`, with RSS_FETCH_RESERVED_SHARE kept for the oldest of any priority"""
+        # Without the reserved share a top tier larger than the budget would starve every lower one
+        reserved = min(budget - 1, int(budget * Config.RSS_FETCH_RESERVED_SHARE)) if budget > 1 else 0
+        
+        rows = self._conn.execute(
+            f'SELECT url FROM feeds WHERE {where} ORDER BY priority DESC, {age} LIMIT ?', params + (budget - reserved,)
+        ).fetchall()
+        urls = [row[0] for row in rows]
+        
+        if reserved and len(urls) == budget - reserved:
+            chosen = set(urls)
+            rows = self._conn.execute(
+                f'SELECT url FROM feeds WHERE {where} ORDER BY {age} LIMIT ?', params + (len(urls) + reserved,)
+            ).fetchall()
+            urls.extend([row[0] for row in rows if row[0] not in chosen][:reserved])
+        
+        return urls
+    
+    def next_batch(self, budget: int) -> List[str]:
+        """Enabled feeds for this cycle: highest priority first, least recently fetched first within a priority"""
+        with self._lock:
+            return self._select_batch('enabled = 1', (), 'COALESCE(last_fetched, \'\')', budget)
+    
+    def due_batch(self, budget: int, now: float, retry_delay: float) -> List[str]:
+        """Enabled feeds due by `now`: highest priority first, most overdue first within a priority"""
+        with self._lock:
+            urls = self._select_batch('enabled = 1 AND COALESCE(next_due, 0) <= ?', (now,), 'COALESCE(next_due, 0)', budget)
+            
+            # Provisional retry in case a fetch never reports back (e.g. cycle deadline)
+            self._conn.executemany(
+                'UPDATE feeds SET next_due = ? WHERE url = ?', ((now + retry_delay, url) for url in urls)
+            )
+            self._conn.commit()
+        return urls
+    
+    def get_schedule(self, feed_url: str) -> Optional[Dict[str, Any]]:
+        """A feed's learned polling cadence, or None before its first completed fetch"""
+        with self._lock:
+            row = self._conn.execute('SELECT schedule FROM feeds WHERE url = ?', (feed_url,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+    
+    def set_schedule(self, feed_url: str, state: Dict[str, Any]):
+        """Store a feed's polling cadence and when it is next due"""
+        with self._lock:
+            self._conn.execute(
+                'UPDATE feeds SET schedule = ?, next_due = ? WHERE url = ?',
+                (json.dumps(state), state['next_due'], feed_url)
+            )
+            self._conn.commit()
+    
+    def record_fetch(self, feed_url: str, status_code: Optional[int]):
+        """Record when a feed was last fetched and how it answered"""
+        with self._lock:
+            self._conn.execute(
+                'UPDATE feeds SET last_fetched = ?, last_status = ? WHERE url = ?',
+                (datetime.now().isoformat(), status_code, feed_url)
+            )
+            self._conn.commit()
+    
+    def record_skip(self, feed_url: str):
+        """Move a feed that was passed over (e.g. open circuit) behind the others in the next_batch rotation"""
+        with self._lock:
+            self._conn.execute('UPDATE feeds SET last_fetched = ? WHERE url = ?', (datetime.now().isoformat(), feed_url))
+            self._conn.commit()
+    
+    def conditional_headers(self, feed_url: str) -> Dict[str, str]:
+        """Build If-None-Match / If-Modified-Since headers for a feed (FeedCache interface)"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT etag, last_modified FROM validators WHERE pipeline = ? AND url = ?', (self.pipeline, feed_url)
+            ).fetchone()
+        
+        headers = {}
+        if row and row[0]:
+            headers['If-None-Match'] = row[0]
+        if row and row[1]:
+            headers['If-Modified-Since'] = row[1]
+        
+        return headers
+    
+    def is_unchanged(self, feed_url: str, digest: str) -> bool:
+        """Check whether a body digest matches the one stored for a feed (FeedCache interface)"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT digest FROM validators WHERE pipeline = ? AND url = ?', (self.pipeline, feed_url)
+            ).fetchone()
+        return row is not None and row[0] == digest
+    
+    def update(self, feed_url: str, etag: Optional[str], last_modified: Optional[str], digest: str):
+        """Store new validators for a feed (FeedCache interface)"""
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO validators (pipeline, url, etag, last_modified, digest) VALUES (?, ?, ?, ?, ?)',
+                (self.pipeline, feed_url, etag, last_modified, digest)
+            )
+            self._conn.commit()
+    
+    def save(self):
+        """Validators are committed as they change (FeedCache interface)"""
+    
+    def close(self):
+        """Close the underlying database"""
+        with self._lock:
+            self._conn.close()
+
+if __name__ == "__main__":
+    # python feed_registry.py import feeds.opml | export feeds.opml
+    logging.basicConfig(level=logging.INFO)
+    
+    if len(sys.argv) != 3 or sys.argv[1] not in ('import', 'export'):
+        print("Usage: python feed_registry.py import|export <file.opml>")
+        sys.exit(1)
+    
+    registry = FeedRegistry()
+    if sys.argv[1] == 'import':
+        print(f"Imported {registry.import_opml(sys.argv[2])} feeds ({registry.count()} enabled)")
+    else:
+        registry.export_opml(sys.argv[2])
+        print(f"Exported feeds to {sys.argv[2]}")
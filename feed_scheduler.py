@@ -0,0 +1,192 @@
+"""
+Adaptive per-feed polling scheduler for Brightface Content Engine
+"""
+import os
+import json
+import heapq
+import time
+import random
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class FeedScheduler:
+    """Learns each feed's publish cadence and keeps a min-heap of next-due fetch times"""
+    
+    # Weight of the newest observation in the moving averages
+    SMOOTHING = 0.3
+    # Poll this many times per expected post so new items are picked up promptly
+    POLLS_PER_POST = 2
+    # Interval growth after a fetch that brought nothing new
+    IDLE_BACKOFF = 1.5
+    
+    def __init__(self, path: Optional[str] = None, registry=None):
+        self.path = path or Config.FEED_SCHEDULE_FILE
+        # With a feed registry, cadences and due times live in its table and only fetched feeds are read
+        self.registry = registry
+        self.min_interval = Config.ADAPTIVE_POLL_MIN_MINUTES * 60
+        self.max_interval = Config.ADAPTIVE_POLL_MAX_MINUTES * 60
+        self.jitter = Config.ADAPTIVE_POLL_JITTER
+        
+        self._feeds: Dict[str, Dict[str, Any]] = {}
+        self._heap: List[tuple] = []
+        self._lock = threading.Lock()
+        self._load()
+    
+    def _load(self):
+        """Load learned feed cadences from disk"""
+        if self.registry is not None or not os.path.exists(self.path):
+            return
+        
+        try:
+            with open(self.path, 'r') as f:
+                self._feeds = json.load(f)
+            self._heap = [(state['next_due'], feed_url) for feed_url, state in self._feeds.items()]
+            heapq.heapify(self._heap)
+        except Exception as e:
+            logger.error(f"Error loading feed schedule {self.path}: {e}")
+            self._feeds, self._heap = {}, []
+    
+    def save(self):
+        """Write learned feed cadences to disk"""
+        if self.registry is not None:
+            return
+        
+        with self._lock:
+            feeds = {feed_url: dict(state) for feed_url, state in self._feeds.items()}
+        
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(feeds, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving feed schedule {self.path}: {e}")
+    
+    def _clamp(self, interval: float) -> float:
+        return min(self.max_interval, max(self.min_interval, interval))
+    
+    def _new_state(self, now: float) -> Dict[str, Any]:
+        return {
+            'interval': self.min_interval,
+            'next_due': now,
+            'avg_post_gap': None,
+            'not_modified_rate': 0.0,
+            'last_published': None,
+            'fetches': 0
+        }
+    
+    def _get_state(self, feed_url: str) -> Optional[Dict[str, Any]]:
+        if self.registry is not None:
+            return self.registry.get_schedule(feed_url) or self._new_state(time.time())
+        return self._feeds.get(feed_url)
+    
+    def _schedule(self, feed_url: str, state: Dict[str, Any], delay: float):
+        jittered = delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+        state['next_due'] = time.time() + jittered
+        if self.registry is not None:
+            self.registry.set_schedule(feed_url, state)
+        else:
+            heapq.heappush(self._heap, (state['next_due'], feed_url))
+    
+    def next_batch(self, budget: int) -> List[str]:
+        """Registry feeds that are due now, cut to the budget without loading every feed's state"""
+        due = self.registry.due_batch(budget, time.time(), self.min_interval)
+        logger.info(f"{len(due)} feeds due for polling")
+        return due
+    
+    def due_feeds(self, feed_urls: List[str]) -> List[str]:
+        """Return the configured feeds that are due now; unknown feeds are always due"""
+        now = time.time()
+        configured = set(feed_urls)
+        due = []
+        
+        with self._lock:
+            for feed_url in feed_urls:
+                if feed_url not in self._feeds:
+                    self._feeds[feed_url] = self._new_state(now)
+                    heapq.heappush(self._heap, (now, feed_url))
+            
+            while self._heap and self._heap[0][0] <= now:
+                next_due, feed_url = heapq.heappop(self._heap)
+                state = self._feeds.get(feed_url)
+                
+                # Skip entries superseded by a later reschedule or for feeds no longer configured
+                if state is None or state['next_due'] != next_due or feed_url not in configured:
+                    continue
+                
+                due.append(feed_url)
+                
+                # Provisional retry in case this fetch never reports back (e.g. cycle deadline)
+                self._schedule(feed_url, state, self.min_interval)
+        
+        logger.info(f"{len(due)} of {len(feed_urls)} feeds due for polling")
+        return due
+    
+    def record_fetch(self, feed_url: str, published_dates: List[datetime], not_modified: bool = False):
+        """Update a feed's cadence from a completed fetch and schedule its next poll"""
+        with self._lock:
+            state = self._get_state(feed_url)
+            if state is None:
+                return
+            
+            state['fetches'] += 1
+            state['not_modified_rate'] = (
+                (1 - self.SMOOTHING) * state['not_modified_rate'] + self.SMOOTHING * (1.0 if not_modified else 0.0)
+            )
+            
+            last_published = state['last_published']
+            timestamps = sorted(date.timestamp() for date in published_dates if date is not None)
+            new_timestamps = [ts for ts in timestamps if last_published is None or ts > last_published]
+            
+            if new_timestamps:
+                # Learn the gap between consecutive posts, including the previous newest post
+                previous = last_published
+                for ts in new_timestamps:
+                    if previous is not None and ts > previous:
+                        gap = ts - previous
+                        avg_gap = state['avg_post_gap']
+                        state['avg_post_gap'] = gap if avg_gap is None else (1 - self.SMOOTHING) * avg_gap + self.SMOOTHING * gap
+                    previous = ts
+                state['last_published'] = new_timestamps[-1]
+            
+            if new_timestamps and state['avg_post_gap']:
+                interval = state['avg_post_gap'] / self.POLLS_PER_POST
+            else:
+                interval = state['interval'] * self.IDLE_BACKOFF
+            
+            # Feeds that usually answer 304 are polled less eagerly
+            interval *= 1 + state['not_modified_rate']
+            
+            state['interval'] = self._clamp(interval)
+            self._schedule(feed_url, state, state['interval'])
+    
+    def record_error(self, feed_url: str):
+        """Retry a failed feed after the minimum interval"""
+        with self._lock:
+            state = self._get_state(feed_url)
+            if state is not None:
+                self._schedule(feed_url, state, self.min_interval)
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-feed learned cadence and next due time (JSON-backed schedules only)"""
+        with self._lock:
+            return {
+                feed_url: {
+                    'interval_minutes': round(state['interval'] / 60, 1),
+                    'avg_post_gap_hours': round(state['avg_post_gap'] / 3600, 1) if state['avg_post_gap'] else None,
+                    'not_modified_rate': round(state['not_modified_rate'], 2),
+                    'next_due': datetime.fromtimestamp(state['next_due']).isoformat(),
+                    'fetches': state['fetches']
+                }
+                for feed_url, state in self._feeds.items()
+            }
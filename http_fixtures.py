@@ -0,0 +1,155 @@
+"""
+HTTP fixture recording and offline replay for Brightface Content Engine
+"""
+import io
+import os
+import gzip
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+class FixtureAdapter(HTTPAdapter):
+    """Transport adapter that records responses to, or replays them from, a gzipped fixture archive"""
+    
+    def __init__(self, mode: str, path: Optional[str] = None, replay_latency: Optional[bool] = None, **kwargs):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown fixture mode: {mode}")
+        
+        super().__init__(**kwargs)
+        self.mode = mode
+        self.path = path or Config.HTTP_FIXTURE_FILE
+        self.replay_latency = Config.HTTP_FIXTURE_REPLAY_LATENCY if replay_latency is None else replay_latency
+        
+        self._fixtures: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+    
+    def _load(self):
+        """Load recorded responses from disk"""
+        if not os.path.exists(self.path):
+            if self.mode == REPLAY:
+                logger.warning(f"No fixture archive at {self.path}; every request will fail")
+            return
+        
+        try:
+            with gzip.open(self.path, 'rt') as f:
+                self._fixtures = json.load(f)
+            logger.info(f"Loaded {len(self._fixtures)} HTTP fixtures from {self.path}")
+        except Exception as e:
+            logger.error(f"Error loading fixture archive {self.path}: {e}")
+            self._fixtures = {}
+    
+    def save(self):
+        """Write recorded responses to disk"""
+        if self.mode != RECORD:
+            return
+        
+        with self._lock:
+            fixtures = dict(self._fixtures)
+        
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            tmp_path = f"{self.path}.tmp"
+            with gzip.open(tmp_path, 'wt') as f:
+                json.dump(fixtures, f)
+            os.replace(tmp_path, self.path)
+            logger.info(f"Saved {len(fixtures)} HTTP fixtures to {self.path}")
+        except Exception as e:
+            logger.error(f"Error saving fixture archive {self.path}: {e}")
+    
+    @staticmethod
+    def _key(request: requests.PreparedRequest) -> str:
+        return hashlib.sha1(f"{request.method} {request.url}".encode()).hexdigest()
+    
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if self.mode == REPLAY:
+            return self._replay(request)
+        
+        started = time.monotonic()
+        response = super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+        
+        # Reading the body here keeps it available to iter_content() for the caller
+        content = response.content
+        fixture = {
+            'url': request.url,
+            'method': request.method,
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': dict(response.headers),
+            'body': base64.b64encode(content).decode('ascii'),
+            'elapsed': round(time.monotonic() - started, 4)
+        }
+        
+        with self._lock:
+            # A 304 answer to a conditional request must not replace the recorded body
+            key = self._key(request)
+            if response.status_code != 304 or key not in self._fixtures:
+                self._fixtures[key] = fixture
+        
+        return response
+    
+    def _replay(self, request: requests.PreparedRequest) -> requests.Response:
+        with self._lock:
+            fixture = self._fixtures.get(self._key(request))
+        
+        if fixture is None:
+            raise requests.ConnectionError(f"No recorded fixture for {request.method} {request.url}", request=request)
+        
+        if self.replay_latency:
+            time.sleep(fixture['elapsed'])
+        
+        headers = CaseInsensitiveDict(fixture['headers'])
+        body = base64.b64decode(fixture['body'])
+        status = fixture['status']
+        
+        # Honour conditional requests the way the origin server would have
+        etag = headers.get('ETag')
+        if etag and request.headers.get('If-None-Match') == etag:
+            status, body = 304, b''
+        
+        # Recorded bodies are already decoded
+        headers.pop('Content-Encoding', None)
+        headers['Content-Length'] = str(len(body))
+        
+        response = requests.Response()
+        response.status_code = status
+        response.reason = fixture.get('reason') if status == fixture['status'] else 'Not Modified'
+        response.headers = headers
+        response.raw = io.BytesIO(body)
+        response.url = request.url
+        response.request = request
+        response.encoding = requests.utils.get_encoding_from_headers(headers)
+        return response
+    
+    def __len__(self) -> int:
+        return len(self._fixtures)
+
+def mount_fixture_adapter(session: requests.Session, mode: Optional[str] = None, **kwargs) -> Optional[FixtureAdapter]:
+    """Mount a FixtureAdapter on a session when HTTP_FIXTURE_MODE (or mode) is set"""
+    mode = mode or Config.HTTP_FIXTURE_MODE
+    if not mode:
+        return None
+    
+    adapter = FixtureAdapter(mode, **kwargs)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    logger.info(f"HTTP fixture {mode} mode using {adapter.path}")
+    return adapter
@@ -0,0 +1,536 @@
+"""
+Coalescing, deadline-bounded and hedged OpenAI client for Brightface Content Engine
+"""
+import os
+import json
+import time
+import bisect
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import nullcontext
+from contextvars import ContextVar
+from types import SimpleNamespace
+from typing import Any, AsyncContextManager, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from openai import OpenAI, AsyncOpenAI
+from openai.types.chat import ChatCompletion
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# How often a process waiting on another process's identical request checks for its result
+_POLL_SECONDS = 0.5
+
+# Latency histogram bucket upper bounds in seconds, 25% apart from 100ms to about ten minutes
+_LATENCY_BUCKETS = [round(0.1 * 1.25 ** i, 3) for i in range(40)]
+
+# time.monotonic() value by which LLM calls made in this context must finish (None for no deadline)
+llm_deadline: ContextVar[Optional[float]] = ContextVar('llm_deadline', default=None)
+
+class DeadlineExceeded(TimeoutError):
+    """An LLM call ran out of time before any response came back"""
+
+def call_timeout(deadline: Optional[float] = None) -> float:
+    """Seconds one call may take: LLM_REQUEST_TIMEOUT, capped by what is left before the deadline"""
+    timeout = float(Config.LLM_REQUEST_TIMEOUT)
+    if deadline is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Cycle deadline passed before the request was sent")
+        timeout = min(timeout, remaining)
+    return timeout
+
+def request_key(model: str, messages: Any, temperature: Optional[float] = None,
+                response_format: Any = None, **_) -> str:
+    """Hash of everything that determines a chat completion's output"""
+    payload = json.dumps([model, messages, temperature, response_format], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class RequestCoalescer:
+    """Shares identical in-flight chat completions and caches deterministic ones across processes"""
+    
+    def __init__(self, path: Optional[str] = None, ttl_hours: Optional[int] = None):
+        self.path = path or Config.LLM_RESPONSE_CACHE_FILE
+        self.ttl_seconds = (ttl_hours or Config.LLM_RESPONSE_CACHE_TTL_HOURS) * 3600
+        
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        # asyncio futures belong to one event loop, so they are keyed by loop as well
+        self._async_inflight: Dict[Tuple[int, str], asyncio.Future] = {}
+        self._stats = {'requests': 0, 'sent': 0, 'coalesced': 0, 'cache_hits': 0, 'waited_on_other_process': 0}
+        
+        self._conn = None
+        if Config.LLM_RESPONSE_CACHE:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            # Other processes (cron handlers, the blog generator) share this file
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL'
+                ') WITHOUT ROWID'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS inflight ('
+                'key TEXT PRIMARY KEY, pid INTEGER NOT NULL, started_at REAL NOT NULL'
+                ') WITHOUT ROWID'
+            )
+            self._conn.execute('DELETE FROM responses WHERE created_at < ?', (time.time() - self.ttl_seconds,))
+            self._conn.commit()
+    
+    def _cacheable(self, kwargs: Dict[str, Any]) -> bool:
+        # Only deterministic calls; a sampled answer cached for hours just repeats one draw
+        return self._conn is not None and kwargs.get('temperature', 1.0) == 0
+    
+    def _cached(self, key: str) -> Optional[ChatCompletion]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT response FROM responses WHERE key = ? AND created_at >= ?',
+                (key, time.time() - self.ttl_seconds)
+            ).fetchone()
+        if row is None:
+            return None
+        
+        try:
+            return ChatCompletion.model_validate_json(row[0])
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cached completion: {e}")
+            return None
+    
+    def _store(self, key: str, response: ChatCompletion):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, response, created_at) VALUES (?, ?, ?)',
+                (key, response.model_dump_json(), time.time())
+            )
+            self._conn.commit()
+    
+    def _claim(self, key: str) -> bool:
+        """Mark a request as in flight in this process; False if another live process already has it"""
+        now = time.time()
+        with self._lock:
+            # A claim older than the request timeout belongs to a process that died mid-request
+            self._conn.execute('DELETE FROM inflight WHERE key = ? AND started_at < ?', (key, now - Config.LLM_INFLIGHT_TIMEOUT))
+            before = self._conn.total_changes
+            self._conn.execute('INSERT OR IGNORE INTO inflight (key, pid, started_at) VALUES (?, ?, ?)', (key, os.getpid(), now))
+            self._conn.commit()
+            return self._conn.total_changes > before
+    
+    def _release(self, key: str):
+        with self._lock:
+            self._conn.execute('DELETE FROM inflight WHERE key = ? AND pid = ?', (key, os.getpid()))
+            self._conn.commit()
+    
+    def _check_other_process(self, key: str) -> Tuple[bool, Optional[ChatCompletion]]:
+        """(still in flight elsewhere, result if it has landed)"""
+        cached = self._cached(key)
+        if cached is not None:
+            return False, cached
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT 1 FROM inflight WHERE key = ? AND started_at >= ?',
+                (key, time.time() - Config.LLM_INFLIGHT_TIMEOUT)
+            ).fetchone()
+        return row is not None, None
+    
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+    
+    def run(self, kwargs: Dict[str, Any], call: Callable[[], ChatCompletion]) -> ChatCompletion:
+        """Run `call` for these request arguments unless an identical request is in flight or cached"""
+        key = request_key(**kwargs)
+        with self._lock:
+            self._stats['requests'] += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self._stats['coalesced'] += 1
+        
+        if not leader:
+            return future.result()
+        
+        try:
+            response = self._execute(key, kwargs, call)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+    
+    def _execute(self, key: str, kwargs: Dict[str, Any], call: Callable[[], ChatCompletion]) -> ChatCompletion:
+        if not self._cacheable(kwargs):
+            self._count('sent')
+            return call()
+        
+        cached = self._cached(key)
+        if cached is not None:
+            self._count('cache_hits')
+            return cached
+        
+        claimed = self._claim(key)
+        if not claimed:
+            self._count('waited_on_other_process')
+            pending, cached = True, None
+            while pending and cached is None:
+                time.sleep(_POLL_SECONDS)
+                pending, cached = self._check_other_process(key)
+            if cached is not None:
+                return cached
+            claimed = self._claim(key)
+        
+        try:
+            self._count('sent')
+            response = call()
+            self._store(key, response)
+            return response
+        finally:
+            if claimed:
+                self._release(key)
+    
+    async def run_async(self, kwargs: Dict[str, Any], call: Callable[[], Awaitable[ChatCompletion]]) -> ChatCompletion:
+        """Async counterpart of run() for AsyncOpenAI callers"""
+        key = request_key(**kwargs)
+        slot = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            self._stats['requests'] += 1
+            future = self._async_inflight.get(slot)
+            leader = future is None
+            if leader:
+                future = self._async_inflight[slot] = asyncio.get_running_loop().create_future()
+            else:
+                self._stats['coalesced'] += 1
+        
+        if not leader:
+            # One cancelled follower must not cancel the shared request
+            return await asyncio.shield(future)
+        
+        try:
+            response = await self._execute_async(key, kwargs, call)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so a request nobody else waited on does not log a warning
+            future.exception()
+            raise
+        finally:
+            with self._lock:
+                self._async_inflight.pop(slot, None)
+    
+    async def _execute_async(self, key: str, kwargs: Dict[str, Any],
+                             call: Callable[[], Awaitable[ChatCompletion]]) -> ChatCompletion:
+        if not self._cacheable(kwargs):
+            self._count('sent')
+            return await call()
+        
+        # SQLite calls block (up to the busy timeout under contention), so keep them off the event loop
+        cached = await asyncio.to_thread(self._cached, key)
+        if cached is not None:
+            self._count('cache_hits')
+            return cached
+        
+        claimed = await asyncio.to_thread(self._claim, key)
+        if not claimed:
+            self._count('waited_on_other_process')
+            pending, cached = True, None
+            while pending and cached is None:
+                await asyncio.sleep(_POLL_SECONDS)
+                pending, cached = await asyncio.to_thread(self._check_other_process, key)
+            if cached is not None:
+                return cached
+            claimed = await asyncio.to_thread(self._claim, key)
+        
+        try:
+            self._count('sent')
+            response = await call()
+            await asyncio.to_thread(self._store, key, response)
+            return response
+        finally:
+            if claimed:
+                await asyncio.to_thread(self._release, key)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Request counters for this process"""
+        with self._lock:
+            return dict(self._stats)
+
+class LatencyTracker:
+    """Decaying latency histograms per model and prompt type, persisted between runs"""
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or Config.LLM_LATENCY_FILE
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, List[float]] = {}
+        self._load()
+    
+    def _load(self):
+        """Load histograms from disk"""
+        if not os.path.exists(self.path):
+            return
+        
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            # Histograms saved with other bucket bounds cannot be read back
+            if data.get('buckets') == _LATENCY_BUCKETS:
+                self._histograms = data.get('histograms', {})
+        except Exception as e:
+            logger.error(f"Error loading latency histograms {self.path}: {e}")
+    
+    def save(self):
+        """Write histograms to disk"""
+        with self._lock:
+            data = {'buckets': _LATENCY_BUCKETS, 'histograms': {key: list(counts) for key, counts in self._histograms.items()}}
+        
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving latency histograms {self.path}: {e}")
+    
+    @staticmethod
+    def _key(model: str, prompt_type: str) -> str:
+        return f"{model}/{prompt_type}"
+    
+    def record(self, model: str, prompt_type: str, seconds: float):
+        """Count one call's latency"""
+        bucket = min(bisect.bisect_left(_LATENCY_BUCKETS, seconds), len(_LATENCY_BUCKETS) - 1)
+        with self._lock:
+            counts = self._histograms.setdefault(self._key(model, prompt_type), [0.0] * len(_LATENCY_BUCKETS))
+            counts[bucket] += 1
+            # Halving keeps the histogram following recent latency instead of all-time latency
+            if sum(counts) > Config.LLM_LATENCY_WINDOW:
+                counts[:] = [count / 2 for count in counts]
+    
+    def quantile(self, model: str, prompt_type: str, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th latency quantile (None until LLM_HEDGE_MIN_SAMPLES calls)"""
+        with self._lock:
+            counts = self._histograms.get(self._key(model, prompt_type))
+            return self._quantile(counts, q) if counts else None
+    
+    @staticmethod
+    def _quantile(counts: List[float], q: float) -> Optional[float]:
+        total = sum(counts)
+        if total < Config.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        
+        running = 0.0
+        for bound, count in zip(_LATENCY_BUCKETS, counts):
+            running += count
+            if running >= q * total:
+                return bound
+        return _LATENCY_BUCKETS[-1]
+    
+    def stats(self) -> Dict[str, Any]:
+        """Sample weight and p50/p95/p99 per model and prompt type"""
+        with self._lock:
+            return {
+                key: {
+                    'samples': round(sum(counts)),
+                    'p50': self._quantile(counts, 0.5),
+                    'p95': self._quantile(counts, 0.95),
+                    'p99': self._quantile(counts, 0.99)
+                }
+                for key, counts in sorted(self._histograms.items())
+            }
+
+class HedgedCaller:
+    """Bounds chat completions by the caller's deadline and sends one duplicate when a call outlasts its usual latency"""
+    
+    def __init__(self, latency: Optional[LatencyTracker] = None):
+        self.latency = latency or LatencyTracker()
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'hedged': 0, 'hedge_wins': 0, 'timeouts': 0}
+        # Synchronous callers are served from one background event loop so the losing request can be cancelled
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+    
+    def hedge_delay(self, model: str, prompt_type: str) -> Optional[float]:
+        """Seconds to wait before sending a duplicate (None when hedging is off)"""
+        if not Config.LLM_HEDGING:
+            return None
+        delay = self.latency.quantile(model, prompt_type, Config.LLM_HEDGE_QUANTILE)
+        return delay if delay is not None else Config.LLM_HEDGE_DEFAULT_DELAY
+    
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='llm-calls', daemon=True).start()
+            return self._loop
+    
+    def call(self, kwargs: Dict[str, Any], prompt_type: str, deadline: Optional[float],
+             send: Callable[[], Awaitable[Any]]) -> Any:
+        """Blocking call_async() for synchronous callers; `send()` runs on the background loop"""
+        return asyncio.run_coroutine_threadsafe(
+            self.call_async(kwargs, prompt_type, deadline, send), self._event_loop()
+        ).result()
+    
+    async def call_async(self, kwargs: Dict[str, Any], prompt_type: str, deadline: Optional[float],
+                         send: Callable[[], Awaitable[Any]],
+                         admit: Optional[Callable[[], AsyncContextManager]] = None) -> Any:
+        """Run `send()`, the chat completion for `kwargs`, within the deadline, hedging it once if slow"""
+        model = kwargs.get('model', Config.OPENAI_MODEL)
+        timeout = call_timeout(deadline)
+        delay = self.hedge_delay(model, prompt_type)
+        started = time.monotonic()
+        self._count('calls')
+        
+        # The caller admits the primary itself; a hedged duplicate enters `admit()` first so it
+        # takes its own rate-limit and concurrency slot like any other request
+        async def attempt(gate: Optional[AsyncContextManager] = None) -> Tuple[Any, float]:
+            async with gate or nullcontext():
+                attempt_started = time.monotonic()
+                response = await send()
+                return response, time.monotonic() - attempt_started
+        
+        primary = asyncio.ensure_future(attempt())
+        hedge = None
+        pending = {primary}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                elapsed = time.monotonic() - started
+                if elapsed >= timeout:
+                    break
+                wait = timeout - elapsed
+                if hedge is None and delay is not None:
+                    wait = min(wait, max(0.0, delay - elapsed))
+                
+                done, pending = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    response, seconds = task.result()
+                    self.latency.record(model, prompt_type, seconds)
+                    if task is hedge:
+                        self._count('hedge_wins')
+                    return response
+                
+                # Failures are left to the client's own retries; only a slow call gets a duplicate
+                if pending and hedge is None and delay is not None and time.monotonic() - started >= delay:
+                    logger.info(f"{model} {prompt_type} call still running after {delay:.1f}s, sending a hedged duplicate")
+                    hedge = asyncio.ensure_future(attempt(admit() if admit else None))
+                    pending.add(hedge)
+                    self._count('hedged')
+            
+            if error is not None:
+                raise error
+            
+            self._count('timeouts')
+            # A call that used its full timeout still says something about this model's latency;
+            # one cut short by the cycle deadline does not
+            if timeout >= Config.LLM_REQUEST_TIMEOUT:
+                self.latency.record(model, prompt_type, timeout)
+            raise DeadlineExceeded(f"{model} {prompt_type} call gave no response within {timeout:.1f}s")
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hedging counters for this process and the latency quantiles behind them"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['latency'] = self.latency.stats()
+        return stats
+
+class LLMClient:
+    """OpenAI client whose chat completions are deadline-bounded, hedged and (with LLM_COALESCE) coalesced"""
+    
+    def __init__(self, client: OpenAI, coalescer: Optional[RequestCoalescer] = None,
+                 caller: Optional[HedgedCaller] = None):
+        self._client = client
+        self.coalescer = coalescer or (get_coalescer() if Config.LLM_COALESCE else None)
+        self.caller = caller or get_hedged_caller()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        # Async counterpart of `client` for hedged calls, built on the caller's loop that its connections belong to
+        self._async_client: Optional[AsyncOpenAI] = None
+    
+    def __getattr__(self, name: str):
+        # Everything except chat completions (embeddings, batches, files) goes straight to the client
+        return getattr(self._client, name)
+    
+    def _async_twin(self) -> AsyncOpenAI:
+        """AsyncOpenAI with the wrapped client's key, endpoint, timeout, retries and headers"""
+        if self._async_client is None:
+            client = self._client
+            self._async_client = AsyncOpenAI(
+                api_key=client.api_key,
+                organization=client.organization,
+                project=client.project,
+                base_url=client.base_url,
+                timeout=client.timeout,
+                max_retries=client.max_retries,
+                default_headers=client._custom_headers,
+                default_query=client._custom_query
+            )
+        return self._async_client
+    
+    def _send(self, kwargs: Dict[str, Any]) -> Callable[[], Awaitable[ChatCompletion]]:
+        """One attempt at a chat completion, as run by the hedged caller"""
+        if isinstance(self._client, OpenAI):
+            return lambda: self._async_twin().chat.completions.create(**kwargs)
+        # Any other client (e.g. a test double) is called as-is; a losing hedge then finishes on its thread
+        return lambda: asyncio.to_thread(self._client.chat.completions.create, **kwargs)
+    
+    def _create(self, prompt_type: str = 'chat', **kwargs) -> ChatCompletion:
+        """chat.completions.create; `prompt_type` names the latency histogram the call is measured in"""
+        if kwargs.get('stream'):
+            return self._client.chat.completions.create(**kwargs)
+        
+        # Read here, in the caller's context; the call itself runs on the background loop
+        deadline = llm_deadline.get()
+        call = lambda: self.caller.call(kwargs, prompt_type, deadline, self._send(kwargs))
+        if self.coalescer:
+            return self.coalescer.run(kwargs, call)
+        return call()
+
+_coalescer: Optional[RequestCoalescer] = None
+_coalescer_lock = threading.Lock()
+
+def get_coalescer() -> RequestCoalescer:
+    """The coalescer shared by every client in this process"""
+    global _coalescer
+    with _coalescer_lock:
+        if _coalescer is None:
+            _coalescer = RequestCoalescer()
+        return _coalescer
+
+_hedged_caller: Optional[HedgedCaller] = None
+
+def get_hedged_caller() -> HedgedCaller:
+    """The hedged caller (and latency histograms) shared by every client in this process"""
+    global _hedged_caller
+    with _coalescer_lock:
+        if _hedged_caller is None:
+            _hedged_caller = HedgedCaller()
+        return _hedged_caller
+
+def create_openai_client() -> LLMClient:
+    """OpenAI client for chat completions with deadlines, hedging and (when LLM_COALESCE is on) coalescing"""
+    return LLMClient(OpenAI(api_key=Config.OPENAI_API_KEY))
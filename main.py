@@ -2,16 +2,26 @@
 Main Content Engine Automation Flow
 """
 import os
+import json
 import logging
 import schedule
 import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator
+from itertools import chain, islice
 import random
 
-from models import ContentItem, ContentStatus
+from models import ContentItem, ContentStatus, RSSItem
 from rss_manager import RSSManager
+from seen_index import SeenIndex
+from near_duplicates import NearDuplicateDetector
+from article_extractor import ArticleExtractor
 from scoring_ai import ScoringAI
+from async_scoring import AsyncScoringEngine
+from pre_scorer import PreScorer
+from embedding_index import EmbeddingIndex, EMBEDDINGS_AVAILABLE
+from cost_estimator import CycleBudget
+from llm_client import get_coalescer, get_hedged_caller, llm_deadline
 from quality_filter import QualityFilter
 from content_ai import ContentAI
 from sheets_manager import GoogleSheetsManager
@@ -24,58 +34,200 @@ class ContentEngine:
     """Main content engine orchestrator"""
     
     def __init__(self):
-        self.rss_manager = RSSManager()
+        self.seen_index = SeenIndex()
+        self.rss_manager = RSSManager(seen_index=self.seen_index)
         self.scoring_ai = ScoringAI()
+        self.async_scoring = AsyncScoringEngine(self.scoring_ai) if Config.ASYNC_SCORING else None
+        self.pre_scorer = PreScorer() if Config.PRE_SCORER_ENABLED else None
+        self.embedding_index = None
+        if Config.EMBEDDING_PREFILTER:
+            if EMBEDDINGS_AVAILABLE:
+                self.embedding_index = EmbeddingIndex()
+            else:
+                logger.warning("EMBEDDING_PREFILTER is set but numpy is not installed; prefilter disabled")
         self.quality_filter = QualityFilter()
         self.content_ai = ContentAI()
         self.sheets_manager = GoogleSheetsManager()
         self.social_manager = SocialMediaManager()
+        self.near_duplicate_detector = NearDuplicateDetector() if Config.NEAR_DUPLICATE_DETECTION else None
+        self.article_extractor = ArticleExtractor(session=self.rss_manager.session) if Config.ARTICLE_EXTRACTION else None
         
         # Load previously seen URLs
         self._load_seen_urls()
+        self.deferred_items = self._load_deferred_items()
     
     def _load_seen_urls(self):
-        """Load previously seen URLs from Google Sheets"""
+        """Seed the local seen-URL index from Google Sheets on first run"""
         try:
-            seen_urls = self.sheets_manager.get_seen_urls()
-            self.rss_manager.load_seen_urls(set(seen_urls))
-            logger.info(f"Loaded {len(seen_urls)} previously seen URLs")
+            self.seen_index.bootstrap_from_sheets(self.sheets_manager)
+            logger.info(f"Seen index holds {len(self.seen_index)} URL hashes")
         except Exception as e:
             logger.error(f"Error loading seen URLs: {e}")
+        
+        if self.pre_scorer:
+            try:
+                self.pre_scorer.bootstrap_from_sheets(self.sheets_manager)
+            except Exception as e:
+                logger.error(f"Error training pre-scorer: {e}")
+    
+    def _sync_seen_urls(self):
+        """Push newly seen URL hashes to Google Sheets"""
+        try:
+            self.seen_index.sync_to_sheets(self.sheets_manager)
+        except Exception as e:
+            logger.error(f"Error syncing seen URLs: {e}")
+    
+    def _load_deferred_items(self) -> List[RSSItem]:
+        """Load items the previous cycle deferred for lack of budget"""
+        if not os.path.exists(Config.DEFERRED_ITEMS_FILE):
+            return []
+        
+        try:
+            with open(Config.DEFERRED_ITEMS_FILE, 'r') as f:
+                return [RSSItem.model_validate(item) for item in json.load(f)]
+        except Exception as e:
+            logger.error(f"Error loading deferred items: {e}")
+            return []
+    
+    def _save_deferred_items(self, rss_items: List[RSSItem]):
+        """Keep deferred items (newest first, up to DEFERRED_ITEMS_MAX) for the next cycle"""
+        rss_items = sorted(
+            {rss_item.url_hash: rss_item for rss_item in rss_items}.values(),
+            key=lambda rss_item: rss_item.published_date or datetime.min,
+            reverse=True
+        )[:Config.DEFERRED_ITEMS_MAX]
+        self.deferred_items = rss_items
+        
+        try:
+            directory = os.path.dirname(Config.DEFERRED_ITEMS_FILE)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            tmp_path = f"{Config.DEFERRED_ITEMS_FILE}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump([rss_item.model_dump(mode='json') for rss_item in rss_items], f)
+            os.replace(tmp_path, Config.DEFERRED_ITEMS_FILE)
+        except Exception as e:
+            logger.error(f"Error saving deferred items: {e}")
+    
+    @staticmethod
+    def _unique_items(rss_items: Iterable[RSSItem]) -> Iterator[RSSItem]:
+        """Drop repeats by url_hash; deferred items are still unseen, so feeds hand them out again"""
+        yielded = set()
+        for rss_item in rss_items:
+            if rss_item.url_hash not in yielded:
+                yielded.add(rss_item.url_hash)
+                yield rss_item
     
     def run_content_cycle(self) -> Dict[str, Any]:
         """Run a complete content processing cycle"""
         logger.info("Starting content processing cycle")
         
+        budget = CycleBudget()
+        # Every LLM call made during the cycle is bounded by what is left of its time budget
+        deadline_token = llm_deadline.set(budget.deadline())
+        # Items deferred by the last cycle's budget go first; anything deferred now waits for the next
+        previously_deferred, deferred = self.deferred_items, []
+        stream = None
+        
         cycle_stats = {
             'start_time': datetime.now(),
             'rss_items_fetched': 0,
+            'near_duplicates_dropped': 0,
+            'pre_scorer_dropped': 0,
+            'embedding_prefilter_dropped': 0,
             'items_scored': 0,
             'items_passed_filter': 0,
             'content_generated': 0,
             'items_posted': 0,
             'items_held_for_review': 0,
+            'items_deferred': 0,
             'errors': []
         }
         
         try:
             # Step 1: Fetch RSS feeds
-            logger.info("Fetching RSS feeds...")
-            rss_items = self.rss_manager.fetch_rss_feeds()
-            cycle_stats['rss_items_fetched'] = len(rss_items)
-            logger.info(f"Fetched {len(rss_items)} new RSS items")
-            
-            if not rss_items:
-                logger.info("No new RSS items found")
-                return cycle_stats
+            if Config.STREAMING_PIPELINE:
+                # Items are fetched lazily, so scoring overlaps with slower feeds
+                logger.info("Streaming RSS feeds...")
+                previously_deferred = iter(previously_deferred)
+                stream = self._stream_rss_items(cycle_stats)
+                rss_items = self._unique_items(chain(previously_deferred, stream))
+            else:
+                logger.info("Fetching RSS feeds...")
+                rss_items = self.rss_manager.fetch_rss_feeds()
+                cycle_stats['rss_items_fetched'] = len(rss_items)
+                logger.info(f"Fetched {len(rss_items)} new RSS items")
+                rss_items = list(self._unique_items(previously_deferred + rss_items))
+                
+                if not rss_items:
+                    logger.info("No new RSS items found")
+                    return cycle_stats
+                
+                # Step 1b: Collapse the same story arriving from several sources
+                if self.near_duplicate_detector:
+                    representatives = self.near_duplicate_detector.collapse(rss_items)
+                    cycle_stats['near_duplicates_dropped'] = len(rss_items) - len(representatives)
+                    kept = {rss_item.url_hash for rss_item in representatives}
+                    self.rss_manager.mark_seen(rss_item for rss_item in rss_items if rss_item.url_hash not in kept)
+                    rss_items = representatives
+                
+                # Step 1c: Replace feed snippets with the extracted article text
+                if self.article_extractor:
+                    logger.info("Extracting article text...")
+                    self.article_extractor.enrich(rss_items)
+                
+                # Step 1d: Score the most promising items first
+                if self.embedding_index:
+                    rss_items = self._rank_by_embedding(rss_items, cycle_stats)
             
             # Step 2: Score content
             logger.info("Scoring content...")
             scored_items = []
-            for rss_item in rss_items:
+            batches = self._scoring_batches(rss_items)
+            for batch in batches:
+                if self.embedding_index and Config.STREAMING_PIPELINE:
+                    # A stream can only be ordered one batch at a time
+                    batch = self._rank_by_embedding(batch, cycle_stats)
+                
+                if self.pre_scorer:
+                    batch, dropped = self.pre_scorer.prune(batch)
+                    cycle_stats['pre_scorer_dropped'] += len(dropped)
+                    self.rss_manager.mark_seen(dropped)
+                    if not batch:
+                        continue
+                
+                decision, model = budget.plan(lambda model: self.scoring_ai.estimate_cost(batch, model))
+                if decision in (CycleBudget.DEFER, CycleBudget.STOP):
+                    # Later batches are no cheaper; hold what is already in hand for the next cycle
+                    deferred.extend(batch)
+                    if stream is not None:
+                        # Feeds not fetched yet are left to the next cycle; their items are still unseen
+                        deferred.extend(previously_deferred)
+                    else:
+                        deferred.extend(rss_item for remaining in batches for rss_item in remaining)
+                    break
+                
                 try:
-                    score = self.scoring_ai.score_content(rss_item)
-                    if score:
+                    if self.async_scoring:
+                        scores = self.async_scoring.score_items(batch, model)
+                    else:
+                        scores = self.scoring_ai.batch_score_content(batch, model)
+                except Exception as e:
+                    logger.error(f"Error scoring batch of {len(batch)} items: {e}")
+                    cycle_stats['errors'].append(f"Scoring error: {e}")
+                    # Not seen yet, so retry them next cycle
+                    deferred.extend(batch)
+                    continue
+                
+                for rss_item, score in scores:
+                    if not score:
+                        deferred.append(rss_item)
+                    else:
+                        if self.pre_scorer:
+                            self.pre_scorer.learn(rss_item, score)
+                        if self.embedding_index:
+                            self._label_embedding(rss_item, score)
                         content_item = ContentItem(
                             rss_item=rss_item,
                             score=score,
@@ -83,9 +235,6 @@ class ContentEngine:
                         )
                         scored_items.append(content_item)
                         cycle_stats['items_scored'] += 1
-                except Exception as e:
-                    logger.error(f"Error scoring item '{rss_item.title}': {e}")
-                    cycle_stats['errors'].append(f"Scoring error: {e}")
             
             # Step 3: Apply quality filters
             logger.info("Applying quality filters...")
@@ -117,19 +266,30 @@ class ContentEngine:
                         
                         # Log to sheets
                         self.sheets_manager.log_content_item(content_item)
+                        self.rss_manager.mark_seen([content_item.rss_item])
                         
                 except Exception as e:
                     logger.error(f"Error filtering item '{content_item.rss_item.title}': {e}")
                     cycle_stats['errors'].append(f"Filtering error: {e}")
+                    deferred.append(content_item.rss_item)
             
             # Step 4: Generate content
             logger.info("Generating content...")
             generated_items = []
-            for content_item in filtered_items:
+            for index, content_item in enumerate(filtered_items):
+                decision, model = budget.plan(
+                    lambda model: self.content_ai.estimate_content_cost(content_item.rss_item, content_item.score, model)
+                )
+                if decision in (CycleBudget.DEFER, CycleBudget.STOP):
+                    # With the score cache on, next cycle reuses their scores and leaves them out of the estimate
+                    deferred.extend(item.rss_item for item in filtered_items[index:])
+                    break
+                
                 try:
                     generated_content = self.content_ai.generate_content(
                         content_item.rss_item,
-                        content_item.score
+                        content_item.score,
+                        model
                     )
                     
                     if generated_content:
@@ -144,10 +304,12 @@ class ContentEngine:
                     else:
                         content_item.status = ContentStatus.REJECTED
                         logger.warning(f"Failed to generate content for '{content_item.rss_item.title}'")
+                        deferred.append(content_item.rss_item)
                         
                 except Exception as e:
                     logger.error(f"Error generating content for '{content_item.rss_item.title}': {e}")
                     cycle_stats['errors'].append(f"Content generation error: {e}")
+                    deferred.append(content_item.rss_item)
             
             # Step 5: Final quality check
             logger.info("Final quality check...")
@@ -194,19 +356,116 @@ class ContentEngine:
                 for content_item in final_items:
                     self.sheets_manager.log_content_item(content_item)
             
+            # Only now are these items done with; anything deferred stays unseen and is fetched again
+            self.rss_manager.mark_seen(content_item.rss_item for content_item in generated_items)
+            
             # Step 7: Update engagement metrics (for previously posted content)
             self._update_engagement_metrics()
             
+            # Step 8: Resolve redirector links seen this cycle, off the fetch path
+            self.rss_manager.resolve_pending_redirects()
+            
         except Exception as e:
             logger.error(f"Error in content cycle: {e}")
             cycle_stats['errors'].append(f"Cycle error: {e}")
+        finally:
+            # Runs on early returns too, so the deadline is always reset and state always saved
+            if stream is not None:
+                # Stops the fetch workers if scoring stopped before the stream ran out
+                stream.close()
+            llm_deadline.reset(deadline_token)
+            self._sync_seen_urls()
+            self._save_deferred_items(deferred)
+            # Items dropped past DEFERRED_ITEMS_MAX keep their feed's old validators and are downloaded again
+            self.rss_manager.mark_consumed(self.deferred_items)
+            cycle_stats['items_deferred'] = len(deferred)
+            cycle_stats['budget'] = budget.stats()
+            if Config.LLM_COALESCE:
+                cycle_stats['llm_requests'] = get_coalescer().stats()
+            cycle_stats['llm_calls'] = get_hedged_caller().stats()
+            get_hedged_caller().latency.save()
+            cycle_stats['seen_set'] = self.rss_manager.get_seen_set_stats()
+            if self.article_extractor:
+                cycle_stats['article_cache'] = self.article_extractor.stats()
+            if self.scoring_ai.score_cache:
+                cycle_stats['score_cache'] = self.scoring_ai.score_cache.stats()
+            if self.scoring_ai.cascade:
+                cycle_stats['scoring_cascade'] = self.scoring_ai.cascade.stats()
+                self.scoring_ai.cascade.save()
+            if self.pre_scorer:
+                cycle_stats['pre_scorer'] = self.pre_scorer.stats()
+                self.pre_scorer.save()
+            if self.embedding_index:
+                cycle_stats['embedding_index'] = self.embedding_index.stats()
+                self.embedding_index.save()
+            cycle_stats['end_time'] = datetime.now()
+            cycle_stats['duration'] = (cycle_stats['end_time'] - cycle_stats['start_time']).total_seconds()
+            
+            logger.info(f"Content cycle completed: {cycle_stats}")
         
-        cycle_stats['end_time'] = datetime.now()
-        cycle_stats['duration'] = (cycle_stats['end_time'] - cycle_stats['start_time']).total_seconds()
-        
-        logger.info(f"Content cycle completed: {cycle_stats}")
         return cycle_stats
     
+    def _rank_by_embedding(self, rss_items: List[RSSItem], cycle_stats: Dict[str, Any]) -> List[RSSItem]:
+        """Order items by their embedding relevance prior and drop clearly irrelevant ones"""
+        try:
+            ranked, dropped = self.embedding_index.rank(rss_items)
+        except Exception as e:
+            logger.error(f"Error ranking items by embedding: {e}")
+            return rss_items
+        
+        cycle_stats['embedding_prefilter_dropped'] += len(dropped)
+        self.rss_manager.mark_seen(dropped)
+        return ranked
+    
+    def _label_embedding(self, rss_item: RSSItem, score):
+        """Add a scored item to the embedding index"""
+        try:
+            self.embedding_index.add(rss_item, score)
+        except Exception as e:
+            logger.error(f"Error adding '{rss_item.title}' to embedding index: {e}")
+    
+    def _scoring_batches(self, rss_items: Iterable[RSSItem]) -> Iterator[List[RSSItem]]:
+        """Group items (a list or a stream) into lists for batched scoring"""
+        # Async scoring keeps SCORING_CONCURRENCY requests in flight, so hand it enough items to fill them
+        batch_size = max(1, Config.SCORING_BATCH_SIZE)
+        if self.async_scoring:
+            batch_size *= Config.SCORING_CONCURRENCY
+        
+        rss_items = iter(rss_items)
+        while True:
+            batch = list(islice(rss_items, batch_size))
+            if not batch:
+                return
+            yield batch
+    
+    def _stream_rss_items(self, cycle_stats: Dict[str, Any]) -> Iterator[RSSItem]:
+        """Yield new, non-duplicate RSS items as each feed completes"""
+        rss_items = self._stream_new_stories(cycle_stats)
+        if self.article_extractor:
+            # Same bounded worker pool as the batch path, so one slow site doesn't hold up the stream
+            rss_items = self.article_extractor.enrich_stream(rss_items)
+        
+        try:
+            yield from rss_items
+        finally:
+            rss_items.close()
+        
+        logger.info(f"Streamed {cycle_stats['rss_items_fetched']} new RSS items")
+        if self.article_extractor:
+            self.article_extractor.evict()
+    
+    def _stream_new_stories(self, cycle_stats: Dict[str, Any]) -> Iterator[RSSItem]:
+        """Yield streamed items that aren't near-duplicates of a story already seen this window"""
+        for rss_item in self.rss_manager.iter_new_items():
+            cycle_stats['rss_items_fetched'] += 1
+            
+            if self.near_duplicate_detector and self.near_duplicate_detector.absorb(rss_item):
+                cycle_stats['near_duplicates_dropped'] += 1
+                self.rss_manager.mark_seen([rss_item])
+                continue
+            
+            yield rss_item
+    
     def _update_engagement_metrics(self):
         """Update engagement metrics for posted content"""
         try:
@@ -262,8 +521,12 @@ class ContentEngine:
         """Run the content engine scheduler"""
         logger.info("Starting content engine scheduler")
         
-        # Schedule RSS fetching every 2 hours
-        schedule.every(2).hours.do(self.run_content_cycle)
+        if Config.ADAPTIVE_POLLING:
+            # Check often; each cycle only fetches the feeds that are due
+            schedule.every(Config.ADAPTIVE_POLL_TICK_MINUTES).minutes.do(self.run_content_cycle)
+        else:
+            # Schedule RSS fetching every 2 hours
+            schedule.every(2).hours.do(self.run_content_cycle)
         
         # Schedule posting times
         self.schedule_posting()
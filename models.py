@@ -34,6 +34,7 @@ class RSSItem(BaseModel):
     url: str
     published_date: Optional[datetime] = None
     url_hash: str = Field(..., description="Hash of URL for deduplication")
+    duplicate_urls: List[str] = Field(default_factory=list, description="URLs of near-duplicate stories from other sources")
 
 class ContentScore(BaseModel):
     """AI-generated content score"""
@@ -116,3 +117,4 @@ class ContentLedgerRow(BaseModel):
     likes: Optional[int] = None
     reposts: Optional[int] = None
     comments: Optional[int] = None
+    duplicate_urls: Optional[str] = None
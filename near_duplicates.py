@@ -0,0 +1,129 @@
+"""
+Cross-source near-duplicate story detection for Brightface Content Engine
+"""
+import re
+import time
+import zlib
+import random
+import logging
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from models import RSSItem
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_TAG_RE = re.compile(r'<[^>]+>')
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+class NearDuplicateDetector:
+    """MinHash/LSH index over title+summary shingles for a rolling window of recent items"""
+    
+    def __init__(self,
+                 threshold: Optional[float] = None,
+                 bands: Optional[int] = None,
+                 rows: Optional[int] = None,
+                 window_hours: Optional[int] = None,
+                 shingle_size: int = 2,
+                 seed: int = 1):
+        self.threshold = threshold or Config.NEAR_DUPLICATE_THRESHOLD
+        self.bands = bands or Config.NEAR_DUPLICATE_BANDS
+        self.rows = rows or Config.NEAR_DUPLICATE_ROWS
+        self.window_seconds = (window_hours or Config.NEAR_DUPLICATE_WINDOW_HOURS) * 3600
+        self.shingle_size = shingle_size
+        
+        rng = random.Random(seed)
+        num_perm = self.bands * self.rows
+        self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+        
+        # url_hash -> (added_at, signature, representative item); insertion order doubles as age order
+        self._entries: "OrderedDict[str, Tuple[float, Tuple[int, ...], RSSItem]]" = OrderedDict()
+        self._buckets: List[Dict[Tuple[int, ...], Set[str]]] = [defaultdict(set) for _ in range(self.bands)]
+    
+    def _shingles(self, rss_item: RSSItem) -> Set[int]:
+        text = _TAG_RE.sub(' ', f"{rss_item.title} {rss_item.summary}").lower()
+        tokens = _TOKEN_RE.findall(text)
+        if len(tokens) < self.shingle_size:
+            return {zlib.crc32(token.encode()) for token in tokens}
+        
+        return {
+            zlib.crc32(' '.join(tokens[i:i + self.shingle_size]).encode())
+            for i in range(len(tokens) - self.shingle_size + 1)
+        }
+    
+    def _signature(self, shingles: Set[int]) -> Tuple[int, ...]:
+        return tuple(min((a * h + b) % _MERSENNE_PRIME for h in shingles) for a, b in self._perms)
+    
+    def _band_keys(self, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+    
+    def _similarity(self, sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+        return sum(a == b for a, b in zip(sig_a, sig_b)) / len(sig_a)
+    
+    def _evict_expired(self, now: float):
+        while self._entries:
+            url_hash, (added_at, signature, _) = next(iter(self._entries.items()))
+            if now - added_at < self.window_seconds:
+                break
+            del self._entries[url_hash]
+            for band, key in self._band_keys(signature):
+                bucket = self._buckets[band].get(key)
+                if bucket is not None:
+                    bucket.discard(url_hash)
+                    if not bucket:
+                        del self._buckets[band][key]
+    
+    def find_representative(self, rss_item: RSSItem) -> Optional[RSSItem]:
+        """Return the earlier item this one duplicates, or index it and return None"""
+        now = time.time()
+        self._evict_expired(now)
+        
+        # A re-submitted item is already its own story's representative
+        if rss_item.url_hash in self._entries:
+            return None
+        
+        shingles = self._shingles(rss_item)
+        if not shingles:
+            return None
+        
+        signature = self._signature(shingles)
+        
+        # Only items sharing at least one LSH band are compared
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(key, ()))
+        
+        best_hash, best_similarity = None, 0.0
+        for candidate in candidates:
+            similarity = self._similarity(signature, self._entries[candidate][1])
+            if similarity > best_similarity:
+                best_hash, best_similarity = candidate, similarity
+        
+        if best_hash is not None and best_similarity >= self.threshold:
+            return self._entries[best_hash][2]
+        
+        self._entries[rss_item.url_hash] = (now, signature, rss_item)
+        for band, key in self._band_keys(signature):
+            self._buckets[band][key].add(rss_item.url_hash)
+        
+        return None
+    
+    def absorb(self, rss_item: RSSItem) -> bool:
+        """Attach rss_item to the earlier story it duplicates; returns False if it is new"""
+        representative = self.find_representative(rss_item)
+        if representative is None:
+            return False
+        
+        representative.duplicate_urls.append(rss_item.url)
+        logger.info(f"Near-duplicate of '{representative.title}' from {rss_item.source}: '{rss_item.title}'")
+        return True
+    
+    def collapse(self, rss_items: List[RSSItem]) -> List[RSSItem]:
+        """Keep one representative per story, recording other sources on it"""
+        return [rss_item for rss_item in rss_items if not self.absorb(rss_item)]
+    
+    def __len__(self) -> int:
+        return len(self._entries)
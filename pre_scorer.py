@@ -0,0 +1,227 @@
+"""
+Local relevance pre-scorer for Brightface Content Engine
+"""
+import os
+import re
+import json
+import math
+import zlib
+import random
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from models import RSSItem, ContentScore
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+class PreScorer:
+    """Hashed-feature logistic regression predicting whether the LLM will rate an item relevant"""
+    
+    # 2^18 hashed feature buckets; weights are stored sparsely
+    FEATURE_BITS = 18
+    LEARNING_RATE = 0.5
+    L2 = 1e-5
+    TRAINING_EPOCHS = 5
+    # Bumped when the features change; weights saved under another version are discarded
+    FEATURE_VERSION = 2
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or Config.PRE_SCORER_FILE
+        self.threshold = Config.MIN_RELEVANCE_SCORE
+        self.drop_probability = Config.PRE_SCORER_DROP_PROBABILITY
+        self.explore_rate = Config.PRE_SCORER_EXPLORE_RATE
+        self.min_examples = Config.PRE_SCORER_MIN_EXAMPLES
+        
+        self._mask = (1 << self.FEATURE_BITS) - 1
+        self._weights: Dict[int, float] = {}
+        self._bias = 0.0
+        self._examples = 0
+        # Drop decisions vs LLM verdicts; "positive" means "irrelevant, safe to drop"
+        self._confusion = {'tp': 0.0, 'fp': 0.0, 'fn': 0.0, 'tn': 0.0}
+        # url_hash -> (probability, explored) for items sent to the LLM this run
+        self._pending: Dict[str, Tuple[float, bool]] = {}
+        self._lock = threading.Lock()
+        self._load()
+    
+    def _load(self):
+        """Load model weights and evaluation counters from disk"""
+        if not os.path.exists(self.path):
+            return
+        
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') != self.FEATURE_VERSION:
+                logger.info(f"Discarding pre-scorer {self.path} trained on older features")
+                return
+            self._weights = {int(index): weight for index, weight in data.get('weights', {}).items()}
+            self._bias = data.get('bias', 0.0)
+            self._examples = data.get('examples', 0)
+            self._confusion.update(data.get('confusion', {}))
+        except Exception as e:
+            logger.error(f"Error loading pre-scorer {self.path}: {e}")
+    
+    def save(self):
+        """Write model weights and evaluation counters to disk"""
+        with self._lock:
+            data = {
+                'version': self.FEATURE_VERSION,
+                'weights': {str(index): round(weight, 6) for index, weight in self._weights.items() if abs(weight) > 1e-6},
+                'bias': self._bias,
+                'examples': self._examples,
+                'confusion': dict(self._confusion)
+            }
+        
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving pre-scorer {self.path}: {e}")
+    
+    def _features(self, title: str, source: str) -> List[int]:
+        # Title and source only: the content ledger the model bootstraps from has no summaries,
+        # and training on different fields than it predicts on would skew the weights
+        title_tokens = _TOKEN_RE.findall(title.lower())
+        
+        features = [f"t:{token}" for token in title_tokens]
+        features.extend(f"tb:{a}_{b}" for a, b in zip(title_tokens, title_tokens[1:]))
+        features.append(f"src:{source.lower()}")
+        
+        return list({zlib.crc32(feature.encode()) & self._mask for feature in features})
+    
+    def _probability(self, features: List[int]) -> float:
+        # Bag-of-features average keeps long titles from dominating short ones
+        scale = 1 / math.sqrt(len(features)) if features else 0.0
+        z = self._bias + scale * sum(self._weights.get(index, 0.0) for index in features)
+        z = max(-30.0, min(30.0, z))
+        return 1 / (1 + math.exp(-z))
+    
+    def _update(self, features: List[int], label: float):
+        scale = 1 / math.sqrt(len(features)) if features else 0.0
+        error = self._probability(features) - label
+        self._bias -= self.LEARNING_RATE * error
+        for index in features:
+            weight = self._weights.get(index, 0.0)
+            self._weights[index] = weight - self.LEARNING_RATE * (error * scale + self.L2 * weight)
+    
+    @property
+    def is_trained(self) -> bool:
+        return self._examples >= self.min_examples
+    
+    def predict(self, rss_item: RSSItem) -> float:
+        """Probability that the LLM rates the item at or above MIN_RELEVANCE_SCORE"""
+        features = self._features(rss_item.title, rss_item.source)
+        with self._lock:
+            return self._probability(features)
+    
+    def prune(self, rss_items: List[RSSItem]) -> Tuple[List[RSSItem], List[RSSItem]]:
+        """Split items into (send to LLM, dropped); a small random share of drops is still sent for evaluation"""
+        if not self.is_trained:
+            return rss_items, []
+        
+        kept, dropped = [], []
+        for rss_item in rss_items:
+            probability = self.predict(rss_item)
+            would_drop = probability < self.drop_probability
+            explored = would_drop and random.random() < self.explore_rate
+            
+            if would_drop and not explored:
+                dropped.append(rss_item)
+                logger.info(f"Pre-scorer dropped '{rss_item.title}' (p_relevant={probability:.3f})")
+                continue
+            
+            with self._lock:
+                self._pending[rss_item.url_hash] = (probability, explored)
+            kept.append(rss_item)
+        
+        return kept, dropped
+    
+    def learn(self, rss_item: RSSItem, score: ContentScore):
+        """Train on an LLM score and update precision/recall of the drop decision"""
+        features = self._features(rss_item.title, rss_item.source)
+        relevant = score.relevance_score >= self.threshold
+        
+        with self._lock:
+            pending = self._pending.pop(rss_item.url_hash, None)
+            if pending is not None:
+                probability, explored = pending
+                predicted_drop = probability < self.drop_probability
+                # Explored drops stand in for all the drops that never reached the LLM
+                weight = 1 / self.explore_rate if explored and self.explore_rate > 0 else 1.0
+                if predicted_drop:
+                    self._confusion['fp' if relevant else 'tp'] += weight
+                else:
+                    self._confusion['fn' if not relevant else 'tn'] += weight
+            
+            self._update(features, 1.0 if relevant else 0.0)
+            self._examples += 1
+    
+    def train(self, examples: List[Tuple[str, str, int]], holdout: float = 0.2) -> Dict[str, Any]:
+        """Fit on (title, source, relevance) examples and report drop precision/recall on a holdout"""
+        examples = list(examples)
+        random.Random(1).shuffle(examples)
+        split = int(len(examples) * (1 - holdout)) if len(examples) >= 10 else len(examples)
+        training, evaluation = examples[:split], examples[split:]
+        
+        with self._lock:
+            for _ in range(self.TRAINING_EPOCHS):
+                for title, source, relevance in training:
+                    self._update(self._features(title, source), 1.0 if relevance >= self.threshold else 0.0)
+            self._examples += len(training)
+            
+            counts = {'tp': 0, 'fp': 0, 'fn': 0, 'tn': 0}
+            for title, source, relevance in evaluation:
+                predicted_drop = self._probability(self._features(title, source)) < self.drop_probability
+                relevant = relevance >= self.threshold
+                if predicted_drop:
+                    counts['fp' if relevant else 'tp'] += 1
+                else:
+                    counts['fn' if not relevant else 'tn'] += 1
+        
+        report = self._metrics(counts)
+        report.update({'trained_on': len(training), 'evaluated_on': len(evaluation)})
+        logger.info(f"Pre-scorer trained: {report}")
+        return report
+    
+    def bootstrap_from_sheets(self, sheets_manager) -> Dict[str, Any]:
+        """Train an untrained model on LLM scores recorded in the content ledger"""
+        if self.is_trained:
+            return {}
+        
+        # The ledger may hold several rows per article; keep the latest score for each URL
+        latest = {}
+        for row in sheets_manager.get_scored_items():
+            latest[row['url']] = (row['title'], row['source'], row['relevance'])
+        
+        if not latest:
+            return {}
+        
+        report = self.train(list(latest.values()))
+        self.save()
+        return report
+    
+    @staticmethod
+    def _metrics(counts: Dict[str, float]) -> Dict[str, Any]:
+        tp, fp, fn = counts['tp'], counts['fp'], counts['fn']
+        return {
+            'precision': round(tp / (tp + fp), 3) if tp + fp else None,
+            'recall': round(tp / (tp + fn), 3) if tp + fn else None,
+            'dropped_relevant': round(fp, 1)
+        }
+    
+    def stats(self) -> Dict[str, Any]:
+        """Drop precision/recall against LLM scores, plus training size"""
+        with self._lock:
+            stats = self._metrics(self._confusion)
+            stats.update({'examples': self._examples, 'active': self.is_trained})
+            return stats
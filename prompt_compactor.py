@@ -0,0 +1,120 @@
+"""
+Prompt input normalization for Brightface Content Engine
+"""
+import re
+import html
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from models import RSSItem
+from config import Config
+from cost_estimator import count_tokens
+
+# One pass over the markup: drop script/style blocks and comments, turn block-level tags into
+# line breaks and every other tag (including tracking pixels) into nothing
+_MARKUP_RE = re.compile(
+    r'<(script|style|noscript)\b.*?</\1\s*>'
+    r'|<!--.*?-->'
+    r'|<(/?)(p|div|br|li|h[1-6]|blockquote|tr|td|th|section|article)\b[^>]*>'
+    r'|<[^>]*>',
+    re.IGNORECASE | re.DOTALL
+)
+_SPACE_RE = re.compile(r'[ \t\r\f\v\u00a0\u200b\u200c\u200d\ufeff]+')
+_BREAKS_RE = re.compile(r'\s*\n\s*')
+# Feed footers that repeat on every item ("The post X appeared first on Y.", "Continue reading ...")
+_BOILERPLATE_RE = re.compile(
+    r'The post .{0,300}? appeared first on [^.\n]{0,120}\.?'
+    r'|\[(?:\.\.\.|…)\]'
+    r'|\b(?:Continue reading|Read more|Read the full (?:story|article))\b[^\n]{0,80}$',
+    re.IGNORECASE | re.MULTILINE
+)
+_SENTENCE_RE = re.compile(r'(?<=[.!?…])["\')\]]?\s+(?=[A-Z0-9"\'(\[])|\n+')
+
+_MEMO_SIZE = 4096
+
+def _strip_markup(match: re.Match) -> str:
+    if match.group(3):
+        return '\n'
+    return ' ' if match.group(1) else ''
+
+def normalize_text(text: str) -> str:
+    """Plain text from feed HTML: markup and entities resolved, boilerplate removed, whitespace collapsed"""
+    if not text:
+        return ''
+    if '<' in text:
+        text = _MARKUP_RE.sub(_strip_markup, text)
+    if '&' in text:
+        text = html.unescape(text)
+    text = _BOILERPLATE_RE.sub('', text)
+    text = _SPACE_RE.sub(' ', text)
+    return _BREAKS_RE.sub('\n', text).strip()
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Whole sentences up to `max_tokens`; a single overlong first sentence is cut at a word boundary"""
+    # Anything this long is over budget without tokenizing all of it
+    if len(text) < max_tokens * 8 and count_tokens(text) <= max_tokens:
+        return text
+    
+    kept, used = [], 0
+    for sentence in _SENTENCE_RE.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        tokens = count_tokens(sentence) + 1
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    
+    if kept:
+        return ' '.join(kept)
+    
+    # Rough character allowance, tightened word by word
+    words = text[:max_tokens * 4].split(' ')
+    while len(words) > 1 and count_tokens(' '.join(words)) > max_tokens:
+        words = words[:max(1, len(words) * 3 // 4)]
+    return ' '.join(words) + '...'
+
+class PromptCompactor:
+    """Normalized, token-bounded summary and excerpt per item, memoized by the text they are built from"""
+    
+    def __init__(self, summary_tokens: Optional[int] = None, excerpt_tokens: Optional[int] = None):
+        self.summary_tokens = summary_tokens or Config.PROMPT_SUMMARY_TOKENS
+        self.excerpt_tokens = excerpt_tokens or Config.PROMPT_EXCERPT_TOKENS
+        self._memo: 'OrderedDict[bytes, Tuple[str, str]]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def compact(self, rss_item: RSSItem) -> Tuple[str, str]:
+        """(summary, excerpt) for prompts; the excerpt is empty unless article text adds to the summary"""
+        # full_text starts out as the feed summary and is replaced once the article is extracted,
+        # so the key follows the text itself rather than the item
+        key = hashlib.blake2b(
+            f"{rss_item.summary}\0{rss_item.full_text or ''}".encode(), digest_size=16
+        ).digest()
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+        
+        full_summary = normalize_text(rss_item.summary)
+        summary = truncate_to_tokens(full_summary, self.summary_tokens)
+        excerpt = ''
+        if rss_item.full_text:
+            article = normalize_text(rss_item.full_text)
+            # full_text falls back to the feed summary when no article was extracted; repeating it adds nothing
+            if not full_summary or not article.startswith(full_summary):
+                excerpt = truncate_to_tokens(article, self.excerpt_tokens)
+        
+        with self._lock:
+            self._memo[key] = (summary, excerpt)
+            if len(self._memo) > _MEMO_SIZE:
+                self._memo.popitem(last=False)
+        return summary, excerpt
+
+_compactor = PromptCompactor()
+
+def compact_item(rss_item: RSSItem) -> Tuple[str, str]:
+    """Prompt-ready (summary, excerpt) for an item, shared by every prompt builder"""
+    return _compactor.compact(rss_item)
@@ -37,6 +37,8 @@ class ContentEngineTester:
             'feeds_tested': 0,
             'feeds_successful': 0,
             'total_items': 0,
+            'open_circuits': [],
+            'feed_health': {},
             'errors': []
         }
         
@@ -45,10 +47,16 @@ class ContentEngineTester:
                 items = self.rss_manager._fetch_single_feed(feed_url)
                 results['feeds_tested'] += 1
                 results['total_items'] += len(items)
+                health = self.rss_manager.get_feed_health().get(feed_url, {})
                 
                 if items:
                     results['feeds_successful'] += 1
-                    logger.info(f"✓ {feed_url}: {len(items)} items")
+                    logger.info(f"✓ {feed_url}: {len(items)} items ({health.get('last_latency_ms')} ms)")
+                elif health.get('last_status') == 304:
+                    results['feeds_successful'] += 1
+                    logger.info(f"✓ {feed_url}: Not modified since last fetch")
+                elif health.get('circuit') == 'open':
+                    logger.warning(f"⚠ {feed_url}: Circuit open after {health.get('consecutive_failures')} failures, last error: {health.get('last_error')}")
                 else:
                     logger.warning(f"⚠ {feed_url}: No items found")
                     
@@ -56,6 +64,11 @@ class ContentEngineTester:
                 results['errors'].append(f"{feed_url}: {e}")
                 logger.error(f"✗ {feed_url}: {e}")
         
+        results['feed_health'] = self.rss_manager.get_feed_health()
+        results['open_circuits'] = [
+            feed_url for feed_url, health in results['feed_health'].items() if health['circuit'] != 'closed'
+        ]
+        
         success_rate = (results['feeds_successful'] / results['feeds_tested'] * 100) if results['feeds_tested'] > 0 else 0
         logger.info(f"RSS Test Results: {success_rate:.1f}% success rate, {results['total_items']} total items")
         
@@ -339,6 +352,7 @@ Overall Status: {'✓ PASSED' if test_results['overall_success'] else '✗ FAILE
 - Feeds Tested: {test_results['rss_test']['feeds_tested']}
 - Feeds Successful: {test_results['rss_test']['feeds_successful']}
 - Total Items: {test_results['rss_test']['total_items']}
+- Open Circuits: {len(test_results['rss_test']['open_circuits'])}
 - Errors: {len(test_results['rss_test']['errors'])}
 
 ### Scoring AI Test
@@ -374,6 +388,10 @@ Overall Status: {'✓ PASSED' if test_results['overall_success'] else '✗ FAILE
         if test_results['rss_test']['feeds_successful'] < len(Config.RSS_SOURCES):
             report += "- Some RSS feeds are not working - check feed URLs\n"
         
+        for feed_url in test_results['rss_test']['open_circuits']:
+            health = test_results['rss_test']['feed_health'][feed_url]
+            report += f"- Feed circuit open, retrying at {health['retry_at']}: {feed_url} ({health['last_error']})\n"
+        
         report += "- Run tests regularly to ensure system health\n"
         
         return report
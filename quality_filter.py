@@ -8,6 +8,7 @@ from datetime import datetime, timedelta
 
 from models import RSSItem, ContentScore, ContentItem, ContentStatus, RiskFlag, GeneratedContent
 from config import Config
+from feed_parsing import is_evergreen
 
 logger = logging.getLogger(__name__)
 
@@ -49,11 +50,7 @@ class QualityFilter:
         # Check freshness
         if score.freshness_days > Config.MAX_FRESHNESS_DAYS:
             # Check for evergreen keywords
-            evergreen_keywords = ['guide', 'how to', 'checklist', 'tutorial', 'tips']
-            title_lower = rss_item.title.lower()
-            summary_lower = rss_item.summary.lower()
-            
-            if not any(keyword in title_lower or keyword in summary_lower for keyword in evergreen_keywords):
+            if not is_evergreen(rss_item.title, rss_item.summary):
                 return False, f"Content too old: {score.freshness_days} days > {Config.MAX_FRESHNESS_DAYS}"
         
         # Check risk flags
@@ -0,0 +1,119 @@
+"""
+OpenAI rate limiting for Brightface Content Engine
+"""
+import re
+import time
+import asyncio
+import logging
+from typing import Mapping, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parse x-ratelimit-reset-* values such as '20ms', '6m0s' or '1h2m3.5s' into seconds"""
+    if not value:
+        return None
+    matches = _DURATION_RE.findall(value)
+    if not matches:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in matches)
+
+class TokenBucket:
+    """Continuously refilling bucket sized to a per-minute limit"""
+    
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60
+        self.level = self.capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (0 if available now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+    
+    def consume(self, amount: float):
+        self._refill()
+        self.level -= amount
+    
+    def sync(self, limit: Optional[int], remaining: Optional[int], reset_seconds: Optional[float]):
+        """Align the bucket with the limits the API reports"""
+        self._refill()
+        if limit:
+            self.capacity = float(limit)
+            self.rate = self.capacity / 60
+        if remaining is not None:
+            self.level = min(self.level, float(remaining))
+            # The server refills to full by the reset time; never assume a slower refill than that
+            if reset_seconds and remaining < self.capacity:
+                self.rate = max(self.rate, (self.capacity - remaining) / reset_seconds)
+
+class RateLimiter:
+    """Dual token bucket (requests/min and tokens/min) fed from x-ratelimit-* response headers"""
+    
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        self.requests = TokenBucket(requests_per_minute or Config.OPENAI_RPM_LIMIT)
+        self.tokens = TokenBucket(tokens_per_minute or Config.OPENAI_TPM_LIMIT)
+        self._paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop = None
+    
+    def _get_lock(self) -> asyncio.Lock:
+        # Locks belong to one event loop; each asyncio.run() gets a fresh one
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock, self._loop = asyncio.Lock(), loop
+        return self._lock
+    
+    async def acquire(self, tokens: int):
+        """Wait until one request and `tokens` tokens are available, then take them"""
+        async with self._get_lock():
+            while True:
+                wait = max(
+                    self._paused_until - time.monotonic(),
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(tokens)
+                )
+                if wait <= 0:
+                    self.requests.consume(1)
+                    self.tokens.consume(tokens)
+                    return
+                await asyncio.sleep(wait)
+    
+    def reconcile(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token bucket once the real usage of a request is known"""
+        self.tokens.consume(actual_tokens - estimated_tokens)
+    
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Sync both buckets with x-ratelimit-* headers from an API response"""
+        def as_int(name: str) -> Optional[int]:
+            try:
+                return int(headers.get(name))
+            except (TypeError, ValueError):
+                return None
+        
+        self.requests.sync(
+            as_int('x-ratelimit-limit-requests'),
+            as_int('x-ratelimit-remaining-requests'),
+            parse_reset_duration(headers.get('x-ratelimit-reset-requests'))
+        )
+        self.tokens.sync(
+            as_int('x-ratelimit-limit-tokens'),
+            as_int('x-ratelimit-remaining-tokens'),
+            parse_reset_duration(headers.get('x-ratelimit-reset-tokens'))
+        )
+    
+    def pause(self, seconds: float):
+        """Hold back every caller, e.g. after a 429"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
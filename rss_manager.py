@@ -1,41 +1,101 @@
 """
 RSS Feed Management for Brightface Content Engine
 """
-import feedparser
-import hashlib
 import requests
+from requests.adapters import HTTPAdapter
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
-from typing import List, Set, Dict
+from itertools import islice
+from typing import List, Set, Dict, FrozenSet, Optional, Any, Iterable, Iterator, Tuple
 from urllib.parse import urlparse
 import logging
 
 from models import RSSItem
 from config import Config
+from feed_cache import FeedCache, content_digest
+from feed_registry import FeedRegistry
+from seen_index import SeenIndex, DEFAULT_PIPELINE
+from seen_filter import RotatingBloomFilter
+from url_canonicalizer import UrlCanonicalizer, hash_url
+from feed_scheduler import FeedScheduler
+from feed_health import FeedHealthRegistry
+from http_fixtures import mount_fixture_adapter
+from feed_parsing import FeedEntry, parse_feed_entries, is_evergreen
 
 logger = logging.getLogger(__name__)
 
 class RSSManager:
     """Manages RSS feed fetching and deduplication"""
     
-    def __init__(self):
-        self.seen_urls: Set[str] = set()
+    def __init__(self, seen_index: Optional[SeenIndex] = None):
+        self.seen_urls = self._create_seen_set()
+        self.seen_index = seen_index
+        # Hashes handed out this fetch; they only become seen once the caller has processed them
+        self._fetched: Set[str] = set()
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Brightface Content Engine 1.0'
         })
+        
+        # Size the connection pool so concurrent fetches don't queue on it
+        adapter = HTTPAdapter(
+            pool_connections=Config.RSS_FETCH_WORKERS,
+            pool_maxsize=Config.RSS_FETCH_WORKERS
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        # Record or replay HTTP traffic when HTTP_FIXTURE_MODE is set
+        self.fixtures = mount_fixture_adapter(
+            self.session,
+            pool_connections=Config.RSS_FETCH_WORKERS,
+            pool_maxsize=Config.RSS_FETCH_WORKERS
+        )
+        
+        # Validators are keyed like the seen index, so one pipeline's 304 never hides items from another
+        pipeline = seen_index.pipeline if seen_index is not None else DEFAULT_PIPELINE
+        self.feed_registry = FeedRegistry(pipeline=pipeline) if Config.FEED_REGISTRY_ENABLED else None
+        if self.feed_registry:
+            self.feed_registry.bootstrap()
+        
+        # The registry stores validators itself and stands in for the JSON feed cache
+        self.feed_cache = (self.feed_registry or FeedCache(pipeline=pipeline)) if Config.FEED_CACHE_ENABLED else None
+        # Validators of downloaded feeds, held back until their items have been handed to the caller
+        self._pending_validators: Dict[str, Tuple[Optional[str], Optional[str], str]] = {}
+        # Raw entry links per feed that resolved to already-seen items on its last fetch
+        self._seen_links: Dict[str, Set[str]] = {}
+        # fetch_rss_feeds: url_hashes each feed handed out that the caller hasn't marked seen or consumed yet
+        self._unconsumed: Dict[str, Set[str]] = {}
+        self._validators_lock = threading.Lock()
+        self.canonicalizer = UrlCanonicalizer()
+        self.scheduler = FeedScheduler(registry=self.feed_registry) if Config.ADAPTIVE_POLLING else None
+        self.feed_health = FeedHealthRegistry() if Config.FEED_HEALTH_ENABLED else None
+        
+        # Optional worker processes for CPU-bound feed parsing
+        self.parse_pool = ProcessPoolExecutor(max_workers=Config.RSS_PARSE_PROCESSES) if Config.RSS_PARSE_PROCESSES > 0 else None
+    
+    @staticmethod
+    def _create_seen_set():
+        """Create the in-memory seen set for the configured backend"""
+        if Config.SEEN_SET_BACKEND == 'bloom':
+            return RotatingBloomFilter()
+        return set()
     
     def fetch_rss_feeds(self) -> List[RSSItem]:
         """Fetch all RSS feeds and return new items"""
-        all_items = []
+        feed_urls = self._feed_urls()
+        self._fetched = set()
+        self._unconsumed = {}
+        results = dict(self._iter_feed_results(feed_urls, hold_validators=True))
         
-        for feed_url in Config.RSS_SOURCES:
-            try:
-                items = self._fetch_single_feed(feed_url)
-                all_items.extend(items)
-                logger.info(f"Fetched {len(items)} items from {feed_url}")
-            except Exception as e:
-                logger.error(f"Error fetching feed {feed_url}: {e}")
-                continue
+        # Keep source order so deduplication picks the same item as a sequential run
+        all_items, feed_of = [], {}
+        for feed_url in feed_urls:
+            for item in results.get(feed_url, []):
+                all_items.append(item)
+                feed_of.setdefault(item.url_hash, feed_url)
         
         # Deduplicate by URL hash
         unique_items = self._deduplicate_items(all_items)
@@ -43,110 +103,365 @@ class RSSManager:
         # Filter by freshness
         fresh_items = self._filter_by_freshness(unique_items)
         
+        # A feed's validators wait until all of its items are marked seen or consumed, so
+        # items the caller never gets to are downloaded again instead of hidden behind a 304
+        for item in fresh_items:
+            self._unconsumed.setdefault(feed_of[item.url_hash], set()).add(item.url_hash)
+        for feed_url in results:
+            if feed_url not in self._unconsumed:
+                self._commit_validators(feed_url)
+        self._save_state()
+        
         logger.info(f"Total new items after deduplication and freshness filter: {len(fresh_items)}")
         return fresh_items
     
-    def _fetch_single_feed(self, feed_url: str) -> List[RSSItem]:
-        """Fetch a single RSS feed"""
+    def iter_new_items(self) -> Iterator[RSSItem]:
+        """Yield deduplicated, fresh items as each feed completes"""
+        total = 0
+        self._fetched = set()
+        
         try:
-            response = self.session.get(feed_url, timeout=30)
-            response.raise_for_status()
-            
-            feed = feedparser.parse(response.content)
-            
-            items = []
-            for entry in feed.entries:
+            for feed_url, items in self._iter_feed_results(self._feed_urls()):
+                fresh_items = self._filter_by_freshness(self._deduplicate_items(items))
+                total += len(fresh_items)
+                yield from fresh_items
+        finally:
+            self._save_state()
+        
+        logger.info(f"Total new items after deduplication and freshness filter: {total}")
+    
+    def _feed_urls(self) -> List[str]:
+        """Feeds to fetch this cycle: all sources, or only the due ones when polling adaptively"""
+        if self.feed_registry:
+            if self.scheduler:
+                return self.scheduler.next_batch(Config.RSS_FETCH_BUDGET)
+            return self.feed_registry.next_batch(Config.RSS_FETCH_BUDGET)
+        
+        if self.scheduler:
+            return self.scheduler.due_feeds(Config.RSS_SOURCES)
+        return Config.RSS_SOURCES
+    
+    def _save_state(self):
+        """Persist feed validators, resolved redirects, poll cadences, feed health and recorded fixtures"""
+        if self.feed_cache:
+            self.feed_cache.save()
+        self.canonicalizer.save()
+        if self.scheduler:
+            self.scheduler.save()
+        if self.feed_health:
+            self.feed_health.save()
+        if self.fixtures is not None:
+            self.fixtures.save()
+    
+    def _iter_feed_results(self, feed_urls: List[str],
+                           hold_validators: bool = False) -> Iterator[Tuple[str, List[RSSItem]]]:
+        """Yield (feed_url, items) as feeds complete within the cycle deadline; `hold_validators` leaves saving validators to the caller"""
+        with self._validators_lock:
+            self._pending_validators.clear()
+        
+        if not Config.RSS_CONCURRENT_FETCH:
+            for feed_url in feed_urls:
                 try:
-                    # Extract basic information
-                    title = entry.get('title', '').strip()
-                    summary = entry.get('summary', '').strip()
-                    url = entry.get('link', '').strip()
-                    
-                    if not title or not url:
-                        continue
-                    
-                    # Parse published date
-                    published_date = None
-                    if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                        published_date = datetime(*entry.published_parsed[:6])
-                    
-                    # Generate URL hash for deduplication
-                    url_hash = hashlib.md5(url.encode()).hexdigest()
-                    
-                    # Extract source domain
-                    source = urlparse(url).netloc
-                    
-                    # Get full text if available
-                    full_text = None
-                    if hasattr(entry, 'content'):
-                        for content in entry.content:
-                            if content.get('type') == 'text/html':
-                                full_text = content.get('value', '')
-                                break
+                    items = self._fetch_single_feed(feed_url)
+                    logger.info(f"Fetched {len(items)} items from {feed_url}")
+                    yield feed_url, items
+                    if not hold_validators:
+                        self._commit_validators(feed_url)
+                except Exception as e:
+                    logger.error(f"Error fetching feed {feed_url}: {e}")
+            return
+        
+        if not feed_urls:
+            return
+        
+        workers = min(Config.RSS_FETCH_WORKERS, len(feed_urls))
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='rss-fetch')
+        queued_urls = iter(feed_urls)
+        in_flight = {}
+        deadline = time.monotonic() + Config.RSS_CYCLE_TIMEOUT
+        
+        # Only keep as many feeds in flight as there are workers, so finished
+        # results never pile up faster than the consumer takes them
+        for feed_url in islice(queued_urls, workers):
+            in_flight[executor.submit(self._fetch_single_feed, feed_url)] = feed_url
+        
+        try:
+            while in_flight:
+                remaining = deadline - time.monotonic()
+                done, _ = wait(in_flight, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+                if not done:
+                    skipped = list(in_flight.values()) + list(queued_urls)
+                    logger.warning(f"Fetch cycle deadline of {Config.RSS_CYCLE_TIMEOUT}s reached, skipping {len(skipped)} feeds: {skipped}")
+                    break
+                
+                for future in done:
+                    feed_url = in_flight.pop(future)
                     
-                    # Fallback to summary if no full text
-                    if not full_text:
-                        full_text = summary
+                    next_url = next(queued_urls, None)
+                    if next_url is not None:
+                        in_flight[executor.submit(self._fetch_single_feed, next_url)] = next_url
                     
-                    item = RSSItem(
-                        title=title,
-                        summary=summary,
-                        full_text=full_text,
-                        source=source,
-                        url=url,
-                        published_date=published_date,
-                        url_hash=url_hash
-                    )
+                    try:
+                        items = future.result()
+                    except Exception as e:
+                        logger.error(f"Error fetching feed {feed_url}: {e}")
+                        continue
                     
-                    items.append(item)
+                    logger.info(f"Fetched {len(items)} items from {feed_url}")
                     
-                except Exception as e:
-                    logger.warning(f"Error processing entry from {feed_url}: {e}")
-                    continue
+                    # Time spent in the consumer doesn't count against the fetch deadline
+                    paused_at = time.monotonic()
+                    yield feed_url, items
+                    deadline += time.monotonic() - paused_at
+                    if not hold_validators:
+                        self._commit_validators(feed_url)
+        finally:
+            # Stragglers are bounded by the per-feed deadline; don't wait for them
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _download_feed(self, feed_url: str, timeout: Optional[int] = None) -> Optional[bytes]:
+        """Download a feed body, or None if it hasn't changed since the last fetch"""
+        timeout = timeout or Config.RSS_FEED_TIMEOUT
+        deadline = time.monotonic() + timeout
+        headers = self.feed_cache.conditional_headers(feed_url) if self.feed_cache else {}
+        
+        with self.session.get(feed_url, headers=headers, timeout=timeout, stream=True) as response:
+            if response.status_code == 304:
+                logger.info(f"Feed not modified: {feed_url}")
+                return None
             
-            return items
+            response.raise_for_status()
+            
+            chunks = []
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Feed exceeded {timeout}s deadline")
+                chunks.append(chunk)
+        
+        content = b''.join(chunks)
+        
+        if self.feed_cache:
+            validators = (response.headers.get('ETag'), response.headers.get('Last-Modified'), content_digest(content))
+            if self.feed_cache.is_unchanged(feed_url, validators[2]):
+                logger.info(f"Feed body unchanged: {feed_url}")
+                self.feed_cache.update(feed_url, *validators)
+                return None
+            
+            # Saving them now would turn a retry of items that are never used (e.g. past the cycle deadline) into a 304
+            with self._validators_lock:
+                self._pending_validators[feed_url] = validators
+        
+        return content
+    
+    def _commit_validators(self, feed_url: str):
+        """Store a feed's new validators once its items have been consumed"""
+        with self._validators_lock:
+            validators = self._pending_validators.pop(feed_url, None)
+        if validators is not None:
+            self.feed_cache.update(feed_url, *validators)
+    
+    def _discard_validators(self, feed_url: str):
+        """Forget a feed's new validators so its body is downloaded again next time"""
+        with self._validators_lock:
+            self._pending_validators.pop(feed_url, None)
+    
+    def _fetch_single_feed(self, feed_url: str) -> List[RSSItem]:
+        """Fetch a single RSS feed"""
+        if self.feed_health and not self.feed_health.allow_request(feed_url):
+            logger.info(f"Skipping feed with open circuit: {feed_url}")
+            if self.feed_registry:
+                # Otherwise it keeps the oldest last_fetched and takes a budget slot every cycle
+                self.feed_registry.record_skip(feed_url)
+            return []
+        
+        started = time.monotonic()
+        try:
+            # Probes of a failing feed get a short timeout so a dead host stays cheap
+            probing = self.feed_health and self.feed_health.is_probing(feed_url)
+            content = self._download_feed(feed_url, Config.FEED_PROBE_TIMEOUT if probing else None)
+            if self.feed_registry:
+                self.feed_registry.record_fetch(feed_url, 304 if content is None else 200)
+            
+            if content is None:
+                if self.feed_health:
+                    self.feed_health.record_success(feed_url, time.monotonic() - started, 304)
+                if self.scheduler:
+                    self.scheduler.record_fetch(feed_url, [], not_modified=True)
+                return []
+            
+            # Stale archive entries are dropped while parsing
+            cutoff_date = datetime.now() - timedelta(days=Config.MAX_FRESHNESS_DAYS)
+            seen_links = frozenset(self._seen_links.get(feed_url, ()))
+            parse_error, entries = self._parse_entries(content, cutoff_date, seen_links)
+            
+            if parse_error:
+                logger.error(f"Error parsing feed {feed_url}: {parse_error}")
+                self._discard_validators(feed_url)
+                if self.feed_health:
+                    self.feed_health.record_failure(feed_url, time.monotonic() - started, parse_error, parse_error=True)
+                return []
+            
+            if self.feed_health:
+                self.feed_health.record_success(feed_url, time.monotonic() - started, 200)
+            
+            if self.scheduler:
+                self.scheduler.record_fetch(
+                    feed_url, [datetime(*published) for _, _, _, published, _ in entries if published]
+                )
             
+            items = self._build_new_items(feed_url, entries, seen_links)
+            
+            return items
+        
         except Exception as e:
             logger.error(f"Error fetching feed {feed_url}: {e}")
+            self._discard_validators(feed_url)
+            response = getattr(e, 'response', None)
+            status_code = response.status_code if response is not None else None
+            if self.feed_health:
+                self.feed_health.record_failure(feed_url, time.monotonic() - started, str(e), status_code=status_code)
+            if self.feed_registry:
+                self.feed_registry.record_fetch(feed_url, status_code)
+            if self.scheduler:
+                self.scheduler.record_error(feed_url)
             return []
     
+    def _parse_entries(self, content: bytes, cutoff_date: datetime,
+                       seen_links: FrozenSet[str]) -> Tuple[Optional[str], List[FeedEntry]]:
+        """Parse a feed body, in a worker process when a parse pool is configured"""
+        if self.parse_pool:
+            return self.parse_pool.submit(parse_feed_entries, content, cutoff_date, seen_links).result()
+        return parse_feed_entries(content, cutoff_date, seen_links)
+    
+    def _build_new_items(self, feed_url: str, entries: List[FeedEntry],
+                         seen_links: FrozenSet[str] = frozenset()) -> List[RSSItem]:
+        """Build RSSItem models only for entries that are unseen (freshness is applied while parsing)"""
+        # Links seen on the last fetch are still seen; they skip canonicalization and the index lookup
+        still_seen = set()
+        candidates = []
+        for title, summary, url, published, full_text in entries:
+            link = url
+            if link in seen_links:
+                still_seen.add(link)
+                continue
+            
+            # Generate URL hash for deduplication from the canonical form
+            try:
+                url = self.canonicalizer.canonicalize(url)
+                url_hash = hash_url(url)
+            except Exception as e:
+                # One malformed link must not cost the rest of the feed
+                logger.warning(f"Skipping entry with unusable link {url!r} from {feed_url}: {e}")
+                continue
+            if url_hash in self.seen_urls:
+                still_seen.add(link)
+            else:
+                candidates.append((link, url_hash, url, title, summary, published, full_text))
+        
+        indexed = set()
+        if self.seen_index is not None and candidates:
+            indexed = self.seen_index.contains_many({candidate[1] for candidate in candidates})
+        
+        items = []
+        for link, url_hash, url, title, summary, published, full_text in candidates:
+            if url_hash in indexed:
+                still_seen.add(link)
+                continue
+            
+            published_date = datetime(*published) if published else None
+            try:
+                items.append(RSSItem(
+                    title=title,
+                    summary=summary,
+                    # Fallback to summary if no full text
+                    full_text=full_text or summary,
+                    source=urlparse(url).netloc,
+                    url=url,
+                    published_date=published_date,
+                    url_hash=url_hash
+                ))
+            except Exception as e:
+                logger.warning(f"Error processing entry from {feed_url}: {e}")
+                continue
+        
+        # Next fetch, the parser leaves these entries' content alone
+        self._seen_links[feed_url] = still_seen
+        return items
+    
     def _deduplicate_items(self, items: List[RSSItem]) -> List[RSSItem]:
         """Remove duplicate items based on URL hash"""
         unique_items = []
         seen_hashes = set()
         
+        # One bulk lookup against the persistent index instead of holding it in memory
+        if self.seen_index is not None:
+            seen_hashes.update(self.seen_index.contains_many({item.url_hash for item in items}))
+        
         for item in items:
-            if item.url_hash not in seen_hashes and item.url_hash not in self.seen_urls:
+            if item.url_hash not in seen_hashes and item.url_hash not in self.seen_urls and item.url_hash not in self._fetched:
                 unique_items.append(item)
                 seen_hashes.add(item.url_hash)
-                self.seen_urls.add(item.url_hash)
+                self._fetched.add(item.url_hash)
         
         return unique_items
     
+    def mark_seen(self, items: Iterable[RSSItem]):
+        """Record processed items as seen so later fetches skip them"""
+        items = list(items)
+        entries = [(item.url_hash, item.url) for item in items]
+        self.seen_urls.update(url_hash for url_hash, _ in entries)
+        if self.seen_index is not None:
+            self.seen_index.add_many(entries)
+        self.mark_consumed(items)
+    
+    def mark_consumed(self, items: Iterable[RSSItem]):
+        """Release fetched items the caller has dealt with (e.g. deferred), saving validators of feeds with none left"""
+        if not self._unconsumed:
+            return
+        
+        url_hashes = {item.url_hash for item in items}
+        released = []
+        for feed_url, pending in self._unconsumed.items():
+            pending -= url_hashes
+            if not pending:
+                released.append(feed_url)
+        
+        for feed_url in released:
+            del self._unconsumed[feed_url]
+            self._commit_validators(feed_url)
+        if released and self.feed_cache:
+            self.feed_cache.save()
+    
     def _filter_by_freshness(self, items: List[RSSItem]) -> List[RSSItem]:
         """Filter items by freshness (within MAX_FRESHNESS_DAYS)"""
         cutoff_date = datetime.now() - timedelta(days=Config.MAX_FRESHNESS_DAYS)
+        return [item for item in items if self._is_fresh(item.published_date, item.title, item.summary, cutoff_date)]
+    
+    @staticmethod
+    def _is_fresh(published_date: Optional[datetime], title: str, summary: str, cutoff_date: datetime) -> bool:
+        """Check whether an entry is within the freshness window or evergreen"""
+        # If no published date, assume it's fresh
+        if not published_date or published_date >= cutoff_date:
+            return True
         
-        fresh_items = []
-        for item in items:
-            # If no published date, assume it's fresh
-            if not item.published_date:
-                fresh_items.append(item)
-                continue
-            
-            # Check if item is within freshness window
-            if item.published_date >= cutoff_date:
-                fresh_items.append(item)
-            else:
-                # Check for evergreen keywords
-                evergreen_keywords = ['guide', 'how to', 'checklist', 'tutorial', 'tips']
-                title_lower = item.title.lower()
-                summary_lower = item.summary.lower()
-                
-                if any(keyword in title_lower or keyword in summary_lower for keyword in evergreen_keywords):
-                    fresh_items.append(item)
+        # Check for evergreen keywords
+        return is_evergreen(title, summary)
+    
+    def resolve_pending_redirects(self) -> int:
+        """Resolve redirector links queued during fetching and mark their targets as seen"""
+        resolved = self.canonicalizer.resolve_pending(self.session)
         
-        return fresh_items
+        # Items behind these redirectors were already processed under the redirector URL, if at all
+        redirector_hashes = {hash_url(url) for url in resolved}
+        processed = {url_hash for url_hash in redirector_hashes if url_hash in self.seen_urls}
+        if self.seen_index is not None:
+            processed |= self.seen_index.contains_many(redirector_hashes)
+        targets = [(hash_url(target), target) for url, target in resolved.items() if hash_url(url) in processed]
+        self.seen_urls.update(target_hash for target_hash, _ in targets)
+        if self.seen_index is not None:
+            self.seen_index.add_many(targets)
+        
+        return len(resolved)
     
     def load_seen_urls(self, seen_urls: Set[str]):
         """Load previously seen URLs to avoid reprocessing"""
@@ -154,8 +469,20 @@ class RSSManager:
     
     def get_seen_urls(self) -> Set[str]:
         """Get all seen URLs"""
+        if not isinstance(self.seen_urls, set):
+            raise TypeError("Seen URLs can't be enumerated with the bloom seen-set backend")
         return self.seen_urls.copy()
     
+    def get_feed_health(self) -> Dict[str, Dict[str, Any]]:
+        """Get per-feed health statistics"""
+        return self.feed_health.snapshot() if self.feed_health else {}
+    
+    def get_seen_set_stats(self) -> Dict[str, Any]:
+        """Get occupancy statistics for the in-memory seen set"""
+        if isinstance(self.seen_urls, set):
+            return {'backend': 'set', 'items': len(self.seen_urls)}
+        return {'backend': 'bloom', **self.seen_urls.stats()}
+    
     def add_seen_url(self, url_hash: str):
         """Add a URL hash to seen URLs"""
         self.seen_urls.add(url_hash)
@@ -0,0 +1,129 @@
+"""
+Persistent score cache for Brightface Content Engine
+"""
+import os
+import time
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Optional, Set
+
+from models import ContentScore
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class ScoreCache:
+    """SQLite store of validated ContentScores keyed by url_hash, prompt version and model"""
+    
+    def __init__(self, path: Optional[str] = None, ttl_hours: Optional[int] = None):
+        self.path = path or Config.SCORE_CACHE_FILE
+        self.ttl_seconds = (ttl_hours or Config.SCORE_CACHE_TTL_HOURS) * 3600
+        
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS scores ('
+            'url_hash TEXT NOT NULL, prompt_hash TEXT NOT NULL, model TEXT NOT NULL, '
+            'score TEXT NOT NULL, created_at REAL NOT NULL, '
+            'PRIMARY KEY (url_hash, prompt_hash, model)'
+            ') WITHOUT ROWID'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS scores_created ON scores (created_at)')
+        self._conn.commit()
+        self.evict_expired()
+    
+    def get_many(self, url_hashes: Iterable[str], prompt_hash: str, model: str) -> Dict[str, ContentScore]:
+        """Return unexpired cached scores for the given url_hashes"""
+        url_hashes = list(dict.fromkeys(url_hashes))
+        cutoff = time.time() - self.ttl_seconds
+        found = {}
+        
+        with self._lock:
+            for start in range(0, len(url_hashes), Config.SQLITE_BATCH_SIZE):
+                batch = url_hashes[start:start + Config.SQLITE_BATCH_SIZE]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f'SELECT url_hash, score FROM scores WHERE prompt_hash = ? AND model = ? '
+                    f'AND created_at >= ? AND url_hash IN ({placeholders})',
+                    [prompt_hash, model, cutoff, *batch]
+                ).fetchall()
+                
+                for url_hash, score in rows:
+                    try:
+                        found[url_hash] = ContentScore.model_validate_json(score)
+                    except Exception as e:
+                        logger.warning(f"Discarding unreadable cached score for {url_hash}: {e}")
+            
+            self._hits += len(found)
+            self._misses += len(url_hashes) - len(found)
+        
+        return found
+    
+    def contains_many(self, url_hashes: Iterable[str], prompt_hash: str, model: str) -> Set[str]:
+        """Return the url_hashes with an unexpired cached score, without loading or counting them"""
+        url_hashes = list(dict.fromkeys(url_hashes))
+        cutoff = time.time() - self.ttl_seconds
+        found = set()
+        
+        with self._lock:
+            for start in range(0, len(url_hashes), Config.SQLITE_BATCH_SIZE):
+                batch = url_hashes[start:start + Config.SQLITE_BATCH_SIZE]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f'SELECT url_hash FROM scores WHERE prompt_hash = ? AND model = ? '
+                    f'AND created_at >= ? AND url_hash IN ({placeholders})',
+                    [prompt_hash, model, cutoff, *batch]
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        
+        return found
+    
+    def get(self, url_hash: str, prompt_hash: str, model: str) -> Optional[ContentScore]:
+        """Return the cached score for one url_hash, if any"""
+        return self.get_many([url_hash], prompt_hash, model).get(url_hash)
+    
+    def put(self, url_hash: str, prompt_hash: str, model: str, score: ContentScore):
+        """Store a validated score"""
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO scores (url_hash, prompt_hash, model, score, created_at) VALUES (?, ?, ?, ?, ?)',
+                (url_hash, prompt_hash, model, score.model_dump_json(), time.time())
+            )
+            self._conn.commit()
+    
+    def evict_expired(self) -> int:
+        """Delete entries older than the TTL"""
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute('DELETE FROM scores WHERE created_at < ?', (time.time() - self.ttl_seconds,))
+            self._conn.commit()
+            evicted = self._conn.total_changes - before
+        
+        if evicted:
+            logger.info(f"Evicted {evicted} expired cached scores")
+        return evicted
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process and the number of stored scores"""
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+            lookups = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 3) if lookups else None,
+                'entries': entries
+            }
+    
+    def close(self):
+        """Close the underlying database"""
+        with self._lock:
+            self._conn.close()
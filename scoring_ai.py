@@ -2,82 +2,206 @@
 AI Scoring System for Brightface Content Engine
 """
 import json
+import hashlib
+import textwrap
 import logging
-from typing import Optional
-from openai import OpenAI
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 
 from models import RSSItem, ContentScore, RiskFlag
 from config import Config
+from prompt_compactor import compact_item
+from score_cache import ScoreCache
+from scoring_cascade import ScoringCascade
+from cost_estimator import CostEstimate, count_tokens, estimate_request
+from llm_client import create_openai_client
 
 logger = logging.getLogger(__name__)
 
+SCORING_TASK = """Task:
+1) Relevance: does this help our audience with AI headshots, personal branding, LinkedIn optimization, AI content tools, or startup/creator growth?
+2) Freshness: is this still timely (<= 14 days) or evergreen?
+3) Angle: suggest 1–2 "brightface angles" that connect this topic to: (a) first impressions, (b) profile photos, (c) ai-assisted self-presentation.
+4) Risk: any compliance/claims risk?"""
+
+SCORING_FIELDS = """  "relevance_score": 0-10,
+  "virality_score": 0-10,
+  "freshness_days": integer,
+  "angles": ["...", "..."],
+  "risk_flags": ["none" | "medical claim" | "copyright" | "privacy" | "unverified benchmark"],
+  "one_line_take": "12–18 word hook",
+  "keywords": ["3–6 seo/hashtag terms"]"""
+
+# Rough response size of one scored article, reserved in the batch token budget
+SCORE_OUTPUT_TOKENS = 150
+
 class ScoringAI:
     """AI system for scoring content relevance and virality"""
     
     def __init__(self):
-        self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
+        self.client = create_openai_client()
         self.system_prompt = """You are an editorial analyst for brightface.ai (AI headshots & personal branding). Score incoming content for how well it can be turned into an engaging post that promotes brightface without sounding salesy."""
+        
+        # Scores are reused only while the prompts and model that produced them are unchanged
+        self.score_cache = ScoreCache() if Config.SCORE_CACHE_ENABLED else None
+        self.prompt_hash = self._prompt_hash()
+        self.cascade = ScoringCascade() if Config.SCORING_CASCADE else None
+    
+    def _prompt_hash(self) -> str:
+        """Hash of the system prompt and the scoring prompt templates"""
+        placeholder = RSSItem(title='{title}', summary='{summary}', source='{source}', url='{url}', url_hash='{url_hash}')
+        templates = '\n'.join([
+            self.system_prompt,
+            self._build_scoring_prompt(placeholder),
+            self._build_batch_scoring_prompt([placeholder])
+        ])
+        return hashlib.sha256(templates.encode()).hexdigest()[:16]
+    
+    def cached_scores(self, rss_items: List[RSSItem], model: Optional[str] = None) -> Dict[str, ContentScore]:
+        """Cached scores for items under the current prompts and model, keyed by url_hash"""
+        if not self.score_cache or not rss_items:
+            return {}
+        
+        cached = self.score_cache.get_many((rss_item.url_hash for rss_item in rss_items), self.prompt_hash, model or Config.OPENAI_MODEL)
+        
+        # Freshness depends on today's date, not on when the score was cached
+        for rss_item in rss_items:
+            if rss_item.url_hash in cached:
+                cached[rss_item.url_hash] = cached[rss_item.url_hash].model_copy(
+                    update={'freshness_days': self._freshness_days(rss_item)}
+                )
+                logger.info(f"Using cached score for '{rss_item.title}'")
+        
+        return cached
+    
+    def store_score(self, rss_item: RSSItem, content_score: ContentScore, model: Optional[str] = None):
+        """Cache a validated score"""
+        if self.score_cache:
+            self.score_cache.put(rss_item.url_hash, self.prompt_hash, model or Config.OPENAI_MODEL, content_score)
     
     def score_content(self, rss_item: RSSItem) -> Optional[ContentScore]:
         """Score an RSS item for relevance and virality"""
+        return self.batch_score_content([rss_item])[0][1]
+    
+    def _request_score(self, rss_item: RSSItem, model: Optional[str] = None) -> Optional[ContentScore]:
+        """Score one item with its own API request"""
+        model = model or Config.OPENAI_MODEL
         try:
-            user_prompt = self._build_scoring_prompt(rss_item)
-            
-            response = self.client.chat.completions.create(
-                model=Config.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.3
-            )
-            
-            result = json.loads(response.choices[0].message.content)
-            
-            # Parse and validate the response
-            content_score = self._parse_scoring_response(result, rss_item)
-            
-            logger.info(f"Scored item '{rss_item.title}': relevance={content_score.relevance_score}, virality={content_score.virality_score}")
-            return content_score
+            response = self.client.chat.completions.create(prompt_type='score', **self.scoring_request([rss_item], model))
+            result = json.loads(response.choices[0].message.content or '')
+            return self.read_scores([rss_item], result, model).get(rss_item.url_hash)
             
         except Exception as e:
             logger.error(f"Error scoring content '{rss_item.title}': {e}")
             return None
     
+    def _format_article(self, rss_item: RSSItem) -> str:
+        """Format one article's details for a scoring prompt"""
+        summary, excerpt = compact_item(rss_item)
+        excerpt_line = f"\n- Excerpt: {excerpt}" if excerpt else ""
+        return f"""- Title: {rss_item.title}
+- Summary: {summary}{excerpt_line}
+- Source: {rss_item.source}
+- URL: {rss_item.url}"""
+    
+    def scoring_request(self, rss_items: List[RSSItem], model: Optional[str] = None) -> dict:
+        """Chat completion arguments for scoring one item or a batch (shared by sync, async and Batch API scoring)"""
+        if len(rss_items) == 1:
+            user_prompt = self._build_scoring_prompt(rss_items[0])
+        else:
+            user_prompt = self._build_batch_scoring_prompt(rss_items)
+        
+        return dict(
+            model=model or Config.OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.3
+        )
+    
+    def request_tokens(self, request: dict, item_count: int) -> int:
+        """Expected prompt and completion tokens of a scoring request, for rate limiting"""
+        prompt_tokens = sum(self._estimate_tokens(message['content']) for message in request['messages'])
+        return prompt_tokens + SCORE_OUTPUT_TOKENS * item_count
+    
+    def read_scores(self, rss_items: List[RSSItem], result: Any, model: Optional[str] = None) -> Dict[str, ContentScore]:
+        """Scores from a decoded response to scoring_request(rss_items), keyed by url_hash and cached when valid"""
+        model = model or Config.OPENAI_MODEL
+        if len(rss_items) == 1:
+            entries = {rss_items[0].url_hash: result}
+        else:
+            batch = result.get('scores', []) if isinstance(result, dict) else []
+            entries = {
+                entry['url_hash']: entry
+                for entry in batch
+                if isinstance(entry, dict) and isinstance(entry.get('url_hash'), str)
+            }
+        
+        content_scores = {}
+        for rss_item in rss_items:
+            entry = entries.get(rss_item.url_hash)
+            valid = self._is_valid_score_entry(entry)
+            # A malformed batch entry is left out so the item can be retried on its own;
+            # a single-item answer is used as parsed but not cached
+            if not valid and (len(rss_items) > 1 or not isinstance(entry, dict)):
+                continue
+            
+            content_score = self._parse_scoring_response(entry, rss_item)
+            if valid:
+                self.store_score(rss_item, content_score, model)
+            logger.info(f"Scored item '{rss_item.title}' with {model}: relevance={content_score.relevance_score}, virality={content_score.virality_score}")
+            content_scores[rss_item.url_hash] = content_score
+        
+        return content_scores
+    
     def _build_scoring_prompt(self, rss_item: RSSItem) -> str:
         """Build the scoring prompt for the AI"""
         return f"""Article:
-- Title: {rss_item.title}
-- Summary: {rss_item.summary}
-- Source: {rss_item.source}
-- URL: {rss_item.url}
+{self._format_article(rss_item)}
 
-Task:
-1) Relevance: does this help our audience with AI headshots, personal branding, LinkedIn optimization, AI content tools, or startup/creator growth?
-2) Freshness: is this still timely (<= 14 days) or evergreen?
-3) Angle: suggest 1–2 "brightface angles" that connect this topic to: (a) first impressions, (b) profile photos, (c) ai-assisted self-presentation.
-4) Risk: any compliance/claims risk?
+{SCORING_TASK}
 
 Return JSON exactly:
 {{
-  "relevance_score": 0-10,
-  "virality_score": 0-10,
-  "freshness_days": integer,
-  "angles": ["...", "..."],
-  "risk_flags": ["none" | "medical claim" | "copyright" | "privacy" | "unverified benchmark"],
-  "one_line_take": "12–18 word hook",
-  "keywords": ["3–6 seo/hashtag terms"]
+{SCORING_FIELDS}
 }}"""
     
+    def _build_batch_scoring_prompt(self, rss_items: List[RSSItem]) -> str:
+        """Build one scoring prompt covering several articles"""
+        articles = "\n\n".join(
+            f"Article {i} (url_hash: {rss_item.url_hash}):\n{self._format_article(rss_item)}"
+            for i, rss_item in enumerate(rss_items, 1)
+        )
+        
+        return f"""{articles}
+
+{SCORING_TASK}
+Score each article on its own merits.
+
+Return JSON exactly, with one entry per article in the same order:
+{{
+  "scores": [
+    {{
+      "url_hash": "the article's url_hash",
+{textwrap.indent(SCORING_FIELDS, '    ')}
+    }}
+  ]
+}}"""
+    
+    @staticmethod
+    def _freshness_days(rss_item: RSSItem) -> int:
+        """Days since the item was published (0 if unknown)"""
+        if rss_item.published_date:
+            return (datetime.now() - rss_item.published_date).days
+        return 0
+    
     def _parse_scoring_response(self, result: dict, rss_item: RSSItem) -> ContentScore:
         """Parse and validate the AI scoring response"""
         try:
             # Calculate freshness days
-            freshness_days = 0
-            if rss_item.published_date:
-                freshness_days = (datetime.now() - rss_item.published_date).days
+            freshness_days = self._freshness_days(rss_item)
             
             # Parse risk flags
             risk_flags = []
@@ -123,12 +247,97 @@ Return JSON exactly:
                 keywords=[]
             )
     
-    def batch_score_content(self, rss_items: list[RSSItem]) -> list[tuple[RSSItem, Optional[ContentScore]]]:
-        """Score multiple RSS items in batch"""
-        results = []
+    def _estimate_tokens(self, text: str) -> int:
+        """Token count of a prompt fragment"""
+        return count_tokens(text)
+    
+    def pack_batches(self, rss_items: List[RSSItem]) -> List[List[RSSItem]]:
+        """Group items into batches that fit SCORING_BATCH_SIZE and SCORING_BATCH_TOKEN_BUDGET"""
+        overhead = self._estimate_tokens(self.system_prompt) + self._estimate_tokens(self._build_batch_scoring_prompt([]))
+        
+        batches, batch, batch_tokens = [], [], overhead
+        for rss_item in rss_items:
+            item_tokens = self._estimate_tokens(self._format_article(rss_item)) + SCORE_OUTPUT_TOKENS
+            if batch and (len(batch) >= Config.SCORING_BATCH_SIZE or batch_tokens + item_tokens > Config.SCORING_BATCH_TOKEN_BUDGET):
+                batches.append(batch)
+                batch, batch_tokens = [], overhead
+            batch.append(rss_item)
+            batch_tokens += item_tokens
         
-        for item in rss_items:
-            score = self.score_content(item)
-            results.append((item, score))
+        if batch:
+            batches.append(batch)
+        return batches
+    
+    @staticmethod
+    def _is_valid_score_entry(entry: Any) -> bool:
+        """Check that a batch entry carries usable scores"""
+        if not isinstance(entry, dict):
+            return False
+        try:
+            return all(0 <= int(entry[field]) <= 10 for field in ('relevance_score', 'virality_score'))
+        except (KeyError, TypeError, ValueError):
+            return False
+    
+    def _score_batch(self, rss_items: List[RSSItem], model: Optional[str] = None) -> Dict[str, ContentScore]:
+        """Score several items in one request; returns the usable scores keyed by url_hash"""
+        response = self.client.chat.completions.create(prompt_type='score_batch', **self.scoring_request(rss_items, model))
+        # An empty or non-JSON answer raises ValueError, like any other unreadable response
+        result = json.loads(response.choices[0].message.content or '')
+        return self.read_scores(rss_items, result, model)
+    
+    def batch_score_content(self, rss_items: List[RSSItem], model: Optional[str] = None) -> List[Tuple[RSSItem, Optional[ContentScore]]]:
+        """Score multiple RSS items, packing several articles into each request; `model` bypasses the cascade"""
+        if self.cascade and not model:
+            return self.cascade.score(rss_items, self._score_items)
+        return self._score_items(rss_items, model or Config.OPENAI_MODEL)
+    
+    def estimate_cost(self, rss_items: List[RSSItem], model: Optional[str] = None) -> CostEstimate:
+        """Pre-flight token and dollar estimate for scoring items the way batch_score_content would"""
+        if self.cascade and not model:
+            cheap = self._estimate_requests(rss_items, self.cascade.cheap_model)
+            strong = self._estimate_requests(rss_items, Config.OPENAI_MODEL)
+            return cheap + strong.scaled(self.cascade.expected_escalation_rate())
+        return self._estimate_requests(rss_items, model or Config.OPENAI_MODEL)
+    
+    def _estimate_requests(self, rss_items: List[RSSItem], model: str) -> CostEstimate:
+        total = CostEstimate(model=model)
+        # Cached scores are reused without a request
+        if self.score_cache:
+            cached = self.score_cache.contains_many((rss_item.url_hash for rss_item in rss_items), self.prompt_hash, model)
+            rss_items = [rss_item for rss_item in rss_items if rss_item.url_hash not in cached]
+        for batch in self.pack_batches(rss_items):
+            user_prompt = self._build_scoring_prompt(batch[0]) if len(batch) == 1 else self._build_batch_scoring_prompt(batch)
+            total += estimate_request(self.system_prompt, user_prompt, SCORE_OUTPUT_TOKENS * len(batch), model)
+        return total
+    
+    def _score_items(self, rss_items: List[RSSItem], model: str) -> List[Tuple[RSSItem, Optional[ContentScore]]]:
+        """Score items with one model, using cached scores where available"""
+        scores: Dict[str, Optional[ContentScore]] = dict(self.cached_scores(rss_items, model))
+        pending = [rss_item for rss_item in rss_items if rss_item.url_hash not in scores]
+        
+        for batch in self.pack_batches(pending):
+            if len(batch) == 1:
+                scores[batch[0].url_hash] = self._request_score(batch[0], model)
+                continue
+            
+            try:
+                batch_scores = self._score_batch(batch, model)
+            except ValueError as e:
+                # The model answered, just not in a usable shape; single-item prompts usually parse
+                logger.warning(f"Unreadable batch score response for {len(batch)} items, scoring individually: {e}")
+                batch_scores = {}
+            except Exception as e:
+                # Transport, rate-limit and server errors would only be multiplied by per-item retries
+                logger.error(f"Error batch scoring {len(batch)} items: {e}")
+                scores.update((rss_item.url_hash, None) for rss_item in batch)
+                continue
+            
+            scores.update(batch_scores)
+            for rss_item in batch:
+                if rss_item.url_hash not in batch_scores:
+                    # Missing or malformed entry: fall back to a single-item request
+                    scores[rss_item.url_hash] = self._request_score(rss_item, model)
+            
+            logger.info(f"Batch scored {len(batch_scores)} of {len(batch)} items in one request")
         
-        return results
+        return [(rss_item, scores.get(rss_item.url_hash)) for rss_item in rss_items]
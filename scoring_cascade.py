@@ -0,0 +1,159 @@
+"""
+Cheap-model-first scoring cascade for Brightface Content Engine
+"""
+import os
+import json
+import random
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from models import RSSItem, ContentScore, RiskFlag
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+ScoreItems = Callable[[List[RSSItem], str], List[Tuple[RSSItem, Optional[ContentScore]]]]
+
+class ScoringCascade:
+    """Scores with SCORING_CASCADE_MODEL and escalates borderline or flagged items to OPENAI_MODEL"""
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or Config.SCORING_CASCADE_STATS_FILE
+        self.cheap_model = Config.SCORING_CASCADE_MODEL
+        self.strong_model = Config.OPENAI_MODEL
+        self.band = Config.SCORING_CASCADE_BAND
+        self.audit_rate = Config.SCORING_CASCADE_AUDIT_RATE
+        
+        self._lock = threading.Lock()
+        self._counts = {'cheap_scored': 0, 'accepted': 0, 'escalated': 0, 'audited': 0, 'cheap_failed': 0}
+        # Cheap-model margin -> [same pass/fail decision, compared]; the basis for tuning the band
+        self._agreement: Dict[str, List[int]] = {}
+        self._relevance_delta = 0
+        self._load()
+    
+    def _load(self):
+        """Load agreement counters from disk"""
+        if not os.path.exists(self.path):
+            return
+        
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self._counts.update(data.get('counts', {}))
+            self._agreement = data.get('agreement', {})
+            self._relevance_delta = data.get('relevance_delta', 0)
+        except Exception as e:
+            logger.error(f"Error loading cascade stats {self.path}: {e}")
+    
+    def save(self):
+        """Write agreement counters to disk"""
+        with self._lock:
+            data = {
+                'counts': dict(self._counts),
+                'agreement': {margin: list(counts) for margin, counts in self._agreement.items()},
+                'relevance_delta': self._relevance_delta
+            }
+        
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving cascade stats {self.path}: {e}")
+    
+    @staticmethod
+    def margin(score: ContentScore) -> int:
+        """Distance of the deciding score from its threshold; >= 0 means the item passes"""
+        return min(score.relevance_score - Config.MIN_RELEVANCE_SCORE, score.virality_score - Config.MIN_VIRALITY_SCORE)
+    
+    @staticmethod
+    def passes(score: ContentScore) -> bool:
+        return ScoringCascade.margin(score) >= 0
+    
+    def needs_escalation(self, score: ContentScore) -> bool:
+        """Borderline scores and flagged risks go to the stronger model"""
+        margin = self.margin(score)
+        # A clear reject is discarded whatever its risk flags say
+        if margin < -self.band:
+            return False
+        if any(flag != RiskFlag.NONE for flag in score.risk_flags):
+            return True
+        return margin <= self.band
+    
+    def score(self, rss_items: List[RSSItem], score_items: ScoreItems) -> List[Tuple[RSSItem, Optional[ContentScore]]]:
+        """Run the cascade with `score_items(items, model)` doing the actual (sync or async) scoring"""
+        if not rss_items:
+            return []
+        
+        cheap_scores = {rss_item.url_hash: score for rss_item, score in score_items(rss_items, self.cheap_model)}
+        
+        escalate, audited = [], set()
+        for rss_item in rss_items:
+            cheap = cheap_scores.get(rss_item.url_hash)
+            if cheap is None or self.needs_escalation(cheap):
+                escalate.append(rss_item)
+            elif random.random() < self.audit_rate:
+                # Spot-check confident scores so agreement outside the band is measured too
+                escalate.append(rss_item)
+                audited.add(rss_item.url_hash)
+        
+        final = dict(cheap_scores)
+        if escalate:
+            logger.info(f"Escalating {len(escalate)} of {len(rss_items)} items to {self.strong_model}")
+            for rss_item, strong in score_items(escalate, self.strong_model):
+                cheap = cheap_scores.get(rss_item.url_hash)
+                if strong is None:
+                    continue
+                if cheap is not None:
+                    self._record(cheap, strong)
+                # Audits only measure the cheap model; its score stands
+                if rss_item.url_hash not in audited or cheap is None:
+                    final[rss_item.url_hash] = strong
+        
+        with self._lock:
+            self._counts['cheap_scored'] += sum(1 for score in cheap_scores.values() if score is not None)
+            self._counts['cheap_failed'] += sum(1 for score in cheap_scores.values() if score is None)
+            self._counts['escalated'] += len(escalate) - len(audited)
+            self._counts['audited'] += len(audited)
+            self._counts['accepted'] += len(rss_items) - len(escalate) + len(audited)
+        
+        return [(rss_item, final.get(rss_item.url_hash)) for rss_item in rss_items]
+    
+    def expected_escalation_rate(self) -> float:
+        """Share of items expected to reach the strong model, from past cycles (all of them until known)"""
+        with self._lock:
+            scored = self._counts['cheap_scored'] + self._counts['cheap_failed']
+            if not scored:
+                return 1.0
+            return (self._counts['escalated'] + self._counts['audited']) / scored
+    
+    def _record(self, cheap: ContentScore, strong: ContentScore):
+        key = str(self.margin(cheap))
+        with self._lock:
+            counts = self._agreement.setdefault(key, [0, 0])
+            counts[0] += int(self.passes(cheap) == self.passes(strong))
+            counts[1] += 1
+            self._relevance_delta += abs(cheap.relevance_score - strong.relevance_score)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Escalation rate and cheap/strong agreement, overall and by cheap-score margin"""
+        with self._lock:
+            compared = sum(counts[1] for counts in self._agreement.values())
+            agreed = sum(counts[0] for counts in self._agreement.values())
+            scored = self._counts['cheap_scored'] + self._counts['cheap_failed']
+            return {
+                **self._counts,
+                'escalation_rate': round(self._counts['escalated'] / scored, 3) if scored else None,
+                'decision_agreement': round(agreed / compared, 3) if compared else None,
+                'mean_relevance_delta': round(self._relevance_delta / compared, 2) if compared else None,
+                'agreement_by_margin': {
+                    margin: round(counts[0] / counts[1], 3)
+                    for margin, counts in sorted(self._agreement.items(), key=lambda item: int(item[0]))
+                }
+            }
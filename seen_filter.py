@@ -0,0 +1,171 @@
+"""
+Memory-bounded probabilistic seen set for Brightface Content Engine
+"""
+import math
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 128-bit hex digests"""
+    
+    def __init__(self, capacity: int, false_positive_rate: float):
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+    
+    def _positions(self, digest: str):
+        # The digest is already uniform, so double hashing on its two halves is enough
+        value = int(digest, 16)
+        h1 = value >> 64
+        h2 = (value & 0xFFFFFFFFFFFFFFFF) | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+    
+    def __contains__(self, digest: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(digest))
+    
+    def add(self, digest: str):
+        """Add a digest to the filter"""
+        for pos in self._positions(digest):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+    
+    def is_full(self) -> bool:
+        """Check whether the filter has reached its design capacity"""
+        return self.count >= self.capacity
+    
+    def fill_ratio(self) -> float:
+        """Fraction of bits set"""
+        set_bits = sum(bin(byte).count('1') for byte in self.bits)
+        return set_bits / self.num_bits
+
+class ScalableBloomFilter:
+    """Bloom filter that adds tighter stages as it fills, keeping the overall false-positive bound"""
+    
+    GROWTH = 2
+    TIGHTENING = 0.5
+    
+    def __init__(self, initial_capacity: int, false_positive_rate: float):
+        self.initial_capacity = initial_capacity
+        self.false_positive_rate = false_positive_rate
+        self.stages: List[BloomFilter] = []
+        self._add_stage()
+    
+    def _add_stage(self):
+        # Stage error rates form a geometric series summing to false_positive_rate
+        index = len(self.stages)
+        capacity = self.initial_capacity * (self.GROWTH ** index)
+        stage_rate = self.false_positive_rate * (1 - self.TIGHTENING) * (self.TIGHTENING ** index)
+        self.stages.append(BloomFilter(capacity, stage_rate))
+    
+    def __contains__(self, digest: str) -> bool:
+        return any(digest in stage for stage in self.stages)
+    
+    def __len__(self) -> int:
+        return sum(stage.count for stage in self.stages)
+    
+    def add(self, digest: str):
+        """Add a digest, growing a new stage when the current one is full"""
+        if self.stages[-1].is_full():
+            self._add_stage()
+        self.stages[-1].add(digest)
+    
+    @property
+    def memory_bytes(self) -> int:
+        return sum(len(stage.bits) for stage in self.stages)
+
+class RotatingBloomFilter:
+    """Seen set made of time buckets of scalable Bloom filters covering MAX_FRESHNESS_DAYS"""
+    
+    def __init__(self,
+                 false_positive_rate: Optional[float] = None,
+                 buckets: Optional[int] = None,
+                 window_days: Optional[int] = None,
+                 initial_capacity: Optional[int] = None):
+        self.false_positive_rate = false_positive_rate or Config.SEEN_SET_FALSE_POSITIVE_RATE
+        self.num_buckets = max(2, buckets or Config.SEEN_SET_BUCKETS)
+        self.window_days = window_days or Config.MAX_FRESHNESS_DAYS
+        self.initial_capacity = initial_capacity or Config.SEEN_SET_INITIAL_CAPACITY
+        
+        # One extra bucket is kept so a digest is remembered for at least window_days
+        self.bucket_seconds = self.window_days * 86400 / (self.num_buckets - 1)
+        
+        # A lookup checks every bucket, so split the error budget between them
+        self._bucket_rate = self.false_positive_rate / self.num_buckets
+        
+        self.buckets: List[ScalableBloomFilter] = []
+        self._bucket_started = time.time()
+        self.rotations = 0
+        self.buckets.append(self._new_bucket())
+        # Feeds are deduplicated from several fetch threads; rotation must happen exactly once
+        self._lock = threading.Lock()
+    
+    def _new_bucket(self) -> ScalableBloomFilter:
+        return ScalableBloomFilter(self.initial_capacity, self._bucket_rate)
+    
+    def _rotate_if_due(self):
+        # Callers hold self._lock
+        now = time.time()
+        while now - self._bucket_started >= self.bucket_seconds:
+            self.buckets.append(self._new_bucket())
+            if len(self.buckets) > self.num_buckets:
+                expired = self.buckets.pop(0)
+                logger.info(f"Rotated seen-set bucket, evicted ~{len(expired)} hashes")
+            self._bucket_started += self.bucket_seconds
+            self.rotations += 1
+    
+    def __contains__(self, digest: str) -> bool:
+        with self._lock:
+            self._rotate_if_due()
+            return any(digest in bucket for bucket in self.buckets)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(bucket) for bucket in self.buckets)
+    
+    def add(self, digest: str):
+        """Record a digest in the current time bucket"""
+        with self._lock:
+            self._rotate_if_due()
+            self.buckets[-1].add(digest)
+    
+    def update(self, digests: Iterable[str]):
+        """Record many digests"""
+        digests = list(digests)
+        with self._lock:
+            self._rotate_if_due()
+            for digest in digests:
+                self.buckets[-1].add(digest)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Occupancy and error-rate statistics"""
+        with self._lock:
+            self._rotate_if_due()
+            
+            # Per-stage estimate from fill ratio: p ~= fill ^ k, combined over every stage queried
+            miss_probability = 1.0
+            for bucket in self.buckets:
+                for stage in bucket.stages:
+                    miss_probability *= 1 - stage.fill_ratio() ** stage.num_hashes
+            
+            return {
+                'buckets': len(self.buckets),
+                'bucket_days': round(self.bucket_seconds / 86400, 2),
+                'window_days': self.window_days,
+                'stages': sum(len(bucket.stages) for bucket in self.buckets),
+                'items': sum(len(bucket) for bucket in self.buckets),
+                'items_per_bucket': [len(bucket) for bucket in self.buckets],
+                'memory_bytes': sum(bucket.memory_bytes for bucket in self.buckets),
+                'target_false_positive_rate': self.false_positive_rate,
+                'estimated_false_positive_rate': 1 - miss_probability,
+                'rotations': self.rotations
+            }
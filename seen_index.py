@@ -0,0 +1,141 @@
+"""
+Persistent seen-URL index for Brightface Content Engine
+"""
+import os
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Iterable, List, Optional, Set, Tuple
+
+from config import Config
+from url_canonicalizer import hash_url
+
+logger = logging.getLogger(__name__)
+
+# Pipeline name of the main engine; other pipelines keep their own index file and sheet rows
+DEFAULT_PIPELINE = 'engine'
+
+class SeenIndex:
+    """SQLite-backed set of url_hash values one pipeline has processed, with incremental Sheets sync"""
+    
+    def __init__(self, path: Optional[str] = None, pipeline: str = DEFAULT_PIPELINE):
+        self.pipeline = pipeline
+        if path is None:
+            root, ext = os.path.splitext(Config.SEEN_INDEX_FILE)
+            path = Config.SEEN_INDEX_FILE if pipeline == DEFAULT_PIPELINE else f"{root}-{pipeline}{ext}"
+        self.path = path
+        
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS seen ('
+            'url_hash TEXT PRIMARY KEY, url TEXT, first_seen TEXT, synced INTEGER NOT NULL DEFAULT 0'
+            ') WITHOUT ROWID'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS seen_unsynced ON seen (synced) WHERE synced = 0')
+        self._conn.commit()
+    
+    def __contains__(self, url_hash: str) -> bool:
+        with self._lock:
+            row = self._conn.execute('SELECT 1 FROM seen WHERE url_hash = ?', (url_hash,)).fetchone()
+        return row is not None
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+    
+    def is_empty(self) -> bool:
+        """Check whether the index has never been populated"""
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM seen LIMIT 1').fetchone() is None
+    
+    def contains_many(self, url_hashes: Iterable[str]) -> Set[str]:
+        """Return the subset of url_hashes already in the index"""
+        url_hashes = list(url_hashes)
+        found = set()
+        
+        with self._lock:
+            for start in range(0, len(url_hashes), Config.SQLITE_BATCH_SIZE):
+                batch = url_hashes[start:start + Config.SQLITE_BATCH_SIZE]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f'SELECT url_hash FROM seen WHERE url_hash IN ({placeholders})', batch
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        
+        return found
+    
+    def add_many(self, entries: Iterable[Tuple[str, Optional[str]]], synced: bool = False) -> int:
+        """Insert (url_hash, url) pairs; returns the number of new hashes"""
+        now = datetime.now().isoformat()
+        rows = [(url_hash, url, now, int(synced)) for url_hash, url in entries]
+        if not rows:
+            return 0
+        
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO seen (url_hash, url, first_seen, synced) VALUES (?, ?, ?, ?)', rows
+            )
+            self._conn.commit()
+            return self._conn.total_changes - before
+    
+    def unsynced(self, limit: int = 1000) -> List[Tuple[str, str, str]]:
+        """Get hashes that haven't been pushed to Google Sheets yet"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT url_hash, COALESCE(url, \'\'), first_seen FROM seen WHERE synced = 0 LIMIT ?', (limit,)
+            ).fetchall()
+    
+    def mark_synced(self, url_hashes: Iterable[str]):
+        """Flag hashes as pushed to Google Sheets"""
+        with self._lock:
+            self._conn.executemany('UPDATE seen SET synced = 1 WHERE url_hash = ?', ((h,) for h in url_hashes))
+            self._conn.commit()
+    
+    def bootstrap_from_sheets(self, sheets_manager) -> int:
+        """Seed an empty index from the Seen Index sheet, falling back to hashing ledger URLs"""
+        if not self.is_empty():
+            return 0
+        
+        url_hashes = sheets_manager.get_seen_hashes(self.pipeline)
+        if url_hashes:
+            added = self.add_many(((url_hash, None) for url_hash in url_hashes), synced=True)
+        else:
+            # Older ledgers only hold raw URLs; hash them and push the hashes on the next sync
+            urls = sheets_manager.get_seen_urls()
+            added = self.add_many((hash_url(url), url) for url in urls)
+        
+        logger.info(f"Bootstrapped seen index with {added} URL hashes from Google Sheets")
+        return added
+    
+    def sync_to_sheets(self, sheets_manager) -> int:
+        """Push newly seen hashes to Google Sheets"""
+        synced = 0
+        
+        while True:
+            rows = self.unsynced()
+            if not rows:
+                break
+            
+            if not sheets_manager.append_seen_hashes(rows, self.pipeline):
+                logger.warning(f"Seen index sync stopped with {len(rows)} hashes pending")
+                break
+            
+            self.mark_synced(row[0] for row in rows)
+            synced += len(rows)
+        
+        if synced:
+            logger.info(f"Synced {synced} seen URL hashes to Google Sheets")
+        return synced
+    
+    def close(self):
+        """Close the underlying database"""
+        with self._lock:
+            self._conn.close()
@@ -110,6 +110,12 @@ def setup_google_sheets():
             }
         ]
         
+        # Add the tab each pipeline syncs its processed URL hashes to
+        spreadsheet = service.spreadsheets().get(spreadsheetId=sheet_id).execute()
+        sheet_titles = [sheet['properties']['title'] for sheet in spreadsheet.get('sheets', [])]
+        if 'Seen Index' not in sheet_titles:
+            requests.append({'addSheet': {'properties': {'title': 'Seen Index'}}})
+        
         service.spreadsheets().batchUpdate(
             spreadsheetId=sheet_id,
             body={'requests': requests}
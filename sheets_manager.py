@@ -78,7 +78,7 @@ class GoogleSheetsManager:
                 'date_iso', 'platform', 'status', 'title', 'source', 'url',
                 'relevance', 'virality', 'risk', 'post_text', 'hashtags',
                 'blog_slug', 'reviewer', 'posted_at', 'post_url',
-                'clicks', 'likes', 'reposts', 'comments'
+                'clicks', 'likes', 'reposts', 'comments', 'duplicate_urls'
             ]
             
             # Create sheet
@@ -88,7 +88,7 @@ class GoogleSheetsManager:
             
             result = self.service.spreadsheets().values().update(
                 spreadsheetId=self.spreadsheet_id,
-                range='Content Ledger!A1:S1',
+                range='Content Ledger!A1:T1',
                 valueInputOption='RAW',
                 body=body
             ).execute()
@@ -115,7 +115,7 @@ class GoogleSheetsManager:
             
             result = self.service.spreadsheets().values().append(
                 spreadsheetId=self.spreadsheet_id,
-                range='Content Ledger!A:S',
+                range='Content Ledger!A:T',
                 valueInputOption='RAW',
                 insertDataOption='INSERT_ROWS',
                 body=body
@@ -166,12 +166,80 @@ class GoogleSheetsManager:
             logger.error(f"Error getting seen URLs: {e}")
             return []
     
+    def get_scored_items(self) -> List[Dict[str, Any]]:
+        """Get title, source and LLM scores of every scored ledger row"""
+        try:
+            result = self.service.spreadsheets().values().get(
+                spreadsheetId=self.spreadsheet_id,
+                range='Content Ledger!D:H'  # title, source, url, relevance, virality
+            ).execute()
+            
+            rows = result.get('values', [])
+            scored_items = []
+            
+            # Skip header row
+            for row in rows[1:]:
+                if len(row) < 4 or not row[0] or not row[3].strip().isdigit():
+                    continue
+                scored_items.append({
+                    'title': row[0],
+                    'source': row[1],
+                    'url': row[2],
+                    'relevance': int(row[3]),
+                    'virality': int(row[4]) if len(row) > 4 and row[4].strip().isdigit() else None
+                })
+            
+            return scored_items
+            
+        except HttpError as e:
+            logger.error(f"Error getting scored items: {e}")
+            return []
+    
+    def get_seen_hashes(self, pipeline: str) -> List[str]:
+        """Get the URL hashes a pipeline has recorded in the seen index sheet"""
+        try:
+            result = self.service.spreadsheets().values().get(
+                spreadsheetId=self.spreadsheet_id,
+                range='Seen Index!A:D'  # url_hash, url, first_seen, pipeline
+            ).execute()
+            
+            # Rows written before hashes were keyed by pipeline count for every pipeline
+            return [
+                row[0] for row in result.get('values', [])
+                if row and row[0] and (len(row) < 4 or not row[3] or row[3] == pipeline)
+            ]
+            
+        except HttpError as e:
+            logger.error(f"Error getting seen hashes: {e}")
+            return []
+    
+    def append_seen_hashes(self, rows: List[tuple], pipeline: str) -> bool:
+        """Append a pipeline's (url_hash, url, first_seen) rows to the seen index sheet"""
+        try:
+            body = {
+                'values': [list(row) + [pipeline] for row in rows]
+            }
+            
+            self.service.spreadsheets().values().append(
+                spreadsheetId=self.spreadsheet_id,
+                range='Seen Index!A:D',
+                valueInputOption='RAW',
+                insertDataOption='INSERT_ROWS',
+                body=body
+            ).execute()
+            
+            return True
+            
+        except HttpError as e:
+            logger.error(f"Error appending seen hashes: {e}")
+            return False
+    
     def get_content_for_review(self) -> List[ContentItem]:
         """Get content items marked for review"""
         try:
             result = self.service.spreadsheets().values().get(
                 spreadsheetId=self.spreadsheet_id,
-                range='Content Ledger!A:S'
+                range='Content Ledger!A:T'
             ).execute()
             
             rows = result.get('values', [])
@@ -249,7 +317,8 @@ class GoogleSheetsManager:
             clicks=content_item.clicks,
             likes=content_item.likes,
             reposts=content_item.reposts,
-            comments=content_item.comments
+            comments=content_item.comments,
+            duplicate_urls=" ".join(content_item.rss_item.duplicate_urls) or None
         )
     
     def _ledger_row_to_values(self, row: ContentLedgerRow) -> List[str]:
@@ -273,5 +342,6 @@ class GoogleSheetsManager:
             str(row.clicks) if row.clicks is not None else "",
             str(row.likes) if row.likes is not None else "",
             str(row.reposts) if row.reposts is not None else "",
-            str(row.comments) if row.comments is not None else ""
+            str(row.comments) if row.comments is not None else "",
+            row.duplicate_urls or ""
         ]
@@ -0,0 +1,185 @@
+"""
+URL canonicalization for Brightface Content Engine
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional, Set
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Well-known click IDs; generic keys like `ref` or `source` select content on some sites and are kept
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid', 'igshid',
+    'twclid', 'ttclid', 'li_fat_id', 'mc_cid', 'mc_eid', 'mkt_tok', '_hsenc', '_hsmi'
+}
+TRACKING_PREFIXES = ('utm_',)
+
+# Hosts that only redirect to the real article
+REDIRECTOR_HOSTS = {
+    'feedproxy.google.com', 'feeds.feedburner.com', 't.co', 'bit.ly', 'ow.ly',
+    'buff.ly', 'lnkd.in', 'dlvr.it', 'trib.al', 'tinyurl.com', 'rss.app'
+}
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def _strip_amp(host: str, path: str):
+    """Unwrap Google AMP viewer and AMP cache URLs to the origin article; other URLs pass through"""
+    target = None
+    
+    # Google AMP viewer: www.google.com/amp/s/example.com/article
+    if host in ('www.google.com', 'google.com') and path.startswith('/amp/'):
+        target = path[len('/amp/'):]
+        if target.startswith('s/'):
+            target = target[2:]
+    
+    # AMP cache: example-com.cdn.ampproject.org/c/s/example.com/article
+    elif host.endswith('.cdn.ampproject.org'):
+        parts = path.split('/', 4)
+        if len(parts) >= 4 and parts[1] in ('c', 'v', 'i'):
+            target = '/'.join(parts[3:]) if parts[2] == 's' else '/'.join(parts[2:])
+    
+    origin, _, rest = (target or '').partition('/')
+    if '.' not in origin:
+        return host, path
+    
+    # The cached copy is the origin's AMP page; its canonical drops the trailing /amp
+    path = '/' + rest
+    if path.endswith('/amp') or path.endswith('/amp/'):
+        path = path[:path.rstrip('/').rfind('/')] or '/'
+    
+    return origin.lower(), path
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a URL into the form we store: no tracking params, fragments or AMP wrappers"""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    
+    scheme = (parts.scheme or 'https').lower()
+    host = (parts.hostname or '').lower()
+    if not host:
+        return url.strip()
+    
+    try:
+        port = parts.port
+    except ValueError:
+        # Non-numeric or out-of-range port
+        return url.strip()
+    
+    path = parts.path or '/'
+    origin, path = _strip_amp(host, path)
+    
+    netloc = origin
+    # A cache URL's port belongs to the cache, not the origin
+    if origin == host and port and port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{port}"
+    
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ]
+    
+    return urlunsplit((scheme, netloc, path, urlencode(query), ''))
+
+def canonical_key(url: str) -> str:
+    """Reduce a canonical URL to the scheme- and www-insensitive key that gets hashed"""
+    parts = urlsplit(canonicalize_url(url))
+    host = parts.netloc[4:] if parts.netloc.startswith('www.') else parts.netloc
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{host}{path}?{query}" if query else f"{host}{path}"
+
+def hash_url(url: str) -> str:
+    """MD5 of the canonical key, used as RSSItem.url_hash"""
+    return hashlib.md5(canonical_key(url).encode()).hexdigest()
+
+class UrlCanonicalizer:
+    """Canonicalizes feed links, resolving known redirectors from a persisted cache"""
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or Config.URL_RESOLVER_CACHE_FILE
+        self._resolved: Dict[str, str] = {}
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._load()
+    
+    def _load(self):
+        """Load resolved redirects from disk"""
+        if not os.path.exists(self.path):
+            return
+        
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self._resolved = data.get('resolved', {})
+            self._pending = set(data.get('pending', []))
+        except Exception as e:
+            logger.error(f"Error loading URL resolver cache {self.path}: {e}")
+    
+    def save(self):
+        """Write resolved redirects to disk"""
+        with self._lock:
+            data = {'resolved': dict(self._resolved), 'pending': sorted(self._pending)}
+        
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving URL resolver cache {self.path}: {e}")
+    
+    def canonicalize(self, url: str) -> str:
+        """Canonicalize a link without touching the network"""
+        url = canonicalize_url(url)
+        host = (urlsplit(url).hostname or '').lower()
+        
+        if host in REDIRECTOR_HOSTS:
+            with self._lock:
+                resolved = self._resolved.get(url)
+                if resolved is None:
+                    # Resolved off the hot path by resolve_pending()
+                    self._pending.add(url)
+                    return url
+            return resolved
+        
+        return url
+    
+    def resolve_pending(self, session: requests.Session, limit: int = 50) -> Dict[str, str]:
+        """Follow queued redirector links; returns {redirector url: canonical target}"""
+        with self._lock:
+            batch = sorted(self._pending)[:limit]
+        
+        resolved = {}
+        for url in batch:
+            try:
+                response = session.head(url, allow_redirects=True, timeout=10)
+                target = canonicalize_url(response.url)
+            except Exception as e:
+                logger.warning(f"Error resolving redirect {url}: {e}")
+                continue
+            
+            resolved[url] = target
+        
+        with self._lock:
+            self._resolved.update(resolved)
+            self._pending.difference_update(resolved)
+        
+        if resolved:
+            logger.info(f"Resolved {len(resolved)} redirector links")
+            self.save()
+        
+        return resolved